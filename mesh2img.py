@@ -19,11 +19,41 @@ script on the command line as-is. I've tried to comment this script to be easy t
 from bpy import context, data, ops
 import bpy
 import argparse
+import atexit
+import collections
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
 from datetime import datetime
+import fnmatch
+from fractions import Fraction
+import hashlib
+import heapq
+import http.server
+import io
+import itertools
+import json
 import logging
 import math
+import numpy as np
 import os
+import queue
+import re
+import subprocess
 import sys
+import shutil
+import struct
+import tarfile
+import tempfile
+import threading
+import time
+import warnings
+import zipfile
+import zlib
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
 
 
 # some default colors for adding a stamp to your render (Red, Green, Blue, Opacity)
@@ -46,6 +76,7 @@ class Mesh2Img(object):
     DEFAULT_CAMERA_COORDS = (0, 0, 10.0)  # by default our camera sits 10 units above the origin
     DEFAULT_CAMERA_ROTATION = (0, 0, 0)  # the camera points down on our mesh
     DEFAULT_OUTPUT_TEMPLATE = "{filepath}_{width}.{ext}"  # this will generate the image next to the original mesh file
+    DEFAULT_SERVER_ADDRESS = 'localhost:8765'  # where serve() listens by default
     IMAGE_FORMATS = {
         # file extensions with their render.image_settings.file_format string counterpart
         'bmp': 'BMP',
@@ -58,11 +89,31 @@ class Mesh2Img(object):
         '.stl': bpy.ops.import_mesh.stl,    #ops.import_mesh.stl if it doesn't work for some reason replace them with this
         '.ply': bpy.ops.import_mesh.ply,    #ops.import_mesh.ply
     }
+    # the same file types opened with the NumPy readers below instead, for Mesh2Img(fast_import=True). Filled in at the
+    # bottom of this script because those functions aren't defined yet.
+    FAST_MESH_TYPES = {}
+    RENDER_PROFILES = {
+        # name -> render settings. max_size is the biggest image (longest side in pixels) that 'auto' uses it for.
+        'draft': {'engine': 'BLENDER_WORKBENCH', 'samples': 1, 'max_size': 256},
+        'thumbnail': {'engine': 'BLENDER_EEVEE', 'samples': 16, 'max_size': 1024},
+        'catalog': {'engine': 'CYCLES', 'samples': 64, 'denoise': True, 'tile_size': 256, 'max_size': None},
+    }
+    PROFILE_ORDER = ('draft', 'thumbnail', 'catalog')  # cheapest first, which is the order 'auto' tries them in
+    TURNTABLE_TILT = 60.0  # degrees from looking straight down that the turntable views are tilted
+    TRIANGLES_PER_PIXEL = 1.0  # with triangle_budget='auto', this many triangles per pixel of the biggest image
+    # keys of to_dict() that have no effect on the rendered images (so they're left out of settings_fingerprint)
+    UNRENDERED_SETTINGS = ('paths', 'verbose', 'execute_time', 'report', 'manifest', 'fast_import',
+                           'reset_interval', 'metrics', 'async_writes', 'write_queue', 'include', 'exclude',
+                           'max_depth', 'min_size', 'max_size', 'order', 'dedup', 'sink_part')
 
 #when your ready to put the material paramter put this below 'material=None'.
     def __init__(self, paths=None, dimensions=None, image_format=None, verbose=False,
                  output_template=DEFAULT_OUTPUT_TEMPLATE, max_dim=7.0, camera_coords=DEFAULT_CAMERA_COORDS,
-                 camera_rotation=DEFAULT_CAMERA_ROTATION, jpeg_quality=80):
+                 camera_rotation=DEFAULT_CAMERA_ROTATION, jpeg_quality=80, workers=1, manifest=None,
+                 render_once=False, fast_import=False, reset_interval=500, metrics=None, triangle_budget=None,
+                 views=None, turntable=0, sprite_sheet=False, profile=None, async_writes=0, write_queue=8,
+                 include=None, exclude=None, max_depth=None, min_size=None, max_size=None, order='walk', dedup=None,
+                 sink=None, journal=None, mesh_timeout=None, mesh_memory=None):
         """
         Creates a new batch job. Does not start processing paths until you call .start(). You don't have to pass
         anything in at creation time, but at least one path and one set of image dimensions are required for anything
@@ -77,6 +128,53 @@ class Mesh2Img(object):
         :param camera_coords: an (X, Y, Z) tuple to define where the camera should be positioned
         :param camera_rotation: an (X, Y, Z) tuple to define the rotation of the camera in degrees
         :param jpeg_quality: if JPEG is the output format, this determines the quality of the compression (1-100)
+        :param workers: the number of Blender processes to render with. More than 1 hands the batch off to a RenderFarm
+        :param manifest: path to a manifest file. Meshes whose file and settings haven't changed since they were last
+                         rendered into it (and whose images still exist) are skipped. See the Manifest class.
+        :param render_once: if True, each mesh is rendered only once per aspect ratio at the biggest size asked for and
+                            the smaller images are shrunk down from that render instead of being rendered again
+        :param fast_import: if True, STL and PLY files are read with the NumPy readers in FAST_MESH_TYPES instead of
+                            Blender's import operators. Much faster and lighter on memory for big meshes.
+        :param reset_interval: after this many meshes, unused datablocks are purged and the scene is prepared again.
+                               0 or None never resets.
+        :param metrics: path to a JSON-lines file to record how long each stage took for every mesh, followed by a
+                        summary of the whole run. See the RunMetrics class.
+        :param triangle_budget: meshes with more triangles than this are decimated down to it before rendering. 'auto'
+                                works out the budget from the biggest image being made (see TRIANGLES_PER_PIXEL).
+                                None leaves every mesh as it is.
+        :param views: a list of camera views to render every mesh from, all from one import. Each one is either a
+                      CameraView, a preset name like 'front' or 'iso' (see CameraView.PRESETS), or a dictionary from
+                      CameraView.to_dict. Use the {view} placeholder in output templates to name the images.
+        :param turntable: if more than 0, adds this many views going around the mesh
+        :param sprite_sheet: if True, the views of each mesh are packed into one image per job template (a grid going
+                             left to right, top to bottom) instead of being saved one by one
+        :param profile: the render profile for all output images (see RENDER_PROFILES), 'auto' to pick one per image
+                        size, or None to keep the scene's render settings. For finer control, use add_job_template.
+        :param async_writes: if more than 0, PNG, BMP and TIFF images are encoded and written to disk by this many
+                             background threads while the next render (or mesh) is already under way. See
+                             AsyncImageWriter. JPEGs are still written by Blender right away.
+        :param write_queue: with async_writes, the most images waiting to be written at once. Rendering waits when
+                            there are this many, so memory use stays capped.
+        :param include: glob patterns (like '*.stl' or 'parts/**/*.ply') of the files to render in the directories
+                        given in paths. See MeshDiscovery.
+        :param exclude: glob patterns of files and directories to leave out
+        :param max_depth: how many levels of subdirectories to search (0 only looks in the given directories)
+        :param min_size: leave out mesh files smaller than this many bytes
+        :param max_size: leave out mesh files bigger than this many bytes
+        :param order: the order to render the meshes in. 'walk' starts with the first one found while the directories
+                      are still being searched. 'name', 'largest' and 'smallest' find every file first and sort them.
+        :param dedup: 'bytes' renders each byte-identical mesh file only once, 'geometry' each mesh with the same
+                      triangles (even from an ASCII and a binary file, or a PLY and an STL). The images of the
+                      duplicates are hardlinked (or copied) from the first one's. None renders every file.
+        :param sink: where to put all output images instead of one file each, like 'zip:/out/thumbs.zip',
+                     'tar:/out/thumbs.tar' or 'sqlite:/out/thumbs.db'. For finer control, use add_job_template.
+        :param journal: path to a journal file (see Journal). Meshes that the journal says were already rendered (or
+                        failed) are skipped, so a batch that was stopped picks up where it left off. A mesh that fails
+                        is recorded and the batch goes on instead of stopping.
+        :param mesh_timeout: the most seconds one mesh may take. A mesh that takes longer is quarantined (see
+                             RenderFarm). Setting this or mesh_memory renders the batch with a RenderFarm even with
+                             only 1 worker.
+        :param mesh_memory: the most bytes of memory a worker may use while rendering a mesh before it's quarantined
         """
         if paths is not None:
             if isinstance(paths, str):  # if they gave us just 1 path instead of a list of paths
@@ -91,10 +189,54 @@ class Mesh2Img(object):
         self.camera_coords = camera_coords
         self.camera_rotation = camera_rotation
         self.execute_time = datetime.now().strftime('%Y-%m-%d_%H%M%S')
+        self.workers = int(workers or 1)
+        self.report = None  # path to a JSON-lines file where each mesh's outcome is recorded (used by farm workers)
+        self.sink_part = None  # the name of the part of each zip or tar sink this farm worker writes (see open_sink)
+        self.manifest = manifest
+        self._manifest = None  # the loaded Manifest object while start() is running
+        self._fingerprint = None
+        self.render_once = bool(render_once)
+        self.fast_import = bool(fast_import)
+        self.reset_interval = reset_interval
+        self._meshes_since_reset = 0
+        self._startup_datablocks = None
+        self.metrics = RunMetrics(metrics)
+        self.triangle_budget = triangle_budget if triangle_budget in (None, 'auto') else int(triangle_budget)
+        distance = math.sqrt(sum(c * c for c in camera_coords)) or 10.0
+        self.views = []
+        for view in views or []:
+            if isinstance(view, dict):
+                view = CameraView(**view)
+            elif not isinstance(view, CameraView):
+                view = CameraView.parse(view, distance)
+            self.views.append(view)
+        self.turntable = int(turntable or 0)
+        self.sprite_sheet = bool(sprite_sheet)
+        self.async_writes = int(async_writes or 0)
+        self.write_queue = int(write_queue or 1)
+        self._writer = None  # the AsyncImageWriter while start() is running
+        self._mesh_writes = []  # the pending writes of the mesh being processed
+        self._unfinished = collections.deque()  # (path, outputs, writes, extra, sha1) of meshes still being written
+        self.include = list(include or [])
+        self.exclude = list(exclude or [])
+        self.max_depth = max_depth
+        self.min_size = min_size
+        self.max_size = max_size
+        if order not in MeshDiscovery.ORDERS:
+            raise ValueError("%s is not a discovery order. Use one of %s." % (order, ', '.join(MeshDiscovery.ORDERS)))
+        self.order = order
+        self.dedup = dedup or None
+        self._duplicates = DuplicateFinder(self.dedup) if self.dedup else None
+        self._renders = {}  # mesh path -> (outputs, writes, seconds) of the meshes the DuplicateFinder knows about
+        self.dedup_stats = {'unique': 0, 'duplicates': 0, 'seconds_saved': 0.0}
+        self.journal = journal
+        self._journal = None  # the loaded Journal object while start() is running
+        self.mesh_timeout = float(mesh_timeout) if mesh_timeout else None
+        self.mesh_memory = int(mesh_memory) if mesh_memory else None
         if dimensions:
             for d in dimensions:
                 self.add_job_template(d, output_template=output_template, image_format=image_format,
-                                      jpeg_quality=jpeg_quality)
+                                      jpeg_quality=jpeg_quality, profile=profile, sink=sink)
 
     @property
     def verbose(self):
@@ -109,7 +251,7 @@ class Mesh2Img(object):
             logging.getLogger().setLevel(logging.WARNING)
 
     def add_job_template(self, dimensions, output_template=DEFAULT_OUTPUT_TEMPLATE, image_format='png',
-                         jpeg_quality=80):
+                         jpeg_quality=80, profile=None, sink=None):
         """
         For each mesh found when start() is called, each job template is called. You can call this function multiple
         times to define multiple file sizes and types for each mesh.
@@ -120,23 +262,114 @@ class Mesh2Img(object):
         See also JobTemplate.__init__
         """
         logging.debug("Adding job template as %s" % locals())
-        self._job_templates.append(JobTemplate(dimensions, output_template, image_format, jpeg_quality=jpeg_quality))
+        self._job_templates.append(JobTemplate(dimensions, output_template, image_format, jpeg_quality=jpeg_quality,
+                                               profile=profile, sink=sink))
+
+    def to_dict(self):
+        """
+        Describes this batch as a JSON-friendly dictionary. Mesh2Img.from_dict turns it back into a batch, which is how
+        the settings get handed to the worker processes of a RenderFarm.
+
+        :return: a dictionary of the paths, settings, and job templates of this batch
+        """
+        return {
+            'paths': list(self.filepaths),
+            'verbose': self.verbose,
+            'max_dim': self.max_dim,
+            'camera_coords': [float(c) for c in self.camera_coords],
+            'camera_rotation': [float(c) for c in self.camera_rotation],
+            'execute_time': self.execute_time,
+            'report': self.report,
+            'sink_part': self.sink_part,
+            'manifest': self.manifest,
+            'render_once': self.render_once,
+            'fast_import': self.fast_import,
+            'reset_interval': self.reset_interval,
+            'metrics': self.metrics.filepath,
+            'triangle_budget': self.triangle_budget,
+            'views': [view.to_dict() for view in self.views],
+            'turntable': self.turntable,
+            'sprite_sheet': self.sprite_sheet,
+            'async_writes': self.async_writes,
+            'write_queue': self.write_queue,
+            'include': self.include,
+            'exclude': self.exclude,
+            'max_depth': self.max_depth,
+            'min_size': self.min_size,
+            'max_size': self.max_size,
+            'order': self.order,
+            'dedup': self.dedup,
+            'job_templates': [jt.to_dict() for jt in self._job_templates],
+        }
+
+    @classmethod
+    def from_dict(cls, settings):
+        """
+        Creates a batch from a dictionary made by Mesh2Img.to_dict.
+
+        :param settings: the dictionary describing the batch
+        :return: a new Mesh2Img object
+        """
+        batch = cls(paths=settings['paths'], verbose=settings.get('verbose', False),
+                    max_dim=settings.get('max_dim', 7.0),
+                    camera_coords=tuple(settings.get('camera_coords', cls.DEFAULT_CAMERA_COORDS)),
+                    camera_rotation=tuple(settings.get('camera_rotation', cls.DEFAULT_CAMERA_ROTATION)),
+                    manifest=settings.get('manifest'), render_once=settings.get('render_once', False),
+                    fast_import=settings.get('fast_import', False),
+                    reset_interval=settings.get('reset_interval', 500), metrics=settings.get('metrics'),
+                    triangle_budget=settings.get('triangle_budget'), views=settings.get('views'),
+                    turntable=settings.get('turntable', 0), sprite_sheet=settings.get('sprite_sheet', False),
+                    async_writes=settings.get('async_writes', 0), write_queue=settings.get('write_queue', 8),
+                    include=settings.get('include'), exclude=settings.get('exclude'),
+                    max_depth=settings.get('max_depth'), min_size=settings.get('min_size'),
+                    max_size=settings.get('max_size'), order=settings.get('order', 'walk'),
+                    dedup=settings.get('dedup'))
+        batch.execute_time = settings.get('execute_time') or batch.execute_time  # keep {exec_time} the same everywhere
+        batch.report = settings.get('report')
+        batch.sink_part = settings.get('sink_part')
+        for jt in settings.get('job_templates', []):
+            batch.add_job_template(**jt)
+        return batch
+
+    def settings_fingerprint(self):
+        """
+        Makes a short hash of every setting that changes what the output images look like or where they go. If any of
+        them change, every mesh in the manifest has to be rendered again.
+
+        :return: a hex digest string
+        """
+        settings = self.to_dict()
+        for key in self.UNRENDERED_SETTINGS:
+            settings.pop(key, None)
+        return hashlib.sha1(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()
+
+    @classmethod
+    def load_job(cls, job_file):
+        """
+        Creates a batch from a JSON file containing the output of Mesh2Img.to_dict.
+
+        :param job_file: the path to the JSON file
+        :return: a new Mesh2Img object
+        """
+        with open(job_file) as f:
+            return cls.from_dict(json.load(f))
 
     @classmethod
-    def open_mesh(cls, filepath):
+    def open_mesh(cls, filepath, mesh_types=None):
         """
         Opens a mesh file using the function defined in Mesh2Img.MESH_TYPES and returns the object. Makes sure that
         all other objects have been deselected except the new mesh object. It also centers the mesh object to the
         origin.
 
         :param filepath: the path to the mesh file
+        :param mesh_types: a dictionary like MESH_TYPES to look up the function in instead (like FAST_MESH_TYPES)
         :return: the object representing the newly imported mesh
         """
         print(filepath)
         logging.info("Opening mesh from %s" % filepath)
         ext = os.path.splitext(filepath)[1].lower()
 
-        cls.MESH_TYPES[ext](filepath=filepath)  # calls the function associated with this extension
+        (mesh_types or cls.MESH_TYPES)[ext](filepath=filepath)  # calls the function associated with this extension
         mesh = context.selected_objects[0]
         for obj in bpy.context.selected_objects:   # deselect EVERYTHING
             obj.select_set(False)
@@ -155,31 +388,356 @@ class Mesh2Img(object):
             raise ValueError("No jobs given so there's nothing for me to do with these meshes. "
                              "Try calling `add_job_template` first to define image sizes and output locations.")
 
-        # prepare the scene
+        if self.workers > 1 or self.mesh_timeout or self.mesh_memory:  # let a farm of Blender processes do the work
+            return RenderFarm(self, workers=self.workers).run()
+
+        self.metrics.begin_run(self.execute_time)
+        self._open_manifest(compact=not self.report)  # farm workers share the manifest, so leave it as it is
+        self._journal = Journal(self.journal) if self.journal else None
+        self._prepare_scene()
+        self.open_sinks()
+        if self.async_writes:
+            self._writer = AsyncImageWriter(self.async_writes, self.write_queue)
+        discovery = self._iter_paths()
+        try:
+            for count, filepath in enumerate(self.metrics.timed_iter('discovery', discovery), 1):
+                logging.info("Mesh %d of %s", count, discovery.total or '%d found so far' % discovery.found)
+                self._render_file(filepath)
+            with self.metrics.stage('write_wait'):
+                self._finish_meshes(wait=True)
+        finally:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            close_sinks()
+        if not self.report:  # a farm's coordinator sums up all of its workers at the end instead
+            self.metrics.write_summary()
+            if self.dedup:
+                self.print_dedup_stats()
+
+    def open_sinks(self, job_templates=None):
+        """
+        Opens the output sinks of the job templates (see OutputSink) so images can be written to them.
+
+        :param job_templates: the JobTemplates to open the sinks of (defaults to this batch's)
+        """
+        for jt in job_templates or self._job_templates:
+            if jt.sink:
+                open_sink(jt.sink, part=self.sink_part)
+
+    def print_dedup_stats(self):
+        """
+        Prints how many meshes were duplicates and about how much rendering time that saved.
+        """
+        stats = self.dedup_stats
+        print("%d of %d meshes were duplicates and copied instead of rendered (about %.1fs of rendering saved)" % (
+            stats['duplicates'], stats['unique'] + stats['duplicates'], stats['seconds_saved']))
+
+    def _open_manifest(self, compact=True):
+        """
+        Loads the manifest file (if one was given) so that unchanged meshes can be skipped.
+
+        :param compact: if True, the manifest file is rewritten without any outdated entries first
+        :return: the Manifest object or None if no manifest is being used
+        """
+        if not self.manifest:
+            self._manifest = None
+            return None
+        self._manifest = Manifest(self.manifest)
+        if compact:
+            self._manifest.compact()
+        self._fingerprint = self.settings_fingerprint()
+        return self._manifest
+
+    def serve(self, address=DEFAULT_SERVER_ADDRESS):
+        """
+        Prepares the scene once and then renders meshes as they are requested over HTTP until interrupted. This saves
+        the Blender startup and scene preparation on every mesh when they come in one at a time.
+
+        POST /render with a JSON body of {"path": "/some/mesh.stl"} renders that mesh with this batch's job templates.
+        The body can also have a "job_templates" list (in the format of JobTemplate.to_dict) to use instead. The reply
+        is {"status": "ok", "outputs": [image paths], "seconds": render time} or {"status": "failed", "error": ...}.
+        GET /status replies with {"status": "ready", "rendered": meshes rendered so far}.
+
+        :param address: 'host:port' to listen on. Keep this on localhost, there's no authentication.
+        """
+        host, _, port = address.rpartition(':')
+        server = http.server.HTTPServer((host or 'localhost', int(port)), RenderRequestHandler)
+        server.batch = self
+        server.rendered = 0
+        self._prepare_scene()
+        print("Mesh2Img is waiting for render requests on http://%s:%s" % server.server_address[:2])
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            close_sinks()
+
+    def render_request(self, filepath, job_templates=None):
+        """
+        Renders one mesh into the already prepared scene. This is what serve() calls for each request.
+
+        :param filepath: the path to a mesh file
+        :param job_templates: a list of dictionaries (see JobTemplate.to_dict) to use instead of this batch's job
+                              templates
+        :return: a list of the image paths that were written
+        """
+        saved_templates = self._job_templates
+        if job_templates:
+            self._job_templates = [JobTemplate(**jt) for jt in job_templates]
+        self.metrics.begin_mesh(filepath)
+        status = 'failed'
+        try:
+            if not self._job_templates:
+                raise ValueError("No job templates were given for %s" % filepath)
+            self.open_sinks()
+            outputs = self._process_file(filepath)
+            flush_sinks()  # so whoever asked can read the images right away
+            status = 'ok'
+            return outputs
+        finally:
+            self.metrics.end_mesh(status)
+            self._job_templates = saved_templates
+            self._count_mesh()
+
+    def render_arrays(self, vertices, faces, job_templates=None, name='mesh'):
+        """
+        Renders a mesh that's already in memory and returns the images instead of saving them, for services that have
+        their meshes as arrays already. Nothing is read from or written to disk, except for the images Blender renders,
+        which go through a RAM-backed scratch folder where there is one (see scratch_path). The scene is prepared the
+        first time this is called and kept for the next calls.
+
+        :param vertices: an array of shape (N, 3) with the vertex positions
+        :param faces: an array of shape (M, 3) with the vertex indexes of each triangle
+        :param job_templates: a list of dictionaries (see JobTemplate.to_dict) to use instead of this batch's job
+                              templates. They don't need an output template or sink, since those don't matter here.
+        :param name: the name for the mesh object (and the {basename} of the images, which only shows in the logs)
+        :return: a list of the encoded image files as bytes, one per job template in order (for each camera view in
+                 turn, or one sprite sheet per job template)
+        """
+        if self._startup_datablocks is None:
+            self._prepare_scene()
+        sink = 'memory:/mesh2img_memory/%d' % next(_memory_sinks)
+        saved_templates = self._job_templates
+        templates = [jt.to_dict() for jt in saved_templates] if job_templates is None else job_templates
+        self._job_templates = []
+        for i, jt in enumerate(templates):  # every image gets a name of its own, whatever the output template
+            self._job_templates.append(JobTemplate(**dict(jt, output_template='%d_{view}.{ext}' % i, sink=sink)))
+        open_sink(sink)
+        self.metrics.begin_mesh(name)
+        status = 'failed'
+        try:
+            if not self._job_templates:
+                raise ValueError("No job templates were given for %s" % name)
+            with self.metrics.stage('import'):
+                mesh = mesh_from_arrays(name, vertices, faces)
+                ops.object.origin_set(type='GEOMETRY_ORIGIN')  # center the mesh at the origin point like open_mesh
+            images = [read_output(output) for output in self._render_mesh(mesh, name)]
+            status = 'ok'
+            return images
+        finally:
+            self.metrics.end_mesh(status)
+            self._job_templates = saved_templates
+            close_sink(sink)
+            self._count_mesh()
+
+    def render_stl_bytes(self, stl_data, job_templates=None, name='mesh'):
+        """
+        Renders a binary or ASCII STL file that's already in memory (like an upload) and returns the images. See
+        render_arrays.
+
+        :param stl_data: the contents of the STL file as bytes
+        :param job_templates: a list of dictionaries (see JobTemplate.to_dict) to use instead of this batch's job
+                              templates
+        :param name: the name for the mesh object
+        :return: a list of the encoded image files as bytes, like render_arrays
+        """
+        vertices, faces = read_stl_bytes(stl_data)
+        return self.render_arrays(vertices, faces, job_templates=job_templates, name=name)
+
+    def _prepare_scene(self):
+        """
+        Gets the default scene ready for rendering meshes.
+        """
         delete_object_by_name("Cube", ignore_errors=True)  # factory default Blender has a cube in the default scene
-        camera_params = self.camera_coords + self.camera_rotation
+        camera_params = tuple(self.camera_coords) + tuple(self.camera_rotation)
         set_camera(*camera_params)  # take picture from 10 units away
+        if self._startup_datablocks is None:  # remember what was there before we started so we never purge it
+            self._startup_datablocks = datablock_pointers()
 
-        for filepath in self.filepaths:
-            if os.path.isdir(filepath):
-                self._process_dir(filepath)
+    def _count_mesh(self):
+        """
+        Keeps count of the meshes processed since the last scene reset and resets the scene when it's time.
+        """
+        self._meshes_since_reset += 1
+        if self.reset_interval and self._meshes_since_reset >= self.reset_interval:
+            self._reset_scene()
+
+    def _reset_scene(self):
+        """
+        Clears out anything left behind by the meshes rendered so far and prepares the scene again. Called every
+        self.reset_interval meshes so memory use stays flat on long batches.
+        """
+        logging.info("Resetting the scene after %d meshes", self._meshes_since_reset)
+        purge_orphans(keep=self._startup_datablocks)
+        self._prepare_scene()
+        self._meshes_since_reset = 0
+
+    def expand_paths(self):
+        """
+        Expands self.filepaths into the list of mesh files that start() would process, in the order it would process
+        them. Directories are searched recursively for every mesh file defined in MESH_TYPES that passes the include,
+        exclude, depth and size filters.
+
+        :return: a list of paths to mesh files
+        """
+        return list(self._iter_paths())
+
+    def _iter_paths(self):
+        """
+        :return: a MeshDiscovery that finds every mesh file in self.filepaths on a background thread while they're
+                 being rendered
+        """
+        return MeshDiscovery(self.filepaths, self.MESH_TYPES, include=self.include, exclude=self.exclude,
+                             max_depth=self.max_depth, min_size=self.min_size, max_size=self.max_size,
+                             order=self.order)
+
+    def _render_file(self, filepath):
+        """
+        Processes a single mesh file unless the manifest says it's already been rendered. If self.report is set, the
+        outcome is appended to that file and a failing mesh does not stop the batch. Otherwise any exception is raised
+        as usual.
+
+        :param filepath: the path to a mesh file
+        """
+        if self._journal is not None and self._journal.is_finished(filepath):
+            logging.info("Skipping %s because the journal says it was already done", filepath)
+            return
+        if self._manifest is not None and self._manifest.is_current(filepath, self._fingerprint):
+            logging.info("Skipping %s because it hasn't changed since it was last rendered", filepath)
+            self._record(filepath, 'skipped', outputs=self._manifest.outputs(filepath))
+            return
+        self._record(filepath, 'started', time=time.time())  # so whoever watches knows what this is stuck on
+        self.metrics.begin_mesh(filepath)
+        self._mesh_writes = []
+        extra = {}  # more details for the report
+        try:
+            key = original = outputs = digest = None
+            if self._duplicates is not None:
+                with self.metrics.stage('hash'):
+                    key = self._duplicates.key(filepath)
+                    original = self._duplicates.match(key)
+                if key[0][0] == 'sha1':  # the manifest wants the same hash
+                    digest = key[0][1]
+            if self._manifest is not None and digest is None:
+                with self.metrics.stage('hash'):
+                    digest = file_digest(filepath)
+            if original is not None:
+                outputs = self._copy_duplicate(filepath, original)
+            if outputs is None:
+                started = time.perf_counter()
+                outputs = self._process_file(filepath)
+                if key is not None:
+                    self._duplicates.add(key, filepath)
+                    self._renders[filepath] = (outputs, self._mesh_writes, time.perf_counter() - started)
+                    self.dedup_stats['unique'] += 1
             else:
-                self._process_file(filepath)
+                extra['duplicate_of'] = original
+        except KeyboardInterrupt:
+            self._record(filepath, 'interrupted')  # it wasn't this mesh's fault, so don't quarantine it next time
+            raise
+        except Exception as ex:
+            self.metrics.end_mesh('failed')
+            if not self.report and self._journal is None:
+                raise
+            logging.exception("Failed to process %s", filepath)
+            self._record(filepath, 'failed', error=repr(ex))
+            return
+        else:
+            self.metrics.end_mesh('ok')
+        finally:
+            self._count_mesh()
+        self._unfinished.append((filepath, outputs, self._mesh_writes, extra, digest))
+        self._finish_meshes()
+
+    def get_output_paths(self, filepath):
+        """
+        :param filepath: the path to a mesh file
+        :return: the paths of the images that rendering this mesh makes, in the order _save_images returns them
+        """
+        views = self.get_views()
+        if not views:
+            names = [None]
+        elif self.sprite_sheet:
+            names = ['sheet']
+        else:
+            names = [view.name for view in views]
+        return [jt.get_output_path(filepath, exec_time=self.execute_time, view=name)
+                for name in names for jt in self._job_templates]
 
-    def _process_dir(self, filepath):
+    def _copy_duplicate(self, filepath, source):
         """
-        Given the path to a folder, recursively enters each directory in the tree to process every mesh file defined
-        in MESH_TYPES.
+        Makes the images of a mesh out of the images of an identical one that was already rendered.
 
-        :param filepath: a full path to the directory to recurse through
+        :param filepath: the path to the duplicate mesh file
+        :param source: the path to the mesh that was rendered
+        :return: the image paths that were made, or None if the original's images couldn't be written (so this mesh
+                 has to be rendered after all)
         """
-        for folder, subfolders, filenames in os.walk(filepath):  # recurse directory
-            logging.debug("Entering %s", folder)
-            for filename in filenames:  # for each file in this directory
-                ext = os.path.splitext(filename)[1].lower()
-                if ext in self.MESH_TYPES:  # if this is a known mesh file type
-                    file = os.path.join(folder, filename)  # this is the full path to that file
-                    self._process_file(file)  # process this file now
+        source_outputs, writes, seconds = self._renders[source]
+        if any(write.exception() is not None for write in writes):  # this waits for any writes still going
+            return None
+        logging.info("%s is a duplicate of %s, so its images are copied", filepath, source)
+        outputs = self.get_output_paths(filepath)
+        with self.metrics.stage('link'):
+            for source_output, output in zip(source_outputs, outputs):
+                link_or_copy(source_output, output, source=filepath)
+        self.metrics.set('duplicate_of', source)
+        self.dedup_stats['duplicates'] += 1
+        self.dedup_stats['seconds_saved'] += seconds
+        return outputs
+
+    def _finish_meshes(self, wait=False):
+        """
+        Records the meshes whose images have all been written in the manifest and the report, in the order they were
+        rendered. A mesh only counts as rendered once its images are on disk, so with async_writes this happens a
+        little after _render_file returns. If one of its images couldn't be written, the mesh is failed instead.
+
+        :param wait: if True, waits for every image still being written. Otherwise stops at the first mesh that isn't
+                     done yet.
+        """
+        while self._unfinished:
+            filepath, outputs, writes, extra, digest = self._unfinished[0]
+            if not wait and not all(write.done() for write in writes):
+                return
+            self._unfinished.popleft()
+            errors = [write.exception() for write in writes if write.exception() is not None]
+            if errors:
+                if not self.report and self._journal is None:
+                    raise errors[0]
+                logging.error("Failed to write the images of %s: %r", filepath, errors[0])
+                self._record(filepath, 'failed', error=repr(errors[0]))
+                continue
+            if self._manifest is not None:
+                self._manifest.record(filepath, self._fingerprint, outputs, digest)
+            self._record(filepath, 'ok', outputs=outputs, **extra)
+
+    def _record(self, filepath, status, **details):
+        """
+        Adds how a mesh turned out to the report and the journal (if there are any).
+
+        :param filepath: the path to the mesh file
+        :param status: 'started', 'ok', 'failed', 'skipped' or 'interrupted'
+        :param details: more to record, like 'outputs' or 'error'
+        """
+        if self.report:
+            record = {'path': filepath, 'status': status}
+            record.update(details)
+            append_json_line(self.report, record)
+        if self._journal is not None and status != 'skipped':
+            self._journal.record(filepath, status, **details)
 
     def _process_file(self, filepath, leave_mesh_open=False):
         """
@@ -187,32 +745,257 @@ class Mesh2Img(object):
 
         :param filepath: the path to a mesh file
         :param leave_mesh_open: by default, the mesh object is removed from the scene after the image is saved
+        :return: a list of the image paths that were written
+        """
+        with self.metrics.stage('import'):
+            with local_copy(filepath) as local_path:  # meshes inside archives are copied out for as long as this takes
+                mesh = self.open_mesh(local_path, self.FAST_MESH_TYPES if self.fast_import else None)
+        return self._render_mesh(mesh, filepath, leave_mesh_open)
+
+    def _render_mesh(self, mesh, filepath, leave_mesh_open=False):
+        """
+        Scales (and maybe decimates) a mesh that was just added to the scene and then saves one image per job template.
+
+        :param mesh: the mesh object
+        :param filepath: the path to its mesh file (used to name the output images)
+        :param leave_mesh_open: by default, the mesh object is removed from the scene after the image is saved
+        :return: a list of the image paths that were written
+        """
+        try:
+            if self.metrics.enabled:
+                self.metrics.set('triangles', count_triangles(mesh))
+            with self.metrics.stage('scale'):
+                scale_mesh(mesh, max_dim=self.max_dim)
+            budget = self.get_triangle_budget()
+            if budget:
+                with self.metrics.stage('decimate'):
+                    decimated = decimate_mesh(mesh, budget)
+                if decimated and self.metrics.enabled:
+                    self.metrics.set('triangles_rendered', count_triangles(mesh))
+            #if self.materials:
+                #self._apply_material(mesh, self.materials)
+
+            outputs = self._save_images(filepath)
+        finally:
+            if not leave_mesh_open:
+                with self.metrics.stage('teardown'):
+                    self._delete_mesh(mesh)  # even if something failed, so it isn't in the next mesh's picture
+        return outputs
+
+    def get_triangle_budget(self):
+        """
+        :return: the most triangles a mesh may have before it's decimated, or None if meshes aren't decimated
+        """
+        if self.triangle_budget != 'auto':
+            return int(self.triangle_budget) if self.triangle_budget else None
+        if not self._job_templates:
+            return None
+        pixels = max(jt.width * jt.height for jt in self._job_templates)
+        return int(math.ceil(pixels * self.TRIANGLES_PER_PIXEL))
+
+    def get_views(self):
+        """
+        :return: the list of CameraViews each mesh is rendered from (the views followed by the turntable frames). An
+                 empty list means each mesh is rendered once from camera_coords and camera_rotation.
+        """
+        views = list(self.views)
+        if self.turntable:
+            distance = math.sqrt(sum(c * c for c in self.camera_coords)) or 10.0
+            for i in range(self.turntable):
+                views.append(CameraView.orbit('turntable%03d' % i, distance, self.TURNTABLE_TILT,
+                                              360.0 * i / self.turntable))
+        return views
+
+    def _save_images(self, filepath):
+        """
+        Saves one image of the current scene per job template (and per camera view, if there are any).
+
+        :param filepath: the path to the mesh file (used to name the output images)
+        :return: a list of the image paths that were written, in job template order (for each view in turn)
+        """
+        views = self.get_views()
+        if not views:
+            return self._save_view(filepath)
+        if self.sprite_sheet:
+            return self._save_sprite_sheets(filepath, views)
+        outputs = []
+        for view in views:
+            set_camera(*(tuple(view.coords) + tuple(view.rotation)))
+            outputs.extend(self._save_view(filepath, view.name))
+        return outputs
+
+    def _save_view(self, filepath, view=None):
         """
-        mesh = self.open_mesh(filepath)
-        scale_mesh(mesh, max_dim=self.max_dim)
-        #if self.materials:
-            #self._apply_material(mesh, self.materials)
+        Saves one image of the current scene, as the camera sees it right now, per job template.
 
+        :param filepath: the path to the mesh file (used to name the output images)
+        :param view: the name of the camera view, for the {view} placeholder of the output template
+        :return: a list of the image paths that were written, in job template order
+        """
+        if self.render_once:
+            return self._save_images_rendered_once(filepath, view)
+        outputs = []
         for jt in self._job_templates:
             logging.debug("Applying %s to %s", jt, filepath)
-            output_path = jt.get_output_path(filepath, exec_time=self.execute_time)
-            self.save_image(output_path, width=jt.width, height=jt.height, file_format=jt.image_format,
-                            jpeg_quality=jt.jpeg_quality)
-        if not leave_mesh_open:
-            self._delete_mesh(mesh)
+            output_path = jt.get_output_path(filepath, exec_time=self.execute_time, view=view)
+            if self._writes_async(jt):
+                self._write_pixels(self._render_pixels(jt), output_path, jt, source=filepath)
+            else:
+                with self.metrics.stage(self._render_stage(jt)):  # Blender also encodes and writes it
+                    self.save_image(output_path, width=jt.width, height=jt.height, file_format=jt.image_format,
+                                    jpeg_quality=jt.jpeg_quality, profile=jt.get_profile(), source=filepath)
+            outputs.append(output_path)
+        return outputs
+
+    def _save_images_rendered_once(self, filepath, view=None):
+        """
+        Like _save_view, but the scene is only rendered once per aspect ratio, at the biggest size any job template
+        with that aspect ratio asks for. Every other size is shrunk down from that render's pixels.
+
+        :param filepath: the path to the mesh file (used to name the output images)
+        :param view: the name of the camera view, for the {view} placeholder of the output template
+        :return: a list of the image paths that were written, in job template order
+        """
+        output_paths = [jt.get_output_path(filepath, exec_time=self.execute_time, view=view)
+                        for jt in self._job_templates]
+        for indexes in self._render_groups():
+            largest = max(indexes, key=lambda i: self._job_templates[i].width)
+            master = self._job_templates[largest]
+            if not self._writes_async(master) and (len(indexes) == 1 or (master.image_format == 'png' and
+                                                                        not master.sink)):
+                # this image has to be rendered anyway and a PNG is lossless, so it can double as the master render
+                # (unless it's in a sink, where Blender can't read it back from)
+                logging.debug("Applying %s to %s", master, filepath)
+                master_path = output_paths[largest]
+                with self.metrics.stage(self._render_stage(master)):
+                    self.save_image(master_path, width=master.width, height=master.height,
+                                    file_format=master.image_format, jpeg_quality=master.jpeg_quality,
+                                    profile=master.get_profile(), source=filepath)
+                if len(indexes) == 1:
+                    continue
+                with self.metrics.stage('read_master'):
+                    pixels = load_image_pixels(master_path)
+                remaining = [i for i in indexes if i != largest]
+            else:
+                pixels = self._render_pixels(master)
+                remaining = indexes
+
+            for i in remaining:
+                jt = self._job_templates[i]
+                logging.debug("Resampling %s for %s", jt, filepath)
+                self._write_pixels(pixels, output_paths[i], jt, resize=True, source=filepath)
+        return output_paths
+
+    def _save_sprite_sheets(self, filepath, views):
+        """
+        Renders the current scene from every view and saves one sprite sheet per job template instead of one image
+        per view. Each view fills a cell the size of the job template. The cells go left to right and top to bottom in
+        the order of the views.
+
+        :param filepath: the path to the mesh file (used to name the output images)
+        :param views: the CameraViews to render
+        :return: a list of the sprite sheet paths that were written, in job template order
+        """
+        columns = int(math.ceil(math.sqrt(len(views))))
+        rows = int(math.ceil(len(views) / float(columns)))
+        sheets = [np.zeros((rows * jt.height, columns * jt.width, 4), dtype=np.float32) for jt in self._job_templates]
+        groups = self._render_groups()
+        for cell, view in enumerate(views):
+            set_camera(*(tuple(view.coords) + tuple(view.rotation)))
+            row, column = divmod(cell, columns)
+            for indexes in groups:
+                master = self._job_templates[max(indexes, key=lambda i: self._job_templates[i].width)]
+                pixels = self._render_pixels(master)
+                for i in indexes:
+                    jt = self._job_templates[i]
+                    with self.metrics.stage('resample'):
+                        resized = resample_pixels(pixels, jt.width, jt.height)
+                    top = (rows - 1 - row) * jt.height  # the pixels are stored bottom row first
+                    sheets[i][top:top + jt.height, column * jt.width:(column + 1) * jt.width] = resized
+
+        output_paths = []
+        for jt, sheet in zip(self._job_templates, sheets):
+            output_path = jt.get_output_path(filepath, exec_time=self.execute_time, view='sheet')
+            self._write_pixels(sheet, output_path, jt, source=filepath)
+            output_paths.append(output_path)
+        return output_paths
+
+    def _writes_async(self, jt):
+        """
+        :return: True if the images of this JobTemplate are handed to the AsyncImageWriter instead of written right away
+        """
+        return self._writer is not None and jt.image_format in AsyncImageWriter.ENCODERS
+
+    def _write_pixels(self, pixels, output_path, jt, resize=False, source=None):
+        """
+        Saves rendered pixels as the image of a JobTemplate. With async_writes, the resizing, encoding and writing are
+        left to a background thread (which waits here only if the write queue is full). Otherwise it's all done now.
+
+        :param pixels: a NumPy array of RGBA pixels (see load_image_pixels). Don't change it afterwards.
+        :param output_path: the path to save the image to
+        :param jt: the JobTemplate the image is for
+        :param resize: if True, the pixels are resampled to the size of the JobTemplate first
+        :param source: the path to the mesh file the image is of (stored with the image by SQLite sinks)
+        """
+        size = (jt.width, jt.height) if resize else None
+        if self._writes_async(jt):
+            info = {'source': source, 'width': jt.width, 'height': jt.height, 'image_format': jt.image_format}
+            with self.metrics.stage('write_wait'):
+                self._mesh_writes.append(self._writer.submit(pixels, output_path, jt.image_format, size=size,
+                                                             info=info))
+            return
+        if size:
+            with self.metrics.stage('resample'):
+                pixels = resample_pixels(pixels, *size)
+        with self.metrics.stage('encode'):
+            self.save_pixels(pixels, output_path, file_format=jt.image_format, jpeg_quality=jt.jpeg_quality,
+                             source=source)
+
+    def _render_groups(self):
+        """
+        Groups the job templates that can share one render. With render_once, that's every job template with the same
+        aspect ratio and render profile. Otherwise each job template gets a render of its own.
+
+        :return: a list of lists of job template indexes
+        """
+        if not self.render_once:
+            return [[i] for i in range(len(self._job_templates))]
+        groups = {}  # (aspect ratio, profile) -> indexes of the job templates that can share a render
+        for i, jt in enumerate(self._job_templates):
+            groups.setdefault((Fraction(jt.width, jt.height), jt.get_profile()), []).append(i)
+        return list(groups.values())
+
+    def _render_pixels(self, jt):
+        """
+        Renders the current scene at the size of the given job template and reads the result back into memory.
+
+        :param jt: the JobTemplate to take the size from
+        :return: a NumPy array of RGBA pixels (see load_image_pixels)
+        """
+        master_path = scratch_path('master.png', memory=True)
+        with self.metrics.stage(self._render_stage(jt)):
+            self.save_image(master_path, width=jt.width, height=jt.height, pngcompression=0,
+                            profile=jt.get_profile())
+        with self.metrics.stage('read_master'):
+            return load_image_pixels(master_path)
+
+    @staticmethod
+    def _render_stage(jt):
+        """
+        :return: the metrics stage name for rendering the given JobTemplate, like 'render:200x200:draft'
+        """
+        profile = jt.get_profile()
+        return 'render:%dx%d%s' % (jt.width, jt.height, ':' + profile if profile else '')
 
 
     @staticmethod
     def _delete_mesh(mesh):
         """
-        Given a Blender object, removes it from the scene.
+        Given a Blender object, removes it from the scene along with its mesh data and materials.
         :param mesh: the Blender object
         """
-        name = mesh.name
-        print(name)
-        print(ops.object)
-        delete_object_by_name(name)
-
+        logging.debug("Removing object '%s'", mesh.name)
+        remove_object(mesh)
 
     @classmethod
     def command_line(cls):
@@ -230,14 +1013,15 @@ class Mesh2Img(object):
         parser = argparse.ArgumentParser('Mesh2Img',
                                          description="A utility for generating image previews of STL and PLY files "
                                                      "using Blender's Python scripting engine.")
-        parser.add_argument('-d', '--dimensions', type=str, nargs='+', required=True,
+        parser.add_argument('-d', '--dimensions', type=str, nargs='+',
                             help='Provide either at least 1 dimension or pair of dimensions to specify the size of the '
                                  'images to generate. i.e. `-d 400 800,600 2048` would create a 400x400, 800x600, and '
                                  '2048x2048 image for each STL or PLY file found.')
-        parser.add_argument('-p', '--paths', type=str, nargs='+', required=True,
+        parser.add_argument('-p', '--paths', type=str, nargs='+',
                             help='The path(s) to the mesh file(s). If a directory is given, all PLY and STL files in '
                                  'the entire directory tree are processed. A mixed list of file paths and folder paths '
-                                 'can be given.')
+                                 'can be given. Zip and tar files are searched like folders without extracting them, '
+                                 'and their images go in a folder named like the archive.')
         parser.add_argument('-v', '--verbose', action='store_true',
                             help="See more output logging to the command line.")
         parser.add_argument('-i', '--image-format', default='png', choices=cls.IMAGE_FORMATS.keys(), type=str,
@@ -252,6 +1036,10 @@ class Mesh2Img(object):
                                  " {filepath} (the full path of the input file except the extension), {height} (height "
                                  "of the output image in pixels), {src_ext} (the extension of the input file), "
                                  "{width} (width of the output image in pixels)")
+        parser.add_argument('--sink', type=str, metavar='SPEC',
+                            help="Write the images into one file instead of one file each: zip:/path, tar:/path or "
+                                 "sqlite:/path (a path ending in .zip, .tar, .db or .sqlite works too). The output "
+                                 "template names the images inside it. `files` (the default) writes plain files.")
         parser.add_argument('-x', '--max-dim', default=9.0, type=float,
                             help="Limit the size of the mesh to not exceed this length on any axis. Setting it too "
                                  "high will make it too large to fit in the image. Setting it too low will leave a lot "
@@ -260,15 +1048,105 @@ class Mesh2Img(object):
                             help="Where to position the camera. X,Y,Z separated by commas.")
         parser.add_argument('-r', '--camera-rotation', default='0.0,0.0,0.0', type=str,
                             help='The rotation of the camera in degrees for X,Y,Z.')
+        parser.add_argument('-w', '--workers', default=1, type=int,
+                            help="How many Blender processes to render with. The mesh files are split between them "
+                                 "by file size. Defaults to 1 (render everything in this process).")
+        parser.add_argument('--journal', type=str,
+                            help="Record how each mesh turned out in this file. When the batch is run again, the "
+                                 "meshes that were already rendered, failed, or quarantined are skipped. A mesh that "
+                                 "two crashed runs were stuck on is quarantined. Failing meshes don't stop the batch.")
+        parser.add_argument('--mesh-timeout', type=float, metavar='SECONDS',
+                            help="Quarantine any mesh that takes longer than this. The batch is rendered by worker "
+                                 "processes (even with --workers 1) that are restarted without the bad mesh.")
+        parser.add_argument('--mesh-memory', type=parse_size, metavar='SIZE',
+                            help="Quarantine any mesh that makes a worker use more memory than this (like 8G). "
+                                 "Linux only. Works like --mesh-timeout.")
+        parser.add_argument('--render-once', action='store_true',
+                            help="Render each mesh only once per aspect ratio at the biggest size given by "
+                                 "--dimensions and shrink that render down for the smaller sizes. Much faster when "
+                                 "several sizes are asked for.")
+        parser.add_argument('--fast-import', action='store_true',
+                            help="Read STL and PLY files with the built-in NumPy readers instead of Blender's "
+                                 "importers. Much faster for big meshes.")
+        parser.add_argument('--async-writes', default=0, type=int, metavar='THREADS',
+                            help="Encode and write PNG, BMP and TIFF images on this many background threads while "
+                                 "Blender goes on rendering. 0 (the default) writes each image before going on.")
+        parser.add_argument('--write-queue', default=8, type=int,
+                            help="With --async-writes, the most images waiting to be written before rendering waits "
+                                 "for them. Keeps memory use down.")
+        parser.add_argument('--include', type=str, nargs='+', metavar='PATTERN',
+                            help="Only render the mesh files in the --paths directories that match one of these glob "
+                                 "patterns, like `*.stl` or `parts/**/*.ply` (patterns without a / match file "
+                                 "names, the others match paths below the directory, where * stays inside one "
+                                 "folder and ** stands for any number of folders).")
+        parser.add_argument('--exclude', type=str, nargs='+', metavar='PATTERN',
+                            help="Leave out files and directories matching these glob patterns. Excluded directories "
+                                 "aren't searched at all.")
+        parser.add_argument('--max-depth', type=int,
+                            help="How many levels of subdirectories to search (0 only searches the given directories).")
+        parser.add_argument('--min-size', type=parse_size,
+                            help="Leave out mesh files smaller than this (in bytes, or like 100K, 5M or 1G).")
+        parser.add_argument('--max-size', type=parse_size,
+                            help="Leave out mesh files bigger than this (in bytes, or like 100K, 5M or 1G).")
+        parser.add_argument('--order', default='walk', choices=MeshDiscovery.ORDERS,
+                            help="The order to render meshes in. `walk` (the default) starts rendering as soon as the "
+                                 "first mesh is found. `name`, `largest` and `smallest` find all of them first.")
+        parser.add_argument('--dedup', choices=DuplicateFinder.MODES,
+                            help="Render identical meshes only once and hardlink (or copy) the images for the others. "
+                                 "`bytes` finds byte-for-byte copies. `geometry` finds meshes with the same triangles "
+                                 "even if they're stored differently (ASCII or binary, STL or PLY).")
+        parser.add_argument('--reset-interval', default=500, type=int,
+                            help="Clear out leftover data and prepare the scene again after this many meshes so "
+                                 "memory use stays flat on long batches. 0 turns this off.")
+        parser.add_argument('--metrics', type=str,
+                            help="Record the wall and CPU time of each stage (discovery, import, scaling, each "
+                                 "render, encoding, teardown), the triangle count, file size and peak memory of every "
+                                 "mesh to this JSON-lines file, followed by a summary of the whole run.")
+        parser.add_argument('--views', type=str, nargs='+',
+                            help="Render each mesh from all of these camera views after importing it once. Use "
+                                 "presets (%s) or name:X,Y,Z:RX,RY,RZ. Add {view} to the output template to name the "
+                                 "images (otherwise _<view> is added to the file name)."
+                                 % ', '.join(sorted(CameraView.PRESETS)))
+        parser.add_argument('--turntable', type=int, default=0,
+                            help="Also render this many views going around each mesh.")
+        parser.add_argument('--sprite-sheet', action='store_true',
+                            help="Pack the views of each mesh into one image per --dimensions (with {view} as "
+                                 "`sheet`) instead of saving every view by itself.")
+        parser.add_argument('--profile', choices=sorted(cls.RENDER_PROFILES) + ['auto'],
+                            help="Render with the engine and samples of this quality profile: draft (Workbench), "
+                                 "thumbnail (EEVEE) or catalog (Cycles on the CPU, denoised). `auto` picks the "
+                                 "cheapest one good enough for each image size. By default the scene's own render "
+                                 "settings are used.")
+        parser.add_argument('--triangle-budget', type=parse_triangle_budget,
+                            help="Decimate meshes with more triangles than this before rendering them. Use `auto` to "
+                                 "work it out from the biggest image size (one triangle per pixel), so small "
+                                 "thumbnails of huge meshes render quickly.")
+        parser.add_argument('--manifest', type=str,
+                            help="Keep track of what has been rendered in this file (e.g. next to your output images) "
+                                 "and skip meshes whose file and settings haven't changed since the last run, as long "
+                                 "as their images still exist.")
+        parser.add_argument('--serve', nargs='?', const=cls.DEFAULT_SERVER_ADDRESS, metavar='HOST:PORT',
+                            help="Instead of rendering --paths, keep Blender running and render the meshes that are "
+                                 "sent to this address (default %s) with mesh2img_client.py or an HTTP POST to "
+                                 "/render. --dimensions become the default job templates for each request."
+                                 % cls.DEFAULT_SERVER_ADDRESS)
+        parser.add_argument('--job-file', type=str,
+                            help="Run the batch described in this JSON file instead (see Mesh2Img.to_dict). This is "
+                                 "how --workers hands work to each Blender process.")
         #parser.add_argument('-m', '--material', type=str,
                             #help="One or more names of materials to apply to the mesh before rendering. "
                                  #"Material must exist in your default scene already. Separate names by comma.")
 
         args = parser.parse_args(sys.argv[index:]).__dict__
+        if args['job_file']:
+            return {'job_file': args['job_file']}
+        if not args['serve'] and (not args['dimensions'] or not args['paths']):
+            parser.error("the following arguments are required: -d/--dimensions, -p/--paths")
+        del args['job_file']
 
         # we're going to fix up the dimensions list real quick
         dimensions = []
-        for d in args['dimensions']:
+        for d in args['dimensions'] or []:
             split = d.split(',')  # is a pair
             if len(split) == 1:  # is it just one element?
                 dimensions.append(split[0])  # just put the one element in there
@@ -285,7 +1163,8 @@ class Mesh2Img(object):
     def save_image(cls, filepath, width, height=None, file_format='png', antialiasing_samples=16,
                    resolution_percentage=100, jpeg_quality=100, pngcompression=100, color_depth=8,
                    allow_transparency=True, watermark=None, watermark_size=18, watermark_metadata=False,
-                   watermark_foreground=WATERMARK_WHITE, watermark_background=WATERMARK_TRANSLUCENT_BLACK):
+                   watermark_foreground=WATERMARK_WHITE, watermark_background=WATERMARK_TRANSLUCENT_BLACK,
+                   profile=None, source=None):
         """
         Saves an image of the current scene at the specified size, format, and location.
 
@@ -308,24 +1187,18 @@ class Mesh2Img(object):
                                      form: (Red, Green, Blue, Opacity)
         :param watermark_background: the color to put behind the text of the watermark. This should be a tuple
                                      of the form: (Red, Green, Blue, Opacity)
+        :param profile: the name of a render profile in RENDER_PROFILES to set the render engine and samples with. If
+                        None, the scene's render settings are used as they are.
+        :param source: the path to the mesh file the image is of (stored with the image by SQLite sinks)
         """
         logging.info("Saving image %s", filepath)
         logging.debug("... with arguments: %s" % str(locals()))
         render = data.scenes['Scene'].render
-        render.filepath = filepath
         render.resolution_percentage = resolution_percentage
         render.resolution_x = width
         render.resolution_y = height if height is not None else width
         settings = render.image_settings
-        try:
-            settings.file_format = cls.IMAGE_FORMATS[file_format]
-        except KeyError:
-            raise ValueError("%s was not an expected image format." % file_format)
-        settings.quality = jpeg_quality
-        settings.compression = pngcompression
-        settings.color_depth = str(color_depth)
-        color_mode = 'RGBA' if allow_transparency and file_format == 'png' else 'RGB'
-        settings.color_mode = color_mode
+        cls._apply_image_settings(settings, file_format, jpeg_quality, pngcompression, color_depth, allow_transparency)
         render.use_stamp = watermark is not None
         if watermark:
             render.stamp_background = watermark_background
@@ -336,11 +1209,78 @@ class Mesh2Img(object):
                     setattr(render, attr, watermark_metadata)
             render.use_stamp_note = True
             render.stamp_note_text = watermark
-        ops.render.render(write_still=True)
+        saved_settings = None
+        if profile:  # put the scene's own settings back afterwards, for the next image without a profile
+            saved_settings = save_render_settings(data.scenes['Scene'])
+            apply_render_profile(data.scenes['Scene'], cls.RENDER_PROFILES[profile])
+        try:
+            with output_file(filepath, source=source, width=width, height=render.resolution_y,
+                             image_format=file_format) as local_path:
+                unshare_file(local_path)
+                render.filepath = local_path
+                ops.render.render(write_still=True)
+        finally:
+            if saved_settings is not None:
+                restore_render_settings(saved_settings)
+
+    @classmethod
+    def save_pixels(cls, pixels, filepath, file_format='png', jpeg_quality=100, pngcompression=100, color_depth=8,
+                    allow_transparency=True, source=None):
+        """
+        Saves an array of pixels (like the ones from load_image_pixels) as an image file using Blender's image writers.
+        The pixels are written as they are. No color management is applied to them a second time.
+
+        :param pixels: a NumPy array of RGBA values from 0.0 to 1.0 with the shape (height, width, 4), bottom row first
+        :param filepath: the file path to save this image file to
+        :param file_format: the type of image file to make (such as jpg, png, tiff, or bmp)
+        :param jpeg_quality: valid numbers are 0-100. JPEG quality is the trade off of image quality and file size
+        :param pngcompression: valid numbers are 0-100. The higher the number, the more time will be spent compressing
+                               the PNG. The quality is always lossless.
+        :param color_depth: valid numbers are 8 or 16. The number of bits to use per color channel.
+        :param allow_transparency: if a PNG, sets the mode from RGB to RGBA (RGB + Alpha)
+        :param source: the path to the mesh file the image is of (stored with the image by SQLite sinks)
+        """
+        logging.info("Saving image %s", filepath)
+        height, width = pixels.shape[:2]
+        scene = data.scenes['Scene']
+        image = data.images.new('mesh2img_pixels', width, height, alpha=True)
+        view = scene.view_settings
+        saved_view = (view.view_transform, view.look, view.exposure, view.gamma)
+        try:
+            image.pixels.foreach_set(np.ascontiguousarray(pixels, dtype=np.float32).ravel())
+            cls._apply_image_settings(scene.render.image_settings, file_format, jpeg_quality, pngcompression,
+                                      color_depth, allow_transparency)
+            # the pixels came out of a render that already had the view transform applied, so don't do it again
+            view.view_transform, view.look, view.exposure, view.gamma = 'Standard', 'None', 0.0, 1.0
+            with output_file(filepath, source=source, width=width, height=height,
+                             image_format=file_format) as local_path:
+                ensure_parent_dir(local_path)
+                unshare_file(local_path)
+                image.save_render(local_path, scene=scene)
+        finally:
+            view.view_transform, view.look, view.exposure, view.gamma = saved_view
+            data.images.remove(image)
+
+    @classmethod
+    def _apply_image_settings(cls, settings, file_format, jpeg_quality, pngcompression, color_depth,
+                              allow_transparency):
+        """
+        Copies the output file options onto a Blender ImageFormatSettings object (like render.image_settings).
+        See Mesh2Img.save_image for what each option means.
+        """
+        try:
+            settings.file_format = cls.IMAGE_FORMATS[file_format]
+        except KeyError:
+            raise ValueError("%s was not an expected image format." % file_format)
+        settings.quality = jpeg_quality
+        settings.compression = pngcompression
+        settings.color_depth = str(color_depth)
+        color_mode = 'RGBA' if allow_transparency and file_format == 'png' else 'RGB'
+        settings.color_mode = color_mode
 
 
 class JobTemplate(object):
-    def __init__(self, dimensions, output_template, image_format='png', jpeg_quality=80):
+    def __init__(self, dimensions, output_template, image_format='png', jpeg_quality=80, profile=None, sink=None):
         """
         Defines 1 way a mesh will be converted to an image. Create multiple JobTemplates to define multiple output
         images of various sizes and formats per mesh.
@@ -351,7 +1291,15 @@ class JobTemplate(object):
                                 should go and how they should be named.
         :param image_format: valid strings here are keys in the `Mesh2Img.IMAGE_FORMATS` dictionary ('png', 'jpg', etc.)
         :param jpeg_quality: if 'jpg' is not the image_format this has no effect. Valid numbers are 0-100
+        :param profile: a key of `Mesh2Img.RENDER_PROFILES` ('draft', 'thumbnail', 'catalog') to render with, 'auto'
+                        to pick the cheapest one good enough for this image size, or None to use the scene's settings
+        :param sink: where to put the images instead of writing a file for each one, like 'zip:/out/thumbs.zip',
+                     'tar:/out/thumbs.tar' or 'sqlite:/out/thumbs.db' (see OutputSink and parse_sink). The output
+                     template then names the image inside the sink. None (or 'files') writes plain image files.
         """
+        if profile and profile != 'auto' and profile not in Mesh2Img.RENDER_PROFILES:
+            raise ValueError("%s is not a known render profile." % profile)
+        parse_sink(sink)  # make sure it's a valid sink now rather than after the first render
         if not image_format:
             image_format = 'png'
         try:
@@ -363,80 +1311,921 @@ class JobTemplate(object):
         self.output_template = output_template
         self.image_format = image_format
         self.jpeg_quality = jpeg_quality
+        self.profile = profile
+        self.sink = None if sink == 'files' else sink
+
+    def get_profile(self):
+        """
+        :return: the name of the render profile to use for this image (with 'auto' worked out), or None
+        """
+        if self.profile != 'auto':
+            return self.profile
+        size = max(self.width, self.height)
+        for name in Mesh2Img.PROFILE_ORDER:
+            max_size = Mesh2Img.RENDER_PROFILES[name].get('max_size')
+            if max_size is None or size <= max_size:
+                return name
+        return Mesh2Img.PROFILE_ORDER[-1]
 
-    def get_output_path(self, input_filepath, exec_time=None):
+    def get_output_path(self, input_filepath, exec_time=None, view=None):
         """
         Given the input filepath, returns an output filepath based on this template object's template string.
 
-        :param input_filepath: the path to the source file that will need a destination path based on its name
+        :param input_filepath: the path to the source file that will need a destination path based on its name. For a
+                               file inside an archive, the archive counts as a folder named like it without the
+                               extension (see archive_output_path).
         :param exec_time: the time at which the program was started (passed in by the script)
-        :return: an output path string based on the template defined in this JobTemplate
+        :param view: the name of the camera view (or 'sheet' for a sprite sheet) this image is of. If the template has
+                     no {view} placeholder, `_<view>` is added to the end of the file name so views don't overwrite
+                     each other.
+        :return: an output path string based on the template defined in this JobTemplate. For a sink, that's the path of
+                 the sink followed by the name from the template (without any leading slashes or drive letter).
         """
         date = datetime.now().strftime('%Y-%m-%d_%H%M%S')  # the current time in the format `YYYY-mm-dd_HHMMSS`
         if not exec_time:
             exec_time = date
-        filepath, src_ext = os.path.splitext(input_filepath)
+        filepath, src_ext = os.path.splitext(archive_output_path(input_filepath))
         basename = os.path.basename(filepath)
         ext = self.image_format.lower()
-        return self.output_template.format(basename=basename, date=date, exec_time=exec_time, ext=ext,
-                                           filepath=filepath, height=self.height, src_ext=src_ext, width=self.width)
+        output_path = self.output_template.format(basename=basename, date=date, exec_time=exec_time, ext=ext,
+                                                  filepath=filepath, height=self.height, src_ext=src_ext,
+                                                  width=self.width, view=view or '')
+        if view and '{view}' not in self.output_template:
+            root, ext = os.path.splitext(output_path)
+            output_path = '%s_%s%s' % (root, view, ext)
+        if self.sink:
+            name = os.path.splitdrive(output_path)[1].replace('\\', '/').lstrip('/')
+            output_path = parse_sink(self.sink)[1] + '/' + name
+        return output_path
+
+    def to_dict(self):
+        """
+        :return: the arguments needed to recreate this JobTemplate with Mesh2Img.add_job_template
+        """
+        return {'dimensions': [self.width, self.height], 'output_template': self.output_template,
+                'image_format': self.image_format, 'jpeg_quality': self.jpeg_quality, 'profile': self.profile,
+                'sink': self.sink}
 
     def __str__(self):
         return "JobTemplate(%s)" % str(self.__dict__)
 
 
-def delete_object_by_name(name, ignore_errors=False):
+class CameraView(object):
     """
-    Attempts to find an object by the name given and deletes it from the scene.
-
-    :param name: the name of this object
-    :param ignore_errors: if True, no exception is raised when the object is deleted. Otherwise, you will get a
-                          KeyError if no object by that name exists.
-    :return: True if the object was found and deleted successfully
+    A named camera position and rotation to render each mesh from. See Mesh2Img's `views` argument.
     """
-    try:
-        logging.debug("Attempting to delete object '%s'" % name)
-        obj = data.objects[name]
-    except KeyError as ex:
-        if ignore_errors:  # are we ignoring errors?
-            logging.debug("Didn't delete '%s'. Probably didn't exist. Error ignored." % name)
-            return False  # just report that we weren't successful
-        raise ex  # object doesn't exist so raise this exception
-    ops.object.select_all(action='DESELECT')
-    obj.select_set(state=True)
-    context.view_layer.objects.active = obj
-    bpy.ops.object.delete()
 
+    # name -> (tilt, turn) in degrees for CameraView.orbit. A tilt of 0 looks straight down, 90 looks from the side.
+    PRESETS = {
+        'top': (0, 0),
+        'bottom': (180, 0),
+        'front': (90, 0),
+        'back': (90, 180),
+        'left': (90, -90),
+        'right': (90, 90),
+        'side': (90, 90),
+        'iso': (54.7356, 45),  # looking down the diagonal of a cube
+    }
+
+    def __init__(self, name, coords, rotation):
+        """
+        :param name: the name used for the {view} placeholder in output templates
+        :param coords: an (X, Y, Z) tuple of where the camera is
+        :param rotation: an (X, Y, Z) tuple of the camera's rotation in degrees
+        """
+        self.name = name
+        self.coords = tuple(float(c) for c in coords)
+        self.rotation = tuple(float(r) for r in rotation)
+
+    @classmethod
+    def orbit(cls, name, distance, tilt, turn):
+        """
+        Makes a view of a camera that is `distance` units from the origin and pointed at it.
 
+        :param name: the name of the view
+        :param distance: how far the camera is from the origin
+        :param tilt: degrees the camera is tilted up from looking straight down
+        :param turn: degrees the camera is turned around the Z axis (0 is in front of the mesh, on the -Y side)
+        :return: a new CameraView
+        """
+        t, r = math.radians(tilt), math.radians(turn)
+        coords = (distance * math.sin(t) * math.sin(r), -distance * math.sin(t) * math.cos(r), distance * math.cos(t))
+        return cls(name, [round(c, 6) for c in coords], (tilt, 0, turn))
 
-def scale_mesh(mesh, max_dim=9.0):
+    @classmethod
+    def parse(cls, text, distance=10.0):
+        """
+        Makes a view out of a preset name (see PRESETS) or a string of the form `name:X,Y,Z:RX,RY,RZ`.
+
+        :param text: the string to parse
+        :param distance: how far from the origin preset views put the camera
+        :return: a new CameraView
+        """
+        if text in cls.PRESETS:
+            return cls.orbit(text, distance, *cls.PRESETS[text])
+        try:
+            name, coords, rotation = text.split(':')
+            return cls(name, coords.split(','), rotation.split(','))
+        except ValueError:
+            raise ValueError("%r is not a view preset (%s) or name:X,Y,Z:RX,RY,RZ"
+                             % (text, ', '.join(sorted(cls.PRESETS))))
+
+    def to_dict(self):
+        """
+        :return: the arguments needed to recreate this CameraView
+        """
+        return {'name': self.name, 'coords': list(self.coords), 'rotation': list(self.rotation)}
+
+    def __str__(self):
+        return "CameraView(%s)" % str(self.__dict__)
+
+
+class RenderRequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Answers the HTTP requests for Mesh2Img.serve(). Requests are handled one at a time because Blender can only render
+    one thing at a time anyway.
     """
-    Scales the given object so that it's longest dimension on any axis is exactly the number of units specified by
-    max_dim. This is useful for scaling objects to a consistent size.
 
-    If an object's maximum dimension is 0, no action is performed.
+    def do_GET(self):
+        if self.path.rstrip('/') != '/status':
+            return self._reply(404, {'status': 'failed', 'error': 'Unknown path %s' % self.path})
+        self._reply(200, {'status': 'ready', 'rendered': self.server.rendered})
 
-    :param mesh: the object to scale to be exactly `max_dim` units at it's longest side
-    :param max_dim: the limit to how big an object can be on any axis
+    def do_POST(self):
+        if self.path.rstrip('/') != '/render':
+            return self._reply(404, {'status': 'failed', 'error': 'Unknown path %s' % self.path})
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length).decode('utf-8'))
+            filepath = request['path']
+        except (ValueError, KeyError, TypeError) as ex:
+            return self._reply(400, {'status': 'failed', 'error': 'Bad request: %r' % ex})
+
+        started = time.time()
+        try:
+            outputs = self.server.batch.render_request(filepath, request.get('job_templates'))
+        except Exception as ex:
+            logging.exception("Failed to render %s", filepath)
+            return self._reply(500, {'status': 'failed', 'error': repr(ex)})
+        self.server.rendered += 1
+        self._reply(200, {'status': 'ok', 'outputs': outputs, 'seconds': time.time() - started})
+
+    def _reply(self, code, body):
+        content = json.dumps(body).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        logging.debug("%s - %s", self.address_string(), format % args)
+
+
+class RenderFarm(object):
     """
-    logging.debug("Scaling mesh %s to a maximum of %s in any direction" % (mesh.name, max_dim))
-    max_length = max(mesh.dimensions)
-    print('=================================================',max_length)
-    if max_length == 0:
-        logging.debug("No scaling for %s because its dimensions are %s" % (mesh.name, repr(mesh.dimensions)))
-        return  # skip scaling
-    scale_factor = 1 / (max_length / max_dim)
-    mesh.scale = (scale_factor, scale_factor, scale_factor)
-    x, y, z = [i for i in mesh.dimensions]  # for pretty dimension formatting
-    new_dimensions = "X=%s, Y=%s, Z=%s" % (x, y, z)
-    logging.debug("Scale factor for mesh %s is %s. Its new dimensions are %s",
-                  mesh.name, scale_factor, [i for i in new_dimensions])
+    Splits a Mesh2Img batch between several headless Blender processes (`blender -b -P mesh2img.py`) that render side
+    by side, then gathers up what each of them rendered and which meshes failed.
 
+    Usually you don't need to make one of these yourself. Passing `workers=8` to Mesh2Img (or `--workers 8` on the
+    command line) makes Mesh2Img.start() hand the batch to a RenderFarm.
 
-def set_camera(x=0, y=0, z=10, rotation_x=0, rotation_y=0, rotation_z=0, camera_name='Camera'):
+    The farm also keeps one bad mesh from taking the batch down with it. Each worker reports every mesh it starts, so
+    the farm knows what it's working on. If a worker crashes in the middle of a mesh, or goes over the batch's
+    mesh_timeout or mesh_memory and gets stopped, that mesh is quarantined (counted as failed and not tried again) and
+    a new worker takes over the rest of its meshes.
     """
-    Sets the camera named by `camera_name` to the given coordinates.
-    :param x: the X position of the camera
+
+    PER_FILE_COST = 256 * 1024  # every mesh costs at least a render, so count each file as at least this many bytes
+    POLL_INTERVAL = 0.5  # seconds between looking in on the workers
+
+    def __init__(self, batch, workers=None, blender_path=None, threads=None, work_dir=None):
+        """
+        :param batch: the Mesh2Img batch to render
+        :param workers: how many Blender processes to start (defaults to the number of CPUs)
+        :param blender_path: the Blender executable to start (defaults to the one running this script)
+        :param threads: render threads per worker (defaults to splitting the CPUs evenly between the workers)
+        :param work_dir: a folder for the job file, report, and log of each worker (defaults to a new temporary folder)
+        """
+        cpus = os.cpu_count() or 1
+        self.batch = batch
+        self.workers = max(1, int(workers or cpus))
+        self.blender_path = blender_path or bpy.app.binary_path
+        self.threads = int(threads or max(1, cpus // self.workers))
+        self.work_dir = work_dir
+
+    @classmethod
+    def shard(cls, filepaths, count):
+        """
+        Splits the files into `count` lists that each have about the same amount of work in them. The biggest files
+        are handed out first, each one to whichever list has the least work so far.
+
+        :param filepaths: the paths of the mesh files to split up
+        :param count: how many lists to make
+        :return: a list of `count` lists of paths (some are empty if there are fewer files than lists)
+        """
+        sized = [(_file_size(filepath) + cls.PER_FILE_COST, filepath) for filepath in filepaths]
+        sized.sort(key=lambda item: item[0], reverse=True)
+
+        shards = [[] for _ in range(count)]
+        totals = [(0, i) for i in range(count)]  # a heap of (work so far, shard index)
+        for size, filepath in sized:
+            total, i = heapq.heappop(totals)
+            shards[i].append(filepath)
+            heapq.heappush(totals, (total + size, i))
+        return shards
+
+    def run(self):
+        """
+        Starts the workers, waits for all of them to finish, and collects their results. A mesh is counted as failed
+        if its worker reported an error for it or if the worker died before getting to it. With a journal, meshes it
+        says are done are left out, and how each mesh turns out is added to it.
+
+        :return: a dictionary with 'rendered' and 'skipped' (mesh path -> list of image paths), 'failed' and
+                 'quarantined' (mesh path -> error)
+        """
+        metrics = self.batch.metrics
+        metrics.begin_run(self.batch.execute_time)
+        with metrics.stage('discovery'):
+            filepaths = self.batch.expand_paths()
+        results = {'rendered': {}, 'skipped': {}, 'failed': {}, 'quarantined': {}}
+        journal = Journal(self.batch.journal) if self.batch.journal else None
+        todo = filepaths
+        if journal is not None:
+            for filepath in filepaths:
+                if journal.is_finished(filepath):
+                    entry = journal.get(filepath)
+                    if entry['status'] == 'ok':
+                        results['skipped'][filepath] = entry.get('outputs', [])
+                    else:
+                        results[entry['status']][filepath] = entry.get('error')
+            todo = [filepath for filepath in todo if not any(filepath in outcome for outcome in results.values())]
+        self.batch.open_sinks()  # before the manifest, which looks for images in them
+        manifest = self.batch._open_manifest()
+        if manifest is not None:  # only hand out the meshes that actually need rendering
+            for filepath in todo:
+                if manifest.is_current(filepath, self.batch._fingerprint):
+                    results['skipped'][filepath] = manifest.outputs(filepath)
+            todo = [filepath for filepath in todo if filepath not in results['skipped']]
+        duplicates = {}  # duplicate path -> the path of the mesh it's a duplicate of
+        if self.batch.dedup:  # only the first of each set of identical meshes is handed out
+            with metrics.stage('dedup'):
+                duplicates = self.find_duplicates(todo)
+            todo = [filepath for filepath in todo if filepath not in duplicates]
+        work_dir = self.work_dir or tempfile.mkdtemp(prefix='mesh2img_farm_')
+        if not os.path.isdir(work_dir):
+            os.makedirs(work_dir)
+        shards = [shard for shard in self.shard(todo, self.workers) if shard]
+        logging.info("Rendering %d meshes with %d workers (%d threads each). Worker logs are in %s",
+                     len(filepaths), len(shards), self.threads, work_dir)
+
+        workers = [self._start_worker(i, 0, shard, work_dir) for i, shard in enumerate(shards)]
+        parts = [worker.name for worker in workers]  # the sink part each worker wrote to
+        stopped = False  # whether a worker was stopped or crashed, which loses what it hadn't written out yet
+        while workers:
+            time.sleep(self.POLL_INTERVAL)
+            for worker in list(workers):
+                self._collect(worker.read_report(), results, journal)
+                code = worker.proc.poll()
+                problem = None
+                if code is None:
+                    problem = self._check_limits(worker)
+                    if problem is None:
+                        continue
+                    logging.warning("Stopping worker %d because %s %s", worker.index, worker.current[0], problem)
+                    worker.proc.kill()
+                    code = worker.proc.wait()
+                worker.log.close()
+                workers.remove(worker)
+                self._collect(worker.read_report(), results, journal)
+                left = [filepath for filepath in worker.paths if filepath not in worker.done]
+                if worker.current is not None and (problem or code):
+                    stopped = True
+                    filepath = worker.current[0]
+                    error = problem or ("Blender exited with code %s while rendering it (see %s)"
+                                        % (code, worker.log.name))
+                    results['quarantined'][filepath] = error
+                    if journal is not None:
+                        journal.record(filepath, 'quarantined', error=error)
+                    left.remove(filepath)
+                    if left:  # a new worker takes over the rest
+                        worker = self._start_worker(worker.index, worker.attempt + 1, left, work_dir)
+                        workers.append(worker)
+                        parts.append(worker.name)
+                        continue
+                for filepath in left:
+                    results['failed'][filepath] = ("worker exited with code %s before rendering this mesh (see %s)"
+                                                   % (code, worker.log.name))
+        with _sinks_lock:
+            sinks = list(_sinks.values())
+        for sink in sinks:
+            for name in parts:
+                part = sink_part_path(sink.path, name)
+                if os.path.exists(part):
+                    try:
+                        sink.merge(part)
+                    except (zipfile.BadZipFile, tarfile.TarError) as ex:  # its worker died before closing it
+                        logging.warning("Couldn't merge %s into %s: %r", part, sink.path, ex)
+        if stopped:  # make sure nothing counts as rendered whose images went down with its worker
+            for filepath, outputs in list(results['rendered'].items()):
+                if not all(output_exists(output) for output in outputs):
+                    del results['rendered'][filepath]
+                    error = "its images were lost when its worker was stopped"
+                    results['failed'][filepath] = error
+                    if journal is not None:
+                        journal.record(filepath, 'lost', error=error)  # not finished, so it's rendered next time
+
+        for filepath, source in duplicates.items():
+            if source not in results['rendered']:
+                results['failed'][filepath] = "it's a duplicate of %s, which failed" % source
+                continue
+            try:
+                outputs = self.batch.get_output_paths(filepath)
+                for source_output, output in zip(results['rendered'][source], outputs):
+                    link_or_copy(source_output, output, source=filepath)
+            except Exception as ex:
+                results['failed'][filepath] = repr(ex)
+                continue
+            results['rendered'][filepath] = outputs
+            if manifest is not None:
+                manifest.record(filepath, self.batch._fingerprint, outputs)
+            if journal is not None:
+                journal.record(filepath, 'ok', outputs=outputs, duplicate_of=source)
+
+        if metrics.enabled:  # the workers appended their meshes to the same file
+            metrics.records = [record for record in read_json_lines(metrics.filepath)
+                               if record.get('run') == metrics.run and 'path' in record]
+            metrics.write_summary()
+        for filepath, error in sorted(results['failed'].items()):
+            logging.warning("Failed to render %s: %s", filepath, error)
+        for filepath, error in sorted(results['quarantined'].items()):
+            logging.warning("Quarantined %s: %s", filepath, error)
+        print("Rendered %d of %d meshes with %d workers (%d unchanged, %d duplicates, %d failed, %d quarantined)" % (
+            len(results['rendered']), len(filepaths), len(shards), len(results['skipped']), len(duplicates),
+            len(results['failed']), len(results['quarantined'])))
+        close_sinks()
+        return results
+
+    def _start_worker(self, index, attempt, paths, work_dir):
+        """
+        Starts a Blender process that renders the given meshes with the batch's settings.
+
+        :param index: the number of the worker
+        :param attempt: how many workers with this number came before it (0 for the first one)
+        :param paths: the paths of the meshes to render
+        :param work_dir: the folder for the worker's job file, report, and log
+        :return: a FarmWorker
+        """
+        name = 'worker%d' % index if not attempt else 'worker%d-%d' % (index, attempt)
+        settings = self.batch.to_dict()
+        settings['paths'] = paths
+        settings['dedup'] = None  # already done here
+        settings['sink_part'] = name  # zip and tar sinks can't be written by several processes at once
+        settings['report'] = os.path.join(work_dir, name + '.jsonl')
+        if os.path.exists(settings['report']):
+            os.remove(settings['report'])  # don't mix in the results of an earlier run
+        job_file = os.path.join(work_dir, name + '.json')
+        with open(job_file, 'w') as f:
+            json.dump(settings, f)
+        log = open(os.path.join(work_dir, name + '.log'), 'wb')
+        cmd = [self.blender_path, '-b', '-t', str(self.threads), '-P', os.path.abspath(__file__),
+               '--', '--job-file', job_file]
+        logging.debug("Starting %s: %s", name, cmd)
+        proc = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT)
+        return FarmWorker(index, attempt, name, paths, settings['report'], proc, log)
+
+    def _check_limits(self, worker):
+        """
+        :param worker: a running FarmWorker
+        :return: why the mesh the worker is on has to be quarantined (like "took more than 60s"), or None if it's fine
+        """
+        if worker.current is None:
+            return None
+        seconds = time.time() - worker.current[1]
+        if self.batch.mesh_timeout and seconds > self.batch.mesh_timeout:
+            return "took more than %gs" % self.batch.mesh_timeout
+        if self.batch.mesh_memory:
+            rss = process_rss(worker.proc.pid)
+            if rss is not None and rss > self.batch.mesh_memory:
+                return "took Blender to %dMB of memory (the limit is %dMB)" % (rss // 2 ** 20,
+                                                                              self.batch.mesh_memory // 2 ** 20)
+        return None
+
+    @staticmethod
+    def _collect(records, results, journal=None):
+        """
+        Sorts the records from a worker's report into the results (see run) and adds them to the journal.
+        """
+        for record in records:
+            filepath, status = record['path'], record['status']
+            if status == 'ok':
+                results['rendered'][filepath] = record['outputs']
+            elif status == 'skipped':
+                results['skipped'][filepath] = record['outputs']
+            elif status == 'failed':
+                results['failed'][filepath] = record['error']
+            if journal is not None and status in ('ok', 'failed'):
+                journal.record(filepath, status, **{key: value for key, value in record.items()
+                                                    if key not in ('path', 'status')})
+
+    def find_duplicates(self, filepaths):
+        """
+        Reads the mesh files (several at a time) to find the ones that are duplicates of another (see Mesh2Img.dedup).
+
+        :param filepaths: the paths of the mesh files
+        :return: a dictionary of duplicate path -> the path of the first mesh it's a duplicate of
+        """
+        finder = DuplicateFinder(self.batch.dedup)
+
+        def get_key(filepath):
+            try:
+                return finder.key(filepath)
+            except OSError:
+                return None  # let the worker find out what's wrong with it
+
+        duplicates = {}
+        chunk = self.workers * 4  # keys hold every triangle in geometry mode, so only read a few meshes ahead
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for start in range(0, len(filepaths), chunk):
+                paths = filepaths[start:start + chunk]
+                for filepath, key in zip(paths, executor.map(get_key, paths)):
+                    if key is None:
+                        continue
+                    original = finder.match(key)
+                    if original is not None:
+                        duplicates[filepath] = original
+                    else:
+                        finder.add(key, filepath)
+        logging.info("%d of %d meshes are duplicates", len(duplicates), len(filepaths))
+        return duplicates
+
+
+class FarmWorker(object):
+    """
+    One Blender process of a RenderFarm. Its report is read as it's written, so the farm knows which meshes it's done
+    with and which one it's working on right now.
+    """
+
+    def __init__(self, index, attempt, name, paths, report, proc, log):
+        """
+        :param index: the number of the worker
+        :param attempt: how many workers with this number came before it (0 for the first one)
+        :param name: the name its job file, report, log and sink parts are named after
+        :param paths: the paths of the meshes it was given
+        :param report: the path to its report (see Mesh2Img.report)
+        :param proc: its subprocess.Popen
+        :param log: the open file its output goes to
+        """
+        self.index = index
+        self.attempt = attempt
+        self.name = name
+        self.paths = paths
+        self.report = report
+        self.proc = proc
+        self.log = log
+        self.done = set()  # the meshes it reported an outcome for
+        self.current = None  # (path, time it was started) of the mesh it's on right now
+        self._offset = 0  # how much of the report was read so far
+
+    def read_report(self):
+        """
+        :return: the records added to the worker's report since the last call
+        """
+        if not os.path.exists(self.report):
+            return []
+        with open(self.report, 'rb') as f:
+            f.seek(self._offset)
+            text = f.read()
+        end = text.rfind(b'\n') + 1  # a line that's still being written is read next time
+        self._offset += end
+        records = []
+        for line in text[:end].decode('utf-8').splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record['status'] == 'started':
+                self.current = (record['path'], record['time'])
+            else:
+                self.done.add(record['path'])
+                if self.current is not None and self.current[0] == record['path']:
+                    self.current = None
+            records.append(record)
+        return records
+
+
+class MeshDiscovery(object):
+    """
+    Finds the mesh files to render on a background thread and hands them over through a bounded queue, so rendering
+    starts with the first mesh found instead of waiting for every directory to be listed (which can take a long time
+    on a network share). Directories are listed with os.scandir, and subdirectories matching an exclude pattern aren't
+    even entered.
+
+    Iterate over it to get the paths. `found` counts the mesh files found so far and `total` is set once discovery
+    has finished.
+    """
+
+    ORDERS = ('walk', 'name', 'largest', 'smallest')
+    _DONE = object()  # put on the queue after the last path
+
+    def __init__(self, paths, extensions, include=None, exclude=None, max_depth=None, min_size=None, max_size=None,
+                 order='walk', queue_size=1000):
+        """
+        :param paths: paths to directories containing mesh files or the paths to the files themselves. Files that are
+                      given directly are always included, whatever the patterns and size limits say. Zip and tar files
+                      (given directly or found in a directory) are searched like directories. See split_archive_path.
+        :param extensions: the file extensions to look for, like '.stl' (anything with a `.lower()` in it works)
+        :param include: a list of glob patterns like '*.stl' or 'parts/**/*.stl'. If given, only files matching one of
+                        them are included. Patterns without a '/' are matched against the file name, the others against
+                        the path relative to the directory being searched, where `*` stays inside one folder and a
+                        `**` folder stands for any number of folders (none included).
+        :param exclude: a list of glob patterns (like include) for files and directories to leave out
+        :param max_depth: how many levels of subdirectories to go into (0 only looks in the given directories). None
+                          has no limit.
+        :param min_size: leave out files smaller than this many bytes
+        :param max_size: leave out files bigger than this many bytes
+        :param order: 'walk' hands out the files as they're found. 'name', 'largest' and 'smallest' wait until every
+                      file has been found and then sort them by path or by size.
+        :param queue_size: the most paths waiting to be rendered at once
+        """
+        if order not in self.ORDERS:
+            raise ValueError("%s is not a discovery order. Use one of %s." % (order, ', '.join(self.ORDERS)))
+        self.paths = list(paths)
+        self.extensions = set(ext.lower() for ext in extensions)
+        self.include = list(include or [])
+        self.exclude = list(exclude or [])
+        self.max_depth = max_depth
+        self.min_size = min_size
+        self.max_size = max_size
+        self.order = order
+        self.found = 0
+        self.total = None
+        self._queue = queue.Queue(max(1, int(queue_size)))
+        self._stop = threading.Event()
+        self._error = None
+
+    def __iter__(self):
+        thread = threading.Thread(target=self._run, name='mesh2img-discovery')
+        thread.daemon = True
+        thread.start()
+        try:
+            while True:
+                item = self._queue.get()
+                if item is self._DONE:
+                    break
+                yield item
+        finally:
+            self._stop.set()  # in case we stopped early, so the thread doesn't wait on a full queue forever
+        thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def _run(self):
+        try:
+            found = self.scan()
+            if self.order != 'walk':
+                found = list(found)
+                if self.order == 'name':
+                    found.sort()
+                else:
+                    sizes = dict((filepath, _file_size(filepath)) for filepath in found)
+                    found.sort(key=lambda filepath: sizes[filepath], reverse=self.order == 'largest')
+                self.total = len(found)
+            for filepath in found:
+                if not self._put(filepath):
+                    return
+            self.total = self.found
+        except Exception as ex:
+            self._error = ex
+        finally:
+            self._put(self._DONE)
+
+    def _put(self, item):
+        """
+        Waits for room on the queue unless iterating was stopped.
+
+        :return: False if iterating was stopped
+        """
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def scan(self):
+        """
+        Yields the path of every mesh file, in the order they're found, on the calling thread.
+        """
+        for filepath in self.paths:
+            if os.path.isdir(filepath):
+                for found in self._scan_dir(filepath):
+                    self.found += 1
+                    yield found
+            elif is_archive(filepath):
+                for found in self._scan_archive(filepath, ''):
+                    self.found += 1
+                    yield found
+            else:
+                self.found += 1
+                yield filepath
+
+    def _scan_dir(self, root):
+        folders = [(root, 0)]
+        while folders:
+            folder, depth = folders.pop()
+            logging.debug("Entering %s", folder)
+            try:
+                entries = list(os.scandir(folder))
+            except OSError as ex:
+                logging.warning("Can't list %s: %s", folder, ex)
+                continue
+            subfolders = []
+            for entry in entries:
+                relative = os.path.relpath(entry.path, root).replace(os.sep, '/')
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    continue
+                if is_dir:
+                    if entry.is_symlink():  # like os.walk, don't follow links to folders (they can loop back)
+                        continue
+                    if (self.max_depth is None or depth < self.max_depth) and not self._matches(relative,
+                                                                                                  self.exclude):
+                        subfolders.append((entry.path, depth + 1))
+                    continue
+                if entry.name.lower().endswith(ARCHIVE_EXTENSIONS):
+                    if not self._matches(relative, self.exclude):
+                        for found in self._scan_archive(entry.path, relative + '/'):
+                            yield found
+                    continue
+                if os.path.splitext(entry.name)[1].lower() not in self.extensions:
+                    continue
+                if self.include and not self._matches(relative, self.include):
+                    continue
+                if self._matches(relative, self.exclude):
+                    continue
+                if self.min_size is not None or self.max_size is not None:
+                    try:
+                        size = entry.stat().st_size
+                    except OSError:
+                        continue
+                    if (self.min_size is not None and size < self.min_size or
+                            self.max_size is not None and size > self.max_size):
+                        continue
+                yield entry.path
+            folders.extend(reversed(subfolders))  # so they're popped off in the order they were listed
+
+    def _scan_archive(self, archive, prefix):
+        """
+        Yields the path (see split_archive_path) of every mesh file inside a zip or tar file that passes the filters.
+
+        :param archive: the path to the archive
+        :param prefix: what to put in front of the member names to match them against the patterns
+        """
+        logging.debug("Entering %s", archive)
+        try:
+            members = list_archive(archive)
+        except (OSError, zipfile.BadZipFile, tarfile.TarError) as ex:
+            logging.warning("Can't list %s: %s", archive, ex)
+            return
+        for name, size in members:
+            if os.path.splitext(name)[1].lower() not in self.extensions:
+                continue
+            relative = prefix + name
+            if self.include and not self._matches(relative, self.include):
+                continue
+            if self._matches(relative, self.exclude):
+                continue
+            if (self.min_size is not None and size < self.min_size or
+                    self.max_size is not None and size > self.max_size):
+                continue
+            yield archive + '/' + name
+
+    @staticmethod
+    def _matches(relative, patterns):
+        """
+        :param relative: a path relative to the searched directory, with '/' between the folders
+        :param patterns: a list of glob patterns
+        :return: True if any pattern matches (patterns without a '/' only have to match the last part of the path)
+        """
+        parts = relative.split('/')
+        for pattern in patterns:
+            if '/' not in pattern:
+                if fnmatch.fnmatch(parts[-1], pattern):
+                    return True
+            elif MeshDiscovery._match_parts(parts, pattern.strip('/').split('/')):
+                return True
+        return False
+
+    @staticmethod
+    def _match_parts(parts, pattern_parts):
+        """
+        Matches a path folder by folder, so `*` doesn't go past a '/' and a `**` folder stands for any number of
+        folders (none included).
+
+        :param parts: the folder and file names of the path
+        :param pattern_parts: the pattern split on '/' the same way
+        :return: True if the path matches the pattern
+        """
+        if not pattern_parts:
+            return not parts
+        if pattern_parts[0] == '**':
+            return any(MeshDiscovery._match_parts(parts[skip:], pattern_parts[1:]) for skip in range(len(parts) + 1))
+        if not parts or not fnmatch.fnmatch(parts[0], pattern_parts[0]):
+            return False
+        return MeshDiscovery._match_parts(parts[1:], pattern_parts[1:])
+
+
+def delete_object_by_name(name, ignore_errors=False):
+    """
+    Attempts to find an object by the name given and deletes it from the scene.
+
+    :param name: the name of this object
+    :param ignore_errors: if True, no exception is raised when the object is deleted. Otherwise, you will get a
+                          KeyError if no object by that name exists.
+    :return: True if the object was found and deleted successfully
+    """
+    try:
+        logging.debug("Attempting to delete object '%s'" % name)
+        obj = data.objects[name]
+    except KeyError as ex:
+        if ignore_errors:  # are we ignoring errors?
+            logging.debug("Didn't delete '%s'. Probably didn't exist. Error ignored." % name)
+            return False  # just report that we weren't successful
+        raise ex  # object doesn't exist so raise this exception
+    remove_object(obj)
+    return True
+
+
+def remove_object(obj):
+    """
+    Removes an object from the file through the data API, along with its mesh data and materials if nothing else uses
+    them. Deleting with bpy.ops.object.delete() leaves the mesh data behind, which adds up over a long batch.
+
+    :param obj: the Blender object to remove
+    """
+    mesh = obj.data
+    materials = [slot.material for slot in obj.material_slots if slot.material is not None]
+    data.objects.remove(obj, do_unlink=True)
+    if isinstance(mesh, bpy.types.Mesh) and mesh.users == 0:
+        data.meshes.remove(mesh)
+    for material in materials:
+        if material.users == 0:
+            data.materials.remove(material)
+
+
+def datablock_pointers():
+    """
+    :return: a set identifying every mesh, material, texture and image that exists right now (see purge_orphans)
+    """
+    return set(block.as_pointer() for collection in _purgeable_collections() for block in collection)
+
+
+def purge_orphans(keep=()):
+    """
+    Removes the meshes, materials, textures and images that nothing uses anymore.
+
+    :param keep: pointers (from datablock_pointers) of datablocks to leave alone even if they're unused, like the
+                 materials that came with the startup file
+    :return: how many datablocks were removed
+    """
+    removed = 0
+    for collection in _purgeable_collections():
+        for block in list(collection):
+            if block.users or block.use_fake_user or block.as_pointer() in keep:
+                continue
+            if isinstance(block, bpy.types.Image) and block.type != 'IMAGE':
+                continue  # leave the 'Render Result' and 'Viewer Node' images
+            collection.remove(block)
+            removed += 1
+    logging.debug("Purged %d orphaned datablocks", removed)
+    return removed
+
+
+def _purgeable_collections():
+    return data.meshes, data.materials, data.textures, data.images
+
+
+
+def scale_mesh(mesh, max_dim=9.0):
+    """
+    Scales the given object so that it's longest dimension on any axis is exactly the number of units specified by
+    max_dim. This is useful for scaling objects to a consistent size.
+
+    If an object's maximum dimension is 0, no action is performed.
+
+    :param mesh: the object to scale to be exactly `max_dim` units at it's longest side
+    :param max_dim: the limit to how big an object can be on any axis
+    """
+    logging.debug("Scaling mesh %s to a maximum of %s in any direction" % (mesh.name, max_dim))
+    max_length = max(mesh.dimensions)
+    print('=================================================',max_length)
+    if max_length == 0:
+        logging.debug("No scaling for %s because its dimensions are %s" % (mesh.name, repr(mesh.dimensions)))
+        return  # skip scaling
+    scale_factor = 1 / (max_length / max_dim)
+    mesh.scale = (scale_factor, scale_factor, scale_factor)
+    x, y, z = [i for i in mesh.dimensions]  # for pretty dimension formatting
+    new_dimensions = "X=%s, Y=%s, Z=%s" % (x, y, z)
+    logging.debug("Scale factor for mesh %s is %s. Its new dimensions are %s",
+                  mesh.name, scale_factor, [i for i in new_dimensions])
+
+
+def decimate_mesh(mesh, budget):
+    """
+    Reduces the mesh to about `budget` triangles with a Decimate modifier (collapsing edges, which keeps the overall
+    shape and outline) and bakes the result into the mesh data. Meshes already within the budget are left alone.
+
+    :param mesh: the mesh object to decimate
+    :param budget: the most triangles the mesh should have
+    :return: True if the mesh was decimated
+    """
+    triangles = count_triangles(mesh)
+    if triangles <= budget:
+        return False
+    logging.debug("Decimating %s from %d triangles to about %d", mesh.name, triangles, budget)
+    modifier = mesh.modifiers.new('mesh2img_decimate', 'DECIMATE')
+    modifier.decimate_type = 'COLLAPSE'
+    modifier.ratio = float(budget) / triangles
+    modifier.use_collapse_triangulate = True
+    evaluated = mesh.evaluated_get(context.evaluated_depsgraph_get())
+    decimated = data.meshes.new_from_object(evaluated)
+    mesh.modifiers.remove(modifier)
+    original, mesh.data = mesh.data, decimated
+    if original.users == 0:
+        data.meshes.remove(original)
+    return True
+
+
+def apply_render_profile(scene, settings):
+    """
+    Sets up the render engine of the scene according to one of Mesh2Img.RENDER_PROFILES.
+
+    :param scene: the Blender scene
+    :param settings: the profile's settings dictionary
+    """
+    engines = [item.identifier for item in scene.render.bl_rna.properties['engine'].enum_items]
+    engine = settings['engine']
+    if engine == 'BLENDER_EEVEE' and engine not in engines:
+        engine = 'BLENDER_EEVEE_NEXT'  # what it's called in Blender 4.2 to 4.x
+    scene.render.engine = engine
+    samples = settings.get('samples', 1)
+    if engine == 'BLENDER_WORKBENCH':
+        options = [int(item.identifier) for item in scene.display.bl_rna.properties['render_aa'].enum_items
+                   if item.identifier.isdigit()]
+        bigger = [option for option in options if option >= samples]
+        scene.display.render_aa = str(min(bigger)) if samples > 1 and bigger else 'OFF'
+    elif engine.startswith('BLENDER_EEVEE'):
+        scene.eevee.taa_render_samples = samples
+    elif engine == 'CYCLES':
+        scene.cycles.device = 'CPU'
+        scene.cycles.samples = samples
+        scene.cycles.use_denoising = bool(settings.get('denoise'))
+        tile_size = settings.get('tile_size')
+        if tile_size and hasattr(scene.cycles, 'tile_size'):  # Blender 3.0 and later
+            scene.cycles.tile_size = tile_size
+        elif tile_size:
+            scene.render.tile_x = scene.render.tile_y = tile_size
+
+
+# the (scene attribute, setting) pairs that apply_render_profile can change
+RENDER_PROFILE_SETTINGS = (
+    ('render', 'engine'), ('render', 'tile_x'), ('render', 'tile_y'), ('display', 'render_aa'),
+    ('eevee', 'taa_render_samples'), ('cycles', 'device'), ('cycles', 'samples'), ('cycles', 'use_denoising'),
+    ('cycles', 'tile_size'),
+)
+
+
+def save_render_settings(scene):
+    """
+    :param scene: the Blender scene
+    :return: the current values of every setting in RENDER_PROFILE_SETTINGS that this Blender has, for
+             restore_render_settings
+    """
+    saved = []
+    for group, name in RENDER_PROFILE_SETTINGS:
+        owner = getattr(scene, group, None)
+        if owner is not None and hasattr(owner, name):  # scene.cycles only exists with the Cycles add-on enabled
+            saved.append((owner, name, getattr(owner, name)))
+    return saved
+
+
+def restore_render_settings(saved):
+    """
+    Puts back the render settings saved by save_render_settings.
+
+    :param saved: what save_render_settings returned
+    """
+    for owner, name, value in saved:
+        setattr(owner, name, value)
+
+
+def set_camera(x=0, y=0, z=10, rotation_x=0, rotation_y=0, rotation_z=0, camera_name='Camera'):
+    """
+    Sets the camera named by `camera_name` to the given coordinates.
+    :param x: the X position of the camera
     :param y: the Y position of the camera
     :param z: the Z position of the camera
     :param rotation_x: the X rotation of the camera in degrees
@@ -459,8 +2248,1800 @@ def size_object(object):
 def distance(p1, p2):
     return sqrt((p1[0]-p2[0])**2+(p1[1]-p2[1])**2+(p1[2]-p2[2])**2)
 
+class RunMetrics(object):
+    """
+    Times each stage of processing every mesh and writes it out as JSON-lines, one line per mesh, like:
+
+    {"path": ..., "status": "ok", "file_size": ..., "triangles": ..., "peak_rss": ..., "seconds": ...,
+     "stages": {"import": {"wall": ..., "cpu": ...}, "render:200x200": {...}, ...}}
+
+    write_summary() adds a last line of {"summary": {...}} with the 50th/95th percentile and maximum wall time of each
+    stage, the wall time of the stages that belong to the whole run (in run_stages) and the meshes per second. When
+    no file path is given, all of this is skipped.
+    """
+
+    def __init__(self, filepath=None):
+        """
+        :param filepath: the JSON-lines file to append to. None turns metrics off.
+        """
+        self.filepath = filepath
+        self.enabled = bool(filepath)
+        self.records = []
+        self.run_stages = {}  # stages that aren't part of any one mesh, like discovery
+        self.started = time.time()
+        self.run = None
+        self._current = None
+
+    def begin_run(self, run=None):
+        """
+        Starts the clock for the meshes per second of the summary.
+
+        :param run: a label stored with every mesh record so runs appending to the same file can be told apart
+        """
+        self.started = time.time()
+        self.run = run
+
+    def begin_mesh(self, filepath):
+        """
+        Starts a new record. Stages timed from now until end_mesh belong to this mesh.
+
+        :param filepath: the path to the mesh file
+        """
+        if not self.enabled:
+            return
+        try:
+            size = source_stat(filepath)[0]
+        except OSError:
+            size = None
+        self._current = {'path': filepath, 'run': self.run, 'file_size': size, 'stages': {},
+                         'started': time.time()}
+
+    def end_mesh(self, status):
+        """
+        Finishes the current mesh's record and appends it to the metrics file.
+
+        :param status: 'ok' or 'failed'
+        """
+        if not self.enabled or self._current is None:
+            return
+        record, self._current = self._current, None
+        record['seconds'] = time.time() - record.pop('started')
+        record['status'] = status
+        record['peak_rss'] = peak_rss()
+        self.records.append(record)
+        append_json_line(self.filepath, record)
+
+    def set(self, key, value):
+        """
+        Adds a value (like the triangle count) to the current mesh's record.
+        """
+        if self._current is not None:
+            self._current[key] = value
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        Times the code inside the `with` block as the given stage. Timing the same stage twice for one mesh adds up.
+
+        :param name: the name of the stage (like 'import' or 'render:200x200')
+        """
+        if not self.enabled:
+            yield
+            return
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            stages = self._current['stages'] if self._current is not None else self.run_stages
+            timing = stages.setdefault(name, {'wall': 0.0, 'cpu': 0.0})
+            timing['wall'] += time.perf_counter() - wall
+            timing['cpu'] += time.process_time() - cpu
+
+    def timed_iter(self, name, iterable):
+        """
+        Yields from the iterable, timing only how long it takes to get each item as the given stage. Good for
+        generators that do their work lazily, like walking directories.
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def summary(self):
+        """
+        :return: a dictionary summing up every mesh recorded so far
+        """
+        elapsed = time.time() - self.started
+        walls = {}
+        for record in self.records:
+            for name, timing in record['stages'].items():
+                walls.setdefault(name, []).append(timing['wall'])
+        stages = {}
+        for name, values in walls.items():
+            p50, p95 = [float(value) for value in np.percentile(values, [50, 95])]
+            stages[name] = {'count': len(values), 'total': sum(values), 'p50': p50, 'p95': p95, 'max': max(values)}
+        profiles = {}  # render time per render profile, from stages named like 'render:200x200:draft'
+        for name, values in walls.items():
+            parts = name.split(':')
+            if parts[0] == 'render' and len(parts) == 3:
+                profiles.setdefault(parts[2], []).extend(values)
+        rss = [record['peak_rss'] for record in self.records if record.get('peak_rss')]
+        return {
+            'meshes': len(self.records),
+            'failed': sum(1 for record in self.records if record['status'] != 'ok'),
+            'duplicates': sum(1 for record in self.records if record.get('duplicate_of')),
+            'triangles': sum(record.get('triangles') or 0 for record in self.records),
+            'seconds': elapsed,
+            'meshes_per_second': len(self.records) / elapsed if elapsed > 0 else None,
+            'peak_rss': max(rss) if rss else None,
+            'stages': stages,
+            # stages of the whole run, which can have the same name as a per-mesh one (like write_wait)
+            'run_stages': dict((name, timing['wall']) for name, timing in self.run_stages.items()),
+            'profiles': dict((name, {'renders': len(values), 'total': sum(values), 'mean': sum(values) / len(values)})
+                             for name, values in profiles.items()),
+        }
+
+    def write_summary(self):
+        """
+        Appends the summary to the metrics file and prints it.
+
+        :return: the summary dictionary (None if metrics are off)
+        """
+        if not self.enabled:
+            return None
+        summary = self.summary()
+        append_json_line(self.filepath, {'summary': summary})
+        print("%d meshes in %.1fs (%s meshes/sec)" % (summary['meshes'], summary['seconds'],
+                                                      '%.2f' % summary['meshes_per_second']
+                                                      if summary['meshes_per_second'] else '-'))
+        for name, stats in sorted(summary['stages'].items()):
+            print("  %-20s p50 %8.3fs  p95 %8.3fs  max %8.3fs" % (name, stats['p50'], stats['p95'], stats['max']))
+        for name, seconds in sorted(summary['run_stages'].items()):
+            print("  %-20s %8.3fs for the whole run" % (name, seconds))
+        for name, stats in sorted(summary['profiles'].items()):
+            print("  profile %-12s %d renders, %.3fs each on average" % (name, stats['renders'], stats['mean']))
+        return summary
+
+
+def peak_rss():
+    """
+    :return: the most memory this process has used at once, in bytes (None where this can't be found out)
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # macOS reports bytes, Linux kilobytes
+
+
+def process_rss(pid):
+    """
+    :param pid: the ID of a running process
+    :return: how much memory the process is using right now, in bytes (None where this can't be found out)
+    """
+    try:
+        with open('/proc/%d/status' % pid) as f:  # only Linux has this
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except (IOError, ValueError):
+        pass
+    return None
+
+
+def count_triangles(obj):
+    """
+    :param obj: a mesh object
+    :return: how many triangles the object's mesh has once its polygons are split into triangles
+    """
+    polygons = obj.data.polygons
+    sizes = np.empty(len(polygons), dtype=np.int32)
+    polygons.foreach_get('loop_total', sizes)
+    return int((sizes - 2).sum())
+
+
+class Manifest(object):
+    """
+    Remembers what was rendered from each mesh file so that the next run can skip the meshes that haven't changed.
+
+    The manifest is a JSON-lines file with one entry per rendered mesh: the mesh path, its size, modification time and
+    content hash, the settings fingerprint (see Mesh2Img.settings_fingerprint) and the images it produced. New entries
+    are appended, so several Blender processes can share one manifest. The newest entry for a path wins.
+    """
+
+    def __init__(self, filepath):
+        """
+        :param filepath: the path to the manifest file (it's created on the first write if it doesn't exist)
+        """
+        self.filepath = filepath
+        self.entries = {}
+        self._lines = 0
+        for record in read_json_lines(filepath):
+            self.entries[record['path']] = record
+            self._lines += 1
+
+    def is_current(self, filepath, fingerprint):
+        """
+        Checks whether the mesh file was already rendered with the same settings and its images are still there. The
+        size and modification time are checked first. Only when those changed is the content hash compared, so a file
+        that was just touched or copied over with the same bytes is still skipped.
+
+        :param filepath: the path to the mesh file
+        :param fingerprint: the settings fingerprint of the current batch
+        :return: True if the mesh doesn't need to be rendered again
+        """
+        entry = self.entries.get(os.path.abspath(filepath))
+        if entry is None or entry['fingerprint'] != fingerprint:
+            return False
+        if not entry['outputs'] or not all(output_exists(output) for output in entry['outputs']):
+            return False
+        try:
+            size, mtime = source_stat(filepath)
+        except OSError:
+            return False
+        if size == entry['size'] and mtime == entry['mtime']:
+            return True
+        if size != entry['size'] or file_digest(filepath) != entry['sha1']:
+            return False
+        self.record(filepath, fingerprint, entry['outputs'], entry['sha1'])  # same content, so remember the new mtime
+        return True
+
+    def outputs(self, filepath):
+        """
+        :param filepath: the path to the mesh file
+        :return: the image paths that were recorded for this mesh (an empty list if there's no entry)
+        """
+        entry = self.entries.get(os.path.abspath(filepath))
+        return list(entry['outputs']) if entry else []
+
+    def record(self, filepath, fingerprint, outputs, sha1=None):
+        """
+        Adds (or replaces) the entry for a mesh that was just rendered.
+
+        :param filepath: the path to the mesh file
+        :param fingerprint: the settings fingerprint it was rendered with
+        :param outputs: the paths of the images that were made from it
+        :param sha1: the file's SHA-1 hex digest (see file_digest) if it's already known. Otherwise the file is read
+                     again to work it out.
+        """
+        size, mtime = source_stat(filepath)
+        entry = {'path': os.path.abspath(filepath), 'size': size, 'mtime': mtime,
+                 'sha1': sha1 or file_digest(filepath), 'fingerprint': fingerprint, 'outputs': list(outputs)}
+        self.entries[entry['path']] = entry
+        append_json_line(self.filepath, entry)
+        self._lines += 1
+
+    def compact(self):
+        """
+        Rewrites the manifest file with only the newest entry for each path. Don't call this while other processes
+        might be appending to the same manifest.
+        """
+        if self._lines <= len(self.entries):
+            return  # nothing outdated in there
+        temp_path = self.filepath + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(entry, sort_keys=True) + '\n')
+        os.replace(temp_path, self.filepath)
+        self._lines = len(self.entries)
+
+
+class Journal(object):
+    """
+    Keeps track of how each mesh of a batch turned out, so a batch that was stopped or crashed can be started again
+    and pick up where it left off.
+
+    The journal is a JSON-lines file with a record for every mesh that was started and another once it's done: the
+    mesh path, its status, its size and modification time, and the images it produced or the error it failed with.
+    The newest record for a path wins. A mesh whose newest status is 'ok', 'failed' or 'quarantined' is done and isn't
+    rendered again unless the file changes. Any other status (like 'started', 'crashed' or 'interrupted') means it's
+    rendered again. Unlike a Manifest, a journal doesn't care about settings, and only one process should write to it.
+    """
+
+    FINISHED = ('ok', 'failed', 'quarantined')
+    QUARANTINE_AFTER = 2  # how many runs have to die while rendering a mesh before it's quarantined
+
+    def __init__(self, filepath):
+        """
+        Loads the journal. If the last mesh started in it never finished, whatever was rendering it died. Blender can
+        crash on a bad mesh, but the process can also be killed from outside (by a job scheduler, the OOM killer or a
+        reboot), so the mesh is only marked 'crashed' and tried again. Once QUARANTINE_AFTER runs have died on it,
+        it's quarantined rather than given the chance to take down the next run too.
+
+        :param filepath: the path to the journal file (it's created on the first write if it doesn't exist)
+        """
+        self.filepath = filepath
+        self.entries = {}
+        self._lines = 0
+        last_started = None
+        for record in read_json_lines(filepath):
+            self.entries[record['path']] = record
+            self._lines += 1
+            if record['status'] == 'started':
+                last_started = record['path']
+        self.compact()
+        if last_started is not None and self.entries[last_started]['status'] == 'started':
+            crashes = self.entries[last_started].get('crashes', 0) + 1
+            if crashes >= self.QUARANTINE_AFTER:
+                logging.warning("Quarantining %s because %d runs stopped while rendering it", last_started, crashes)
+                self.record(last_started, 'quarantined', crashes=crashes,
+                            error="%d runs stopped while rendering it" % crashes)
+            else:
+                logging.warning("The last run stopped while rendering %s, so it's tried again", last_started)
+                self.record(last_started, 'crashed', crashes=crashes)
+
+    def is_finished(self, filepath):
+        """
+        :param filepath: the path to the mesh file
+        :return: True if the mesh was rendered (or failed, or was quarantined) and the file hasn't changed since
+        """
+        entry = self.entries.get(os.path.abspath(filepath))
+        if entry is None or entry['status'] not in self.FINISHED:
+            return False
+        try:
+            size, mtime = source_stat(filepath)
+        except OSError:
+            return False
+        return size == entry['size'] and mtime == entry['mtime']
+
+    def get(self, filepath):
+        """
+        :param filepath: the path to the mesh file
+        :return: the newest record for the mesh, or None
+        """
+        return self.entries.get(os.path.abspath(filepath))
+
+    def record(self, filepath, status, **details):
+        """
+        Adds a record for a mesh.
+
+        :param filepath: the path to the mesh file
+        :param status: like 'started', 'ok', 'failed' or 'quarantined'
+        :param details: more to record, like 'outputs' or 'error'
+        """
+        try:
+            size, mtime = source_stat(filepath)
+        except OSError:
+            size = mtime = None
+        entry = {'path': os.path.abspath(filepath), 'status': status, 'size': size, 'mtime': mtime,
+                 'time': time.time()}
+        previous = self.entries.get(entry['path'])
+        if status == 'started' and previous is not None and previous.get('crashes'):  # keep counting them
+            entry['crashes'] = previous['crashes']
+        entry.update(details)
+        self.entries[entry['path']] = entry
+        append_json_line(self.filepath, entry)
+        self._lines += 1
+
+    def compact(self):
+        """
+        Rewrites the journal file with only the newest record for each path.
+        """
+        if self._lines <= len(self.entries):
+            return
+        temp_path = self.filepath + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(entry, sort_keys=True) + '\n')
+        os.replace(temp_path, self.filepath)
+        self._lines = len(self.entries)
+
+
+class DuplicateFinder(object):
+    """
+    Remembers the meshes rendered so far and finds out whether another mesh file is a duplicate of one of them.
+
+    In 'bytes' mode, files are duplicates if their contents hash the same. In 'geometry' mode, meshes are duplicates if
+    they have the same number of triangles in the same places, no matter how the file stores them (ASCII or binary,
+    STL or PLY, vertices numbered and triangles ordered any way). Meshes that only differ in position or size match
+    too, since every mesh is centered and scaled to the same size before it's rendered anyway. Numbers written out as
+    text lose a few digits, so geometry can't be hashed exactly. Instead each mesh gets a short signature (see
+    geometry_signature) that's compared with a tolerance against the meshes with the same triangle count. When the
+    signatures match, the triangles of both meshes are compared to check that every triangle of one has a triangle of
+    the other in the same place (see same_centers). The triangle centers of the meshes added so far are kept for that,
+    up to CACHED_TRIANGLES of them, so each mesh file is only read once. Past that, an original is read again if
+    another mesh's signature matches its own.
+    """
+
+    MODES = ('bytes', 'geometry')
+    TOLERANCE = 1e-4  # how far apart signatures may be, as a fraction of the mesh's biggest dimension
+    CACHED_TRIANGLES = 20000000  # the most triangle centers kept (12 bytes each) for comparing with later meshes
+
+    def __init__(self, mode='bytes'):
+        """
+        :param mode: 'bytes' or 'geometry'
+        """
+        if mode not in self.MODES:
+            raise ValueError("%s is not a dedup mode. Use one of %s." % (mode, ', '.join(self.MODES)))
+        self.mode = mode
+        self._seen = {}  # key -> [(signature, triangle centers or None, path), ...], newest first
+        self._cached = 0  # how many triangle centers are kept in _seen
+
+    def key(self, filepath):
+        """
+        Reads what's needed to compare the mesh. This doesn't change anything, so it can run on several threads.
+
+        :param filepath: the path to a mesh file
+        :return: a (key, signature, triangle centers) tuple for match and add. Meshes can only be duplicates if their
+                 keys are equal. The signature and centers are None in 'bytes' mode.
+        """
+        if self.mode == 'geometry':
+            try:
+                vertices, faces = self._read(filepath)
+                return ('triangles', len(faces)), geometry_signature(vertices, faces), unit_centers(vertices, faces)
+            except Exception as ex:  # the NumPy readers can't read everything Blender can
+                logging.warning("Can't compare the geometry of %s, so only exact copies count (%r)", filepath, ex)
+        return ('sha1', file_digest(filepath)), None, None
+
+    def match(self, key):
+        """
+        :param key: the (key, signature, triangle centers) tuple of a mesh
+        :return: the path of the mesh it's a duplicate of, or None
+        """
+        key, signature, centers = key
+        for seen, original_centers, original in self._seen.get(key, ()):
+            if signature is None:
+                return original
+            if not np.allclose(seen, signature, rtol=0, atol=self.TOLERANCE):
+                continue
+            if original_centers is None:  # there wasn't room to keep them
+                original_centers = unit_centers(*self._read(original))
+            if same_centers(centers, original_centers, self.TOLERANCE):
+                return original
+        return None
+
+    @staticmethod
+    def _read(filepath):
+        with local_copy(filepath) as local_path:
+            return MESH_READERS[os.path.splitext(filepath)[1].lower()](local_path)
+
+    def add(self, key, filepath):
+        """
+        Remembers a rendered mesh so later duplicates of it are found.
+
+        :param key: the (key, signature, triangle centers) tuple of the mesh
+        :param filepath: its path
+        """
+        key, signature, centers = key
+        if centers is not None:
+            if self._cached + len(centers) > self.CACHED_TRIANGLES:
+                centers = None
+            else:
+                self._cached += len(centers)
+        self._seen.setdefault(key, []).insert(0, (signature, centers, filepath))
+
+
+def _unit_corners(vertices, faces):
+    """
+    :return: the (M, 3, 3) corners of the triangles, moved and scaled so the mesh fits a box from 0 to 1
+    """
+    corners = np.asarray(vertices, dtype=np.float64)[np.asarray(faces)]
+    if not len(corners):
+        return corners.reshape(0, 3, 3)
+    low = corners.reshape(-1, 3).min(axis=0)
+    extent = float((corners.reshape(-1, 3).max(axis=0) - low).max()) or 1.0
+    return (corners - low) / extent
+
+
+def unit_centers(vertices, faces):
+    """
+    :param vertices: a float array of shape (N, 3)
+    :param faces: an int array of vertex indexes of shape (M, 3)
+    :return: the (M, 3) float32 centers of the triangles, once the mesh is moved and scaled to fit a box from 0 to 1
+    """
+    return _unit_corners(vertices, faces).mean(axis=1).astype(np.float32)
+
+
+def same_centers(centers, other, tolerance=1e-4):
+    """
+    Checks whether two meshes have their triangles in the same places, once each is moved and scaled to fit the same
+    box. Every triangle's center must have a triangle center of the other mesh within about the tolerance, both ways.
+
+    :param centers: the triangle centers of a mesh, as unit_centers returns them
+    :param other: the triangle centers of another mesh
+    :param tolerance: how far apart the centers may be, as a fraction of the mesh's biggest dimension
+    :return: True if the meshes match
+    """
+    centers = [centers, other]
+    if len(centers[0]) != len(centers[1]):
+        return False
+    if not len(centers[0]):
+        return True
+    size = int(math.ceil(1.0 / tolerance)) + 3  # grid cells per axis, with room for the neighbors of the edge cells
+    offsets = np.array([(dx * size + dy) * size + dz for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)])
+    for points, targets in ((centers[0], centers[1]), (centers[1], centers[0])):
+        cells = (np.floor(targets / tolerance).astype(np.int64) + 1) @ np.array([size * size, size, 1])
+        cells = np.unique(cells)
+        keys = (np.floor(points / tolerance).astype(np.int64) + 1) @ np.array([size * size, size, 1])
+        found = np.zeros(len(keys), dtype=bool)
+        for offset in offsets:  # a point matches if a target is in its grid cell or one of the cells around it
+            neighbors = keys + offset
+            index = np.minimum(np.searchsorted(cells, neighbors), len(cells) - 1)
+            found |= cells[index] == neighbors
+        if not found.all():
+            return False
+    return True
+
+
+def geometry_signature(vertices, faces, samples=32):
+    """
+    Sums up where a mesh's triangles are with a few numbers. The mesh is first moved and scaled to fit a unit box.
+    Then the corners' X, Y and Z positions and the triangles' areas are each sorted and sampled at evenly spaced
+    points. Sorting makes the numbers independent of how vertices and triangles are ordered, and changing the positions
+    a little changes the signature only as much.
+
+    :param vertices: a float array of shape (N, 3)
+    :param faces: an int array of vertex indexes of shape (M, 3)
+    :param samples: how many numbers to keep for each of X, Y, Z and area
+    :return: a float32 array of 4 * samples numbers
+    """
+    corners = _unit_corners(vertices, faces)
+    if not len(corners):
+        return np.zeros(4 * samples, dtype=np.float32)
+    areas = np.linalg.norm(np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0]), axis=1) / 2
+    points = np.linspace(0, 1, samples)
+    parts = [np.quantile(corners[:, :, axis].ravel(), points) for axis in range(3)]
+    parts.append(np.quantile(areas, points) * samples)  # areas are tiny, so scale them up to matter as much
+    return np.concatenate(parts).astype(np.float32)
+
+
+def load_image_pixels(filepath):
+    """
+    Reads an image file into memory using Blender's image loaders.
+
+    :param filepath: the path to the image file
+    :return: a NumPy array of RGBA values from 0.0 to 1.0 with the shape (height, width, 4), bottom row first
+    """
+    image = data.images.load(filepath, check_existing=False)
+    try:
+        width, height = image.size
+        channels = len(image.pixels) // (width * height)
+        pixels = np.empty(width * height * channels, dtype=np.float32)
+        image.pixels.foreach_get(pixels)
+    finally:
+        data.images.remove(image)
+    pixels = pixels.reshape(height, width, channels)
+    if channels == 4:
+        return pixels
+    rgba = np.ones((height, width, 4), dtype=np.float32)
+    rgba[:, :, :channels] = pixels
+    if channels == 1:  # grayscale
+        rgba[:, :, 1] = rgba[:, :, 2] = pixels[:, :, 0]
+    return rgba
+
+
+def resample_pixels(pixels, width, height):
+    """
+    Resizes an image by averaging each output pixel over exactly the area of the input it covers. Colors are weighted
+    by their alpha so transparent edges don't turn dark.
+
+    :param pixels: a NumPy array of RGBA values with the shape (height, width, 4)
+    :param width: the width of the resized image
+    :param height: the height of the resized image
+    :return: a new NumPy array with the shape (height, width, 4)
+    """
+    src_height, src_width = pixels.shape[:2]
+    if (src_width, src_height) == (width, height):
+        return pixels
+    premultiplied = pixels.astype(np.float64)
+    premultiplied[:, :, :3] *= premultiplied[:, :, 3:4]
+    rows = np.tensordot(_area_weights(src_height, height), premultiplied, axes=(1, 0))  # (height, src_width, 4)
+    resized = np.tensordot(rows, _area_weights(src_width, width), axes=(1, 1)).transpose(0, 2, 1)
+    alpha = resized[:, :, 3:4]
+    np.divide(resized[:, :, :3], alpha, out=resized[:, :, :3], where=alpha > 0)
+    return np.clip(resized, 0.0, 1.0).astype(np.float32)
+
+
+def _area_weights(src_size, dst_size):
+    """
+    :return: a (dst_size, src_size) matrix where each row holds how much of each source pixel falls into that output
+             pixel. Each row adds up to 1.
+    """
+    scale = src_size / float(dst_size)
+    edges = np.arange(dst_size + 1) * scale  # the edges of the output pixels in source pixel coordinates
+    src = np.arange(src_size)
+    overlap = np.minimum(edges[1:, None], src[None, :] + 1) - np.maximum(edges[:-1, None], src[None, :])
+    return np.clip(overlap, 0.0, None) / scale
+
+
+def pixels_to_bytes(pixels):
+    """
+    :param pixels: a NumPy array of RGBA values from 0.0 to 1.0 with the shape (height, width, 4)
+    :return: the same pixels as 8-bit values (rounded the same way Blender does it)
+    """
+    return (np.clip(pixels, 0.0, 1.0) * 255.0 + 0.5).astype(np.uint8)
+
+
+def encode_png(pixels, compression=100, alpha=True):
+    """
+    Encodes pixels as an 8-bit PNG without Blender, so it can be done outside of Blender's main thread. Every row is
+    stored with the "up" filter, which suits rendered images well.
+
+    :param pixels: a NumPy array of RGBA values from 0.0 to 1.0 with the shape (height, width, 4), bottom row first
+    :param compression: valid numbers are 0-100, the same as Blender's PNG compression setting
+    :param alpha: if False, the alpha channel is left out (an RGB PNG)
+    :return: the PNG file as bytes
+    """
+    rows = pixels_to_bytes(pixels)[::-1, :, :4 if alpha else 3]  # PNGs start with the top row
+    height, width, channels = rows.shape
+    rows = rows.reshape(height, width * channels)
+    filtered = np.empty((height, width * channels + 1), dtype=np.uint8)
+    filtered[:, 0] = 2  # the "up" filter: each byte minus the one above it
+    filtered[0, 1:] = rows[0]
+    np.subtract(rows[1:], rows[:-1], out=filtered[1:, 1:])
+
+    def chunk(tag, body):
+        return struct.pack('>I', len(body)) + tag + body + struct.pack('>I', zlib.crc32(tag + body) & 0xffffffff)
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 6 if alpha else 2, 0, 0, 0)
+    level = min(9, int(compression) * 9 // 100)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) +
+            chunk(b'IDAT', zlib.compress(filtered.tobytes(), level)) + chunk(b'IEND', b''))
+
+
+def encode_bmp(pixels):
+    """
+    Encodes pixels as a 24-bit BMP without Blender (alpha is dropped, like Blender's RGB BMPs).
+
+    :param pixels: a NumPy array of RGBA values from 0.0 to 1.0 with the shape (height, width, 4), bottom row first
+    :return: the BMP file as bytes
+    """
+    bgr = pixels_to_bytes(pixels)[:, :, 2::-1]  # BMPs start with the bottom row too, but go blue, green, red
+    height, width = bgr.shape[:2]
+    stride = (width * 3 + 3) & ~3  # each row is padded to 4 bytes
+    rows = np.zeros((height, stride), dtype=np.uint8)
+    rows[:, :width * 3] = bgr.reshape(height, width * 3)
+    header = struct.pack('<2sIHHI', b'BM', 54 + rows.nbytes, 0, 0, 54)
+    info = struct.pack('<IiiHHIIiiII', 40, width, height, 1, 24, 0, rows.nbytes, 2835, 2835, 0, 0)
+    return header + info + rows.tobytes()
+
+
+def encode_tiff(pixels):
+    """
+    Encodes pixels as an uncompressed 8-bit RGB TIFF without Blender.
+
+    :param pixels: a NumPy array of RGBA values from 0.0 to 1.0 with the shape (height, width, 4), bottom row first
+    :return: the TIFF file as bytes
+    """
+    rgb = pixels_to_bytes(pixels)[::-1, :, :3]  # TIFFs start with the top row
+    height, width = rgb.shape[:2]
+    entries = [  # (tag, type, value), where type 3 is a SHORT and 4 is a LONG
+        (256, 4, width), (257, 4, height), (258, 3, None), (259, 3, 1), (262, 3, 2), (273, 4, None),
+        (277, 3, 3), (278, 4, height), (279, 4, rgb.nbytes), (284, 3, 1),
+    ]
+    ifd_size = 2 + 12 * len(entries) + 4
+    bits_offset = 8 + ifd_size  # the 3 bits per sample values don't fit in the entry, so they follow the directory
+    data_offset = bits_offset + 6
+    ifd = struct.pack('<H', len(entries))
+    for tag, kind, value in entries:
+        if tag == 258:
+            ifd += struct.pack('<HHII', tag, kind, 3, bits_offset)
+        elif tag == 273:
+            ifd += struct.pack('<HHII', tag, kind, 1, data_offset)
+        elif kind == 3:
+            ifd += struct.pack('<HHIHH', tag, kind, 1, value, 0)
+        else:
+            ifd += struct.pack('<HHII', tag, kind, 1, value)
+    ifd += struct.pack('<I', 0)  # no more directories
+    return b'II*\x00' + struct.pack('<I', 8) + ifd + struct.pack('<HHH', 8, 8, 8) + rgb.tobytes()
+
+
+class AsyncImageWriter(object):
+    """
+    Encodes and writes images on background threads so Blender can get on with the next render in the meantime.
+    Blender's own image writers can only be used from the main thread, so the images are encoded with the NumPy and
+    zlib encoders in ENCODERS instead. zlib and NumPy let go of the GIL while they work, so the threads really do run
+    alongside the render.
+
+    At most max_pending images are waiting to be written at once. submit() waits for one of them to finish when there
+    are that many, which keeps the rendered pixels from piling up in memory when writing can't keep up.
+    """
+
+    ENCODERS = {
+        # image formats that can be written without Blender
+        'bmp': encode_bmp,
+        'png': encode_png,
+        'tif': encode_tiff,
+    }
+
+    def __init__(self, threads=2, max_pending=8):
+        """
+        :param threads: how many images to encode and write at the same time
+        :param max_pending: the most images that can be waiting to be written (including those being written)
+        """
+        self._executor = ThreadPoolExecutor(max_workers=max(1, int(threads)))
+        self._slots = threading.BoundedSemaphore(max(1, int(max_pending)))
+
+    def submit(self, pixels, filepath, file_format='png', size=None, info=None):
+        """
+        Queues an image to be written. Waits first if max_pending images are already waiting.
+
+        :param pixels: a NumPy array of RGBA pixels (see load_image_pixels). It mustn't be changed afterwards.
+        :param filepath: the path to write the image to (missing folders are created)
+        :param file_format: a key of ENCODERS
+        :param size: a (width, height) to resample the pixels to first, or None to keep their size
+        :param info: details for the sink the image goes to, if it goes to one (see write_output)
+        :return: a concurrent.futures.Future that's done when the file is written (and holds the error if it wasn't)
+        """
+        if file_format not in self.ENCODERS:
+            raise ValueError("%s images can't be written in the background." % file_format)
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(self._write, pixels, filepath, file_format, size, info or {})
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _write(self, pixels, filepath, file_format, size, info):
+        if size:
+            pixels = resample_pixels(pixels, *size)
+        write_output(filepath, self.ENCODERS[file_format](pixels), **info)
+        logging.info("Saved image %s", filepath)
+
+    def close(self):
+        """
+        Waits for every queued image to be written and stops the threads.
+        """
+        self._executor.shutdown(wait=True)
+
+
+class OutputSink(object):
+    """
+    Collects the images of a batch into one big file instead of writing each one as a file of its own. Job templates
+    pick a sink with their `sink` setting, like 'zip:/out/thumbs.zip', 'tar:/out/thumbs.tar' or
+    'sqlite:/out/thumbs.db' (see parse_sink). The image paths of a sink are the sink's path followed by the name from
+    the output template, like `/out/thumbs.zip/part_200.png`.
+
+    Images are kept in memory and written BATCH_SIZE at a time (or sooner if they add up to BATCH_BYTES), so the disk
+    sees a few big writes instead of lots of small ones. Sinks are shared by the threads of an AsyncImageWriter, so all
+    of this happens under a lock. Images still waiting to be written when the process dies are lost, and since they
+    don't exist in the sink afterwards, the next run with a manifest renders those meshes again.
+    """
+
+    BATCH_SIZE = 256
+    BATCH_BYTES = 32 * 1024 * 1024
+
+    def __init__(self, path, target=None):
+        """
+        :param path: the path the images are named under
+        :param target: the file to actually write to (defaults to path). Farm workers each write a part of their own
+                       that the coordinator merges into path at the end.
+        """
+        self.path = path
+        self.target = target or path
+        self._lock = threading.RLock()
+        self._pending = collections.OrderedDict()  # name -> (data, info)
+        self._pending_bytes = 0
+
+    def write(self, name, data, **info):
+        """
+        Adds an image to the sink. It's written out with the next batch.
+
+        :param name: the name of the image inside the sink
+        :param data: the encoded image file as bytes
+        :param info: details to store with the image where the sink has room for them (source, width, height,
+                     image_format)
+        """
+        with self._lock:
+            self._pending.pop(name, None)
+            self._pending[name] = (data, info)
+            self._pending_bytes += len(data)
+            if len(self._pending) >= self.BATCH_SIZE or self._pending_bytes >= self.BATCH_BYTES:
+                self.flush()
+
+    def flush(self):
+        """
+        Writes out every image waiting to be written.
+        """
+        with self._lock:
+            if self._pending:
+                self._write_batch(list((name, data, info) for name, (data, info) in self._pending.items()))
+                self._pending.clear()
+                self._pending_bytes = 0
+
+    def read(self, name):
+        """
+        :param name: the name of an image inside the sink
+        :return: the encoded image as bytes
+        """
+        with self._lock:
+            if name in self._pending:
+                return self._pending[name][0]
+            return self._read(name)
+
+    def exists(self, name):
+        """
+        :param name: the name of an image inside the sink
+        :return: True if the sink has an image by that name (written out or still waiting)
+        """
+        with self._lock:
+            return name in self._pending or self._exists(name)
+
+    def copy(self, name, new_name, **info):
+        """
+        Stores an image that's already in the sink under another name too (for duplicate meshes).
+
+        :param name: the name of the image to copy
+        :param new_name: the name to store it as
+        :param info: details to store with the copy (like write)
+        """
+        with self._lock:
+            self.write(new_name, self.read(name), **info)
+
+    def close(self):
+        """
+        Writes out what's left and closes the file.
+        """
+        with self._lock:
+            self.flush()
+            self._close()
+
+    def merge(self, part):
+        """
+        Adds every image in a part written by another process (see target) to this sink and deletes the part.
+
+        :param part: the path of the part
+        """
+        raise NotImplementedError
+
+    def _write_batch(self, batch):
+        raise NotImplementedError
+
+    def _read(self, name):
+        raise NotImplementedError
+
+    def _exists(self, name):
+        raise NotImplementedError
+
+    def _close(self):
+        pass
+
+
+class ZipSink(OutputSink):
+    """
+    Writes images into a zip file. They're stored without compressing them again, since image files are already
+    compressed. The zip's table of contents is only written when the sink is closed.
+
+    A zip member can't be replaced in place, so an image that's written again (like when a changed mesh is rendered
+    again into last run's zip) is added as another member with the same name. When the sink is closed, the zip is
+    rewritten without the outdated members so it doesn't keep growing from run to run.
+    """
+
+    def __init__(self, path, target=None):
+        super(ZipSink, self).__init__(path, target)
+        ensure_parent_dir(self.target)
+        self._zip = zipfile.ZipFile(self.target, 'a', zipfile.ZIP_STORED)
+        names = self._zip.namelist()
+        self._names = set(names)
+        self._outdated = len(names) > len(self._names)  # True if there are members to clean out on close
+
+    def _write_batch(self, batch):
+        for name, data, info in batch:
+            self._add(zipfile.ZipInfo(name, time.localtime()[:6]), data)
+        self._zip.fp.flush()
+
+    def _add(self, entry, data):
+        if entry.filename in self._names:
+            self._outdated = True
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', UserWarning)  # zipfile warns about the duplicate name
+            self._zip.writestr(entry, data)
+        self._names.add(entry.filename)
+
+    def _read(self, name):
+        return self._zip.read(name)
+
+    def _exists(self, name):
+        return name in self._names
+
+    def _close(self):
+        self._zip.close()
+        if self._outdated:
+            self._compact()
+
+    def _compact(self):
+        """
+        Rewrites the zip with only the newest member of each name.
+        """
+        temp_path = self.target + '.tmp'
+        with zipfile.ZipFile(self.target) as source, zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_STORED) as dest:
+            for entry in source.infolist():
+                if source.getinfo(entry.filename) is entry:  # getinfo gives the newest member with the name
+                    dest.writestr(entry, source.read(entry))
+        os.replace(temp_path, self.target)
+        self._outdated = False
+
+    def merge(self, part):
+        with self._lock:
+            self.flush()
+            with zipfile.ZipFile(part) as source:
+                for entry in source.infolist():
+                    self._add(entry, source.read(entry))
+            os.remove(part)
+
+
+class TarSink(OutputSink):
+    """
+    Writes images into an uncompressed tar file. Unlike a zip, the images written so far can be read even if the
+    process dies before the sink is closed. Where each image's data starts is kept track of, so reading one back
+    doesn't mean searching through the whole tar. An image that's written again is added again, and the newest one
+    counts.
+    """
+
+    def __init__(self, path, target=None):
+        super(TarSink, self).__init__(path, target)
+        ensure_parent_dir(self.target)
+        self._tar = tarfile.open(self.target, 'a')
+        self._index = {}  # image name -> (offset of its data in the tar, size)
+        for entry in self._tar.getmembers():
+            if entry.isfile():
+                self._index[entry.name] = (entry.offset_data, entry.size)
+
+    def _write_batch(self, batch):
+        for name, data, info in batch:
+            entry = tarfile.TarInfo(name)
+            entry.size = len(data)
+            entry.mtime = time.time()
+            self._add(entry, io.BytesIO(data))
+        self._tar.fileobj.flush()
+
+    def _add(self, entry, fileobj):
+        self._tar.addfile(entry, fileobj)
+        # the data ends where the tar is now, padded to a whole block
+        padded = (entry.size + tarfile.BLOCKSIZE - 1) // tarfile.BLOCKSIZE * tarfile.BLOCKSIZE
+        self._index[entry.name] = (self._tar.offset - padded, entry.size)
+
+    def _read(self, name):
+        offset, size = self._index[name]
+        self._tar.fileobj.flush()
+        with open(self.target, 'rb') as f:
+            f.seek(offset)
+            return f.read(size)
+
+    def _exists(self, name):
+        return name in self._index
+
+    def _close(self):
+        self._tar.close()
+
+    def merge(self, part):
+        with self._lock:
+            self.flush()
+            with tarfile.open(part) as source:
+                for entry in source.getmembers():
+                    if entry.isfile():
+                        self._add(entry, source.extractfile(entry))
+            self._tar.fileobj.flush()
+            os.remove(part)
+
+
+class SQLiteSink(OutputSink):
+    """
+    Writes images into an SQLite database, in a table like:
+
+    images(name TEXT PRIMARY KEY, source TEXT, width INTEGER, height INTEGER, image_format TEXT, data BLOB,
+           created REAL)
+
+    with an index on (source, width, height) to look them up by mesh and size. Each batch is written in one
+    transaction. Several processes can write to the same database, so farm workers don't need parts of their own.
+    """
+
+    def __init__(self, path, target=None):
+        super(SQLiteSink, self).__init__(path, path)
+        try:
+            import sqlite3
+        except ImportError:  # not every Python build has it
+            raise ValueError("SQLite sinks need Python's sqlite3 module, which this Python doesn't have.")
+        ensure_parent_dir(self.target)
+        self._db = sqlite3.connect(self.target, timeout=60, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        with self._db:
+            self._db.execute('CREATE TABLE IF NOT EXISTS images (name TEXT PRIMARY KEY, source TEXT, width INTEGER, '
+                             'height INTEGER, image_format TEXT, data BLOB, created REAL)')
+            self._db.execute('CREATE INDEX IF NOT EXISTS images_source ON images (source, width, height)')
+
+    def _write_batch(self, batch):
+        now = time.time()
+        rows = [(name, info.get('source'), info.get('width'), info.get('height'), info.get('image_format'),
+                 data, now) for name, data, info in batch]
+        with self._db:  # one transaction
+            self._db.executemany('INSERT OR REPLACE INTO images (name, source, width, height, image_format, data, '
+                                 'created) VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def _read(self, name):
+        row = self._db.execute('SELECT data FROM images WHERE name = ?', (name,)).fetchone()
+        if row is None:
+            raise KeyError(name)
+        return bytes(row[0])
+
+    def _exists(self, name):
+        return self._db.execute('SELECT 1 FROM images WHERE name = ?', (name,)).fetchone() is not None
+
+    def copy(self, name, new_name, **info):
+        with self._lock:
+            if name in self._pending:
+                return super(SQLiteSink, self).copy(name, new_name, **info)
+            with self._db:
+                self._db.execute('INSERT OR REPLACE INTO images (name, source, width, height, image_format, data, '
+                                 'created) SELECT ?, ?, width, height, image_format, data, ? FROM images '
+                                 'WHERE name = ?', (new_name, info.get('source'), time.time(), name))
+
+    def _close(self):
+        self._db.close()
+
+    def merge(self, part):
+        pass  # everyone writes to the same database
+
+
+class MemorySink(OutputSink):
+    """
+    Keeps images in memory instead of writing them anywhere, for Mesh2Img.render_arrays. Its path is only a name.
+    """
+
+    def __init__(self, path, target=None):
+        super(MemorySink, self).__init__(path, target)
+        self._images = {}
+
+    def _write_batch(self, batch):
+        for name, data, info in batch:
+            self._images[name] = data
+
+    def _read(self, name):
+        return self._images[name]
+
+    def _exists(self, name):
+        return name in self._images
+
+    def merge(self, part):
+        pass  # there's nothing on disk to merge
+
+
+SINK_TYPES = {
+    # sink kind -> (OutputSink class, file extensions that pick it without naming the kind)
+    'zip': (ZipSink, ('.zip',)),
+    'tar': (TarSink, ('.tar',)),
+    'sqlite': (SQLiteSink, ('.db', '.sqlite', '.sqlite3')),
+    'memory': (MemorySink, ()),
+}
+
+
+def parse_sink(spec):
+    """
+    :param spec: 'kind:/path/to/file' (where kind is a key of SINK_TYPES), just the path if its extension says what
+                 kind it is, or 'files' for plain image files
+    :return: a (kind, absolute path) tuple, or None for plain image files
+    """
+    if not spec or spec == 'files':
+        return None
+    kind, _, path = spec.partition(':')
+    if kind not in SINK_TYPES or not path:
+        kind, path = None, spec
+        for name, (cls, extensions) in SINK_TYPES.items():
+            if path.lower().endswith(extensions):
+                kind = name
+        if kind is None:
+            raise ValueError("%s is not an output sink. Use files, %s (like zip:/out/thumbs.zip)."
+                             % (spec, ', '.join(sorted(SINK_TYPES))))
+    return kind, os.path.abspath(path)
+
+
+def open_sink(spec, part=None):
+    """
+    Opens the sink (if it isn't already) so images can be written to its paths with write_output.
+
+    :param spec: a sink like JobTemplate.sink (see parse_sink)
+    :param part: a name for this process's part of a zip or tar sink (like 'worker3'). The images go in a file named
+                 like the sink with this added, to be merged into the sink later. None writes to the sink itself.
+    :return: the OutputSink, or None for plain image files
+    """
+    parsed = parse_sink(spec)
+    if parsed is None:
+        return None
+    kind, path = parsed
+    with _sinks_lock:
+        if path not in _sinks:
+            _sinks[path] = SINK_TYPES[kind][0](path, sink_part_path(path, part) if part else None)
+        return _sinks[path]
+
+
+def close_sink(spec):
+    """
+    Writes out and closes one sink, if it's open.
+
+    :param spec: a sink like JobTemplate.sink (see parse_sink)
+    """
+    parsed = parse_sink(spec)
+    with _sinks_lock:
+        sink = _sinks.pop(parsed[1], None) if parsed else None
+    if sink is not None:
+        sink.close()
+
+
+def sink_part_path(path, part):
+    """
+    :return: the path of a part of a zip or tar sink, like /out/thumbs.worker3.zip
+    """
+    root, ext = os.path.splitext(path)
+    return '%s.%s%s' % (root, part, ext)
+
+
+def close_sinks():
+    """
+    Writes out and closes every open sink.
+    """
+    with _sinks_lock:
+        while _sinks:
+            _sinks.popitem()[1].close()
+
+
+def flush_sinks():
+    """
+    Writes out every image waiting in an open sink.
+    """
+    with _sinks_lock:
+        for sink in _sinks.values():
+            sink.flush()
+
+
+_sinks = {}  # sink path -> open OutputSink
+_sinks_lock = threading.RLock()
+_memory_sinks = itertools.count()  # numbers the MemorySinks of Mesh2Img.render_arrays
+atexit.register(close_sinks)
+
+
+def split_sink_path(filepath):
+    """
+    :param filepath: an image path
+    :return: an (OutputSink, name inside it) tuple, or (None, filepath) if it isn't the path of an image in an open sink
+    """
+    with _sinks_lock:
+        for path, sink in _sinks.items():
+            if filepath.startswith(path + '/'):
+                return sink, filepath[len(path) + 1:]
+    return None, filepath
+
+
+def write_output(filepath, data, **info):
+    """
+    Writes an encoded image to its path, which can be in an open sink.
+
+    :param filepath: the image path
+    :param data: the image file as bytes
+    :param info: details for sinks that store them (see OutputSink.write)
+    """
+    sink, name = split_sink_path(filepath)
+    if sink is not None:
+        sink.write(name, data, **info)
+        return
+    ensure_parent_dir(filepath)
+    unshare_file(filepath)
+    with open(filepath, 'wb') as f:
+        f.write(data)
+
+
+def read_output(filepath):
+    """
+    :param filepath: an image path, which can be in an open sink
+    :return: the image file as bytes
+    """
+    sink, name = split_sink_path(filepath)
+    if sink is not None:
+        return sink.read(name)
+    with open(filepath, 'rb') as f:
+        return f.read()
+
+
+def output_exists(filepath):
+    """
+    :param filepath: an image path, which can be in an open sink
+    :return: True if the image exists
+    """
+    sink, name = split_sink_path(filepath)
+    if sink is not None:
+        return sink.exists(name)
+    return os.path.exists(filepath)
+
+
+@contextlib.contextmanager
+def output_file(filepath, **info):
+    """
+    Gives a path for Blender to save an image to. For an image in a sink, that's a scratch file which is added to the
+    sink afterwards. Otherwise it's the image path itself.
+
+    :param filepath: the image path
+    :param info: details for sinks that store them (see OutputSink.write)
+    """
+    sink, name = split_sink_path(filepath)
+    if sink is None:
+        yield filepath
+        return
+    local_path = scratch_path('sink_output' + os.path.splitext(name)[1], memory=True)
+    yield local_path
+    with open(local_path, 'rb') as f:
+        sink.write(name, f.read(), **info)
+    os.remove(local_path)
+
+
+def scratch_path(filename, memory=False):
+    """
+    :param filename: the name of the temporary file
+    :param memory: if True, the folder is on a RAM-backed file system (one of MEMORY_SCRATCH_ROOTS) if there is one.
+                   For files that are read right back after they're written, like the images Blender renders.
+    :return: a path for that file inside a folder that's deleted when this script exits
+    """
+    root = None
+    if memory:
+        root = next((d for d in MEMORY_SCRATCH_ROOTS if os.path.isdir(d) and os.access(d, os.W_OK)), None)
+    with _scratch_lock:
+        if root not in _scratch_dirs:
+            _scratch_dirs[root] = tempfile.mkdtemp(prefix='mesh2img_', dir=root)
+            atexit.register(shutil.rmtree, _scratch_dirs[root], True)
+    return os.path.join(_scratch_dirs[root], filename)
+
+
+MEMORY_SCRATCH_ROOTS = ('/dev/shm',)  # RAM-backed folders for scratch_path(memory=True), in order of preference
+_scratch_dirs = {}  # the folder scratch folders are made in (None for the system's temp folder) -> scratch folder
+_scratch_lock = threading.Lock()
+
+
+# mesh files inside these archives can be rendered without extracting them first (see split_archive_path)
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+MAX_OPEN_ARCHIVES = 16  # archives kept open at once for reading their members
+
+
+def is_archive(filepath):
+    """
+    :param filepath: a path
+    :return: True if it's a zip or tar file (going by its extension) that exists
+    """
+    return filepath.lower().endswith(ARCHIVE_EXTENSIONS) and os.path.isfile(filepath)
+
+
+def split_archive_path(filepath):
+    """
+    Mesh files inside archives are named by the path of the archive followed by the path inside it, like
+    `/uploads/parts.zip/brackets/left.stl`.
+
+    :param filepath: a path to a file, which can be inside an archive
+    :return: an (archive path, member name) tuple, or (filepath, None) if the file isn't inside an archive
+    """
+    for separator in re.finditer(r'[\\/]', filepath):
+        archive = filepath[:separator.start()]
+        if is_archive(archive):
+            return archive, filepath[separator.end():].replace('\\', '/')
+    return filepath, None
+
+
+def archive_output_path(filepath):
+    """
+    :param filepath: a path to a file, which can be inside an archive
+    :return: the path with the archive swapped for a folder named like it (`/uploads/parts.zip/left.stl` becomes
+             `/uploads/parts/left.stl`), so that images can be written next to where the mesh would be extracted
+    """
+    archive, member = split_archive_path(filepath)
+    if member is None:
+        return filepath
+    for ext in ARCHIVE_EXTENSIONS:
+        if archive.lower().endswith(ext):
+            archive = archive[:-len(ext)]
+            break
+    return os.path.join(archive, *member.split('/'))
+
+
+def _open_archive(archive):
+    """
+    :return: the open ZipFile or TarFile for the archive. The most recently used ones are kept open. Call this with
+             _archive_lock held.
+    """
+    handle = _open_archives.pop(archive, None)
+    if handle is None:
+        if archive.lower().endswith('.zip'):
+            handle = zipfile.ZipFile(archive)
+        else:
+            handle = tarfile.open(archive)
+        while len(_open_archives) >= MAX_OPEN_ARCHIVES:
+            _open_archives.popitem(last=False)[1].close()
+    _open_archives[archive] = handle  # now the most recently used
+    return handle
+
+
+_open_archives = collections.OrderedDict()
+_archive_lock = threading.RLock()  # TarFiles (and the cache) can only be used by one thread at a time
+
+
+def list_archive(archive):
+    """
+    :param archive: the path to a zip or tar file
+    :return: a list of (member name, size in bytes) of every file in it, in the order they're stored
+    """
+    with _archive_lock:
+        handle = _open_archive(archive)
+        if isinstance(handle, zipfile.ZipFile):
+            return [(info.filename, info.file_size) for info in handle.infolist() if not info.is_dir()]
+        return [(info.name, info.size) for info in handle.getmembers() if info.isfile()]
+
+
+def source_stat(filepath):
+    """
+    :param filepath: a path to a file, which can be inside an archive
+    :return: a (size in bytes, modification time) tuple
+    """
+    archive, member = split_archive_path(filepath)
+    if member is None:
+        stat = os.stat(filepath)
+        return stat.st_size, stat.st_mtime
+    with _archive_lock:
+        handle = _open_archive(archive)
+        try:
+            if isinstance(handle, zipfile.ZipFile):
+                info = handle.getinfo(member)
+                return info.file_size, time.mktime(info.date_time + (0, 0, -1))
+            info = handle.getmember(member)
+            return info.size, float(info.mtime)
+        except KeyError:
+            raise IOError("%s isn't in %s" % (member, archive))
+
+
+def open_source(filepath):
+    """
+    Opens a file for reading, even if it's inside an archive.
+
+    :param filepath: a path to a file, which can be inside an archive
+    :return: a binary file object
+    """
+    archive, member = split_archive_path(filepath)
+    if member is None:
+        return open(filepath, 'rb')
+    with _archive_lock:
+        handle = _open_archive(archive)
+        try:
+            if isinstance(handle, zipfile.ZipFile):
+                return handle.open(member)  # zip members can be read by several threads at once
+            # but tar members can't, so read this one while no one else is
+            return io.BytesIO(handle.extractfile(member).read())
+        except KeyError:
+            raise IOError("%s isn't in %s" % (member, archive))
+
+
+@contextlib.contextmanager
+def local_copy(filepath):
+    """
+    Gives a path to the file on disk for things (like Blender's importers) that can't read from an archive. Files
+    inside an archive are copied into a scratch folder of their own that's deleted again afterwards, so only one copy
+    per caller is on disk at any time.
+
+    :param filepath: a path to a file, which can be inside an archive
+    """
+    archive, member = split_archive_path(filepath)
+    if member is None:
+        yield filepath
+        return
+    folder = tempfile.mkdtemp(dir=os.path.dirname(scratch_path('member')))
+    try:
+        local_path = os.path.join(folder, member.rsplit('/', 1)[-1])  # keep the name for the imported object
+        with open_source(filepath) as source, open(local_path, 'wb') as f:
+            shutil.copyfileobj(source, f, 1024 * 1024)
+        yield local_path
+    finally:
+        shutil.rmtree(folder, True)
+
+
+def _file_size(filepath):
+    """
+    :return: the size of the file (which can be inside an archive) in bytes, or 0 if it can't be read (whoever opens it
+             will find out what's wrong)
+    """
+    try:
+        return source_stat(filepath)[0]
+    except Exception:
+        return 0
+
+
+def parse_size(text):
+    """
+    :param text: a number of bytes, optionally followed by K, M or G (like '500K' or '2.5G')
+    :return: the number of bytes as an int
+    """
+    text = str(text).strip().upper().rstrip('B')
+    multiplier = 1
+    if text and text[-1] in 'KMG':
+        multiplier = 1024 ** ('KMG'.index(text[-1]) + 1)
+        text = text[:-1]
+    return int(float(text) * multiplier)
+
+
+def parse_triangle_budget(text):
+    """
+    :param text: 'auto' or a positive number of triangles
+    :return: 'auto' or the number of triangles as an int
+    """
+    if text.strip().lower() == 'auto':
+        return 'auto'
+    try:
+        budget = int(text)
+    except ValueError:
+        budget = 0
+    if budget < 1:
+        raise argparse.ArgumentTypeError("%r is not a triangle budget. Use `auto` or a positive whole number." % text)
+    return budget
+
+
+def file_digest(filepath, chunk_size=1024 * 1024):
+    """
+    :param filepath: the path to a file (which can be inside an archive)
+    :param chunk_size: how many bytes to read at a time
+    :return: the SHA-1 hex digest of the file's contents
+    """
+    digest = hashlib.sha1()
+    with open_source(filepath) as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def link_or_copy(original, destination, **info):
+    """
+    Makes destination a hardlink to original, or a copy of it where hardlinks can't be made (like across drives or in
+    an output sink). Anything already at destination is replaced.
+
+    :param original: the path to an existing image (which can be in an open sink)
+    :param destination: the path to make (which can be in an open sink)
+    :param info: details to store with the copy if it goes in a sink (see OutputSink.write)
+    """
+    if os.path.abspath(original) == os.path.abspath(destination):
+        return
+    source_sink, source_name = split_sink_path(original)
+    sink, name = split_sink_path(destination)
+    if sink is not None and sink is source_sink:
+        sink.copy(source_name, name, **info)
+        return
+    if sink is not None or source_sink is not None:
+        write_output(destination, read_output(original), **info)
+        return
+    ensure_parent_dir(destination)
+    if os.path.lexists(destination):
+        os.remove(destination)
+    try:
+        os.link(original, destination)
+    except OSError:
+        shutil.copyfile(original, destination)
+
+
+def ensure_parent_dir(filepath):
+    """
+    Creates the folder a file is about to be written to, if it doesn't exist yet.
+
+    :param filepath: the path of the file
+    """
+    folder = os.path.dirname(filepath)
+    if folder and not os.path.isdir(folder):
+        os.makedirs(folder, exist_ok=True)
+
+
+def unshare_file(filepath):
+    """
+    Removes the file if it's hardlinked to other files (see link_or_copy), so that writing a new image to this path
+    doesn't change the images it was linked to as well.
+
+    :param filepath: the path that's about to be written
+    """
+    try:
+        if os.stat(filepath).st_nlink > 1:
+            os.remove(filepath)
+    except OSError:
+        pass
+
+
+def append_json_line(filepath, record):
+    """
+    Appends one JSON object as a line to the given file. The line is written with a single call so that several
+    processes can safely append to the same file.
+
+    :param filepath: the path to the JSON-lines file
+    :param record: a JSON-serializable dictionary
+    """
+    line = (json.dumps(record, sort_keys=True) + '\n').encode('utf-8')
+    fd = os.open(filepath, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line)
+    finally:
+        os.close(fd)
+
+
+def read_json_lines(filepath):
+    """
+    Yields each JSON object from a JSON-lines file. A missing file yields nothing and a truncated last line (from a
+    process that died mid-write) is skipped.
+
+    :param filepath: the path to the JSON-lines file
+    """
+    if not os.path.exists(filepath):
+        return
+    with open(filepath, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                logging.warning("Skipping unreadable line in %s: %r", filepath, line)
+
+
+# these NumPy structured types match a triangle record of a binary STL and the PLY property types
+STL_TRIANGLE = np.dtype([('normal', '<f4', (3,)), ('vertices', '<f4', (3, 3)), ('attributes', '<u2')])
+PLY_TYPES = {
+    'char': 'i1', 'int8': 'i1', 'uchar': 'u1', 'uint8': 'u1', 'short': 'i2', 'int16': 'i2', 'ushort': 'u2',
+    'uint16': 'u2', 'int': 'i4', 'int32': 'i4', 'uint': 'u4', 'uint32': 'u4', 'float': 'f4', 'float32': 'f4',
+    'double': 'f8', 'float64': 'f8',
+}
+
+
+def read_stl(filepath):
+    """
+    Reads a binary or ASCII STL file into vertex and face arrays. Binary files are memory-mapped rather than read into
+    memory, and the three corners of each triangle are welded into shared vertices.
+
+    :param filepath: the path to the STL file
+    :return: a (vertices, faces) tuple. vertices is a float32 array of shape (N, 3) and faces an int32 array of vertex
+             indexes of shape (M, 3)
+    """
+    size = os.path.getsize(filepath)
+    count = 0
+    if size >= 84:
+        with open(filepath, 'rb') as f:
+            f.seek(80)
+            count = int(np.frombuffer(f.read(4), dtype='<u4')[0])
+    if size >= 84 and size == 84 + count * STL_TRIANGLE.itemsize:  # an ASCII file won't add up like this
+        triangles = np.memmap(filepath, dtype=STL_TRIANGLE, mode='r', offset=84, shape=(count,))
+        corners = np.array(triangles['vertices'], dtype=np.float32).reshape(-1, 3)
+        del triangles  # closes the memory map
+    else:
+        with open(filepath, 'rb') as f:
+            corners = _read_stl_ascii(f.read())
+    return weld_vertices(corners)
+
+
+def read_stl_bytes(data):
+    """
+    Reads a binary or ASCII STL file that's already in memory. See read_stl.
+
+    :param data: the contents of the STL file as bytes (or anything else with the buffer protocol)
+    :return: a (vertices, faces) tuple like read_stl
+    """
+    data = memoryview(data).cast('B')
+    size = len(data)
+    count = int(np.frombuffer(data[80:84], dtype='<u4')[0]) if size >= 84 else 0
+    if size >= 84 and size == 84 + count * STL_TRIANGLE.itemsize:
+        triangles = np.frombuffer(data, dtype=STL_TRIANGLE, count=count, offset=84)
+        corners = np.array(triangles['vertices'], dtype=np.float32).reshape(-1, 3)
+    else:
+        corners = _read_stl_ascii(data.tobytes())
+    return weld_vertices(corners)
+
+
+def _read_stl_ascii(text):
+    """
+    :param text: the contents of an ASCII STL file as bytes
+    :return: a float32 array of shape (3 * M, 3) with the three corners of every triangle in order
+    """
+    numbers = re.findall(br'vertex\s+(\S+)\s+(\S+)\s+(\S+)', text)
+    return np.array(numbers, dtype=np.float32).reshape(-1, 3)
+
+
+def read_ply(filepath):
+    """
+    Reads an ASCII or binary (either byte order) PLY file into vertex and face arrays. Faces with more than 3 corners
+    are split into triangles.
+
+    :param filepath: the path to the PLY file
+    :return: a (vertices, faces) tuple like read_stl
+    """
+    with open(filepath, 'rb') as f:
+        if f.readline().strip() != b'ply':
+            raise ValueError("%s is not a PLY file" % filepath)
+        file_format = None
+        elements = []  # [name, count, [(property name, type, list count type or None)]]
+        for line in iter(f.readline, b''):
+            words = line.decode('ascii', 'replace').split()
+            if not words or words[0] in ('comment', 'obj_info'):
+                continue
+            if words[0] == 'format':
+                file_format = words[1]
+            elif words[0] == 'element':
+                elements.append([words[1], int(words[2]), []])
+            elif words[0] == 'property' and words[1] == 'list':
+                elements[-1][2].append((words[4], PLY_TYPES[words[3]], PLY_TYPES[words[2]]))
+            elif words[0] == 'property':
+                elements[-1][2].append((words[2], PLY_TYPES[words[1]], None))
+            elif words[0] == 'end_header':
+                break
+        body = f.read()
+
+    if file_format == 'ascii':
+        return _read_ply_ascii(body, elements)
+    if file_format not in ('binary_little_endian', 'binary_big_endian'):
+        raise ValueError("%s has an unknown PLY format %r" % (filepath, file_format))
+    return _read_ply_binary(body, elements, '<' if file_format == 'binary_little_endian' else '>')
+
+
+def _read_ply_binary(body, elements, byte_order):
+    vertices = faces = None
+    offset = 0
+    for name, count, properties in elements:
+        if vertices is not None and faces is not None:
+            break  # that's everything we need
+        if all(list_type is None for _, _, list_type in properties):  # fixed size rows, read them all at once
+            dtype = np.dtype([(prop, byte_order + kind) for prop, kind, _ in properties])
+            rows = np.frombuffer(body, dtype=dtype, count=count, offset=offset)
+            offset += dtype.itemsize * count
+            if name == 'vertex':
+                vertices = np.column_stack([rows['x'], rows['y'], rows['z']]).astype(np.float32)
+            continue
+        if name == 'face' and len(properties) == 1:
+            # try reading it as all triangles first (by far the most common) and check that it really is
+            _, index_type, count_type = properties[0]
+            dtype = np.dtype([('n', byte_order + count_type), ('i', byte_order + index_type, (3,))])
+            if offset + dtype.itemsize * count <= len(body):
+                rows = np.frombuffer(body, dtype=dtype, count=count, offset=offset)
+                if np.all(rows['n'] == 3):
+                    faces = rows['i'].astype(np.int32)
+                    offset += dtype.itemsize * count
+                    continue
+        polygons, offset = _read_ply_binary_rows(body, offset, count, properties, byte_order)
+        if name == 'face':
+            faces = _triangulate(polygons)
+    if vertices is None or faces is None:
+        raise ValueError("PLY file has no vertex or face elements")
+    return vertices, faces
+
+
+def _read_ply_binary_rows(body, offset, count, properties, byte_order):
+    """
+    Reads `count` rows that have list properties one at a time. Returns the first list of each row and the offset after
+    the last row.
+    """
+    polygons = []
+    for _ in range(count):
+        polygon = None
+        for _, kind, list_type in properties:
+            if list_type is None:
+                offset += np.dtype(kind).itemsize
+                continue
+            length = int(np.frombuffer(body, dtype=byte_order + list_type, count=1, offset=offset)[0])
+            offset += np.dtype(list_type).itemsize
+            values = np.frombuffer(body, dtype=byte_order + kind, count=length, offset=offset)
+            offset += np.dtype(kind).itemsize * length
+            if polygon is None:
+                polygon = values
+        polygons.append(polygon)
+    return polygons, offset
+
+
+def _read_ply_ascii(body, elements):
+    lines = body.splitlines()
+    vertices = faces = None
+    start = 0
+    for name, count, properties in elements:
+        rows = lines[start:start + count]
+        start += count
+        if name == 'vertex':
+            columns = [prop for prop, _, _ in properties]
+            values = np.array(b' '.join(rows).split(), dtype=np.float64).reshape(count, len(columns))
+            vertices = values[:, [columns.index('x'), columns.index('y'), columns.index('z')]].astype(np.float32)
+        elif name == 'face':
+            polygons = [np.array(row.split()[1:1 + int(row.split()[0])], dtype=np.int64) for row in rows]
+            faces = _triangulate(polygons)
+    if vertices is None or faces is None:
+        raise ValueError("PLY file has no vertex or face elements")
+    return vertices, faces
+
+
+def _triangulate(polygons):
+    """
+    Splits polygons (lists of vertex indexes) into a fan of triangles.
+
+    :return: an int32 array of shape (M, 3)
+    """
+    triangles = []
+    for polygon in polygons:
+        for i in range(1, len(polygon) - 1):
+            triangles.append((polygon[0], polygon[i], polygon[i + 1]))
+    return np.array(triangles, dtype=np.int32).reshape(-1, 3)
+
+
+def weld_vertices(corners):
+    """
+    Merges corners that are at exactly the same position into one vertex.
+
+    :param corners: a float32 array of shape (3 * M, 3) with the three corners of every triangle in order
+    :return: a (vertices, faces) tuple like read_stl
+    """
+    corners = np.ascontiguousarray(corners, dtype=np.float32)
+    corners[corners == 0] = 0  # -0.0 and 0.0 are the same position but not the same bytes
+    keys = corners.view(np.dtype((np.void, corners.dtype.itemsize * 3))).ravel()
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    return corners[first], inverse.astype(np.int32).reshape(-1, 3)
+
+
+def mesh_from_arrays(name, vertices, faces):
+    """
+    Builds a new mesh object out of vertex and face arrays with Blender's bulk foreach_set calls and adds it to the
+    scene. It's left as the only selected object, just like after one of Blender's import operators.
+
+    :param name: the name for the new object and its mesh
+    :param vertices: an array of shape (N, 3) with the vertex positions
+    :param faces: an array of shape (M, 3) with the vertex indexes of each triangle
+    :return: the new object
+    """
+    count = len(faces)
+    mesh = data.meshes.new(name)
+    mesh.vertices.add(len(vertices))
+    mesh.vertices.foreach_set('co', np.ascontiguousarray(vertices, dtype=np.float32).ravel())
+    mesh.loops.add(count * 3)
+    mesh.loops.foreach_set('vertex_index', np.ascontiguousarray(faces, dtype=np.int32).ravel())
+    mesh.polygons.add(count)
+    mesh.polygons.foreach_set('loop_start', np.arange(0, count * 3, 3, dtype=np.int32))
+    if bpy.app.version < (4, 0, 0):  # newer versions work the polygon sizes out from loop_start
+        mesh.polygons.foreach_set('loop_total', np.full(count, 3, dtype=np.int32))
+    mesh.update(calc_edges=True)
+    mesh.validate()  # removes the triangles that welding collapsed into lines or points
+
+    obj = data.objects.new(name, mesh)
+    context.scene.collection.objects.link(obj)
+    for selected in context.selected_objects:
+        selected.select_set(False)
+    obj.select_set(state=True)
+    context.view_layer.objects.active = obj
+    return obj
+
+
+def import_stl_fast(filepath):
+    """
+    Imports an STL file with read_stl. A faster stand-in for bpy.ops.import_mesh.stl.
+
+    :param filepath: the path to the STL file
+    :return: the new object
+    """
+    name = os.path.splitext(os.path.basename(filepath))[0]
+    return mesh_from_arrays(name, *read_stl(filepath))
+
+
+def import_ply_fast(filepath):
+    """
+    Imports a PLY file with read_ply. A faster stand-in for bpy.ops.import_mesh.ply.
+
+    :param filepath: the path to the PLY file
+    :return: the new object
+    """
+    name = os.path.splitext(os.path.basename(filepath))[0]
+    return mesh_from_arrays(name, *read_ply(filepath))
+
+
+# the NumPy readers for each file extension, used by DuplicateFinder
+MESH_READERS = {
+    '.stl': read_stl,
+    '.ply': read_ply,
+}
+Mesh2Img.FAST_MESH_TYPES.update({
+    '.stl': import_stl_fast,
+    '.ply': import_ply_fast,
+})
+
+
 if __name__ == "__main__":  # start execution here
     old_level = logging.getLogger().level
     cliargs = Mesh2Img.command_line()
-    Mesh2Img(**cliargs).start()  # pass in all the paths given on the command line
+    serve = cliargs.pop('serve', None)
+    if 'job_file' in cliargs:  # we're a worker started by a RenderFarm
+        Mesh2Img.load_job(cliargs['job_file']).start()
+    elif serve:
+        Mesh2Img(**cliargs).serve(serve)  # render whatever gets sent our way
+    else:
+        Mesh2Img(**cliargs).start()  # pass in all the paths given on the command line
     logging.getLogger().setLevel(old_level)
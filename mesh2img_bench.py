@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""
+A benchmark for mesh2img.py using generated meshes.
+
+It makes a corpus of synthetic STL and PLY files (binary and ASCII, from a thousand to ten million triangles), renders
+each part of it with Mesh2Img.start(), and reports the throughput, time per million triangles, and memory use. Results
+are saved as JSON so a later run (a new Blender version, different settings, ...) can be compared against them.
+
+Like mesh2img.py, the benchmark runs inside Blender:
+
+`$ blender -b -P mesh2img_bench.py -- --corpus /tmp/bench --dimensions 200 800 --output results.json`
+
+`$ blender -b -P mesh2img_bench.py -- --corpus /tmp/bench --dimensions 200 800 --baseline results.json`
+
+The corpus alone can be made with plain Python (`python mesh2img_bench.py --corpus /tmp/bench --generate-only`). The
+meshes are the same every time for the same arguments, and files that already exist are reused.
+
+:copyright: 2016 by Phillip Stromberg
+:license:   MIT
+
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+
+# name -> (number of meshes, fewest triangles, most triangles). Triangle counts are spread evenly on a log scale.
+DISTRIBUTIONS = {
+    'many-small': (200, 1000, 20000),
+    'mixed': (40, 1000, 1000000),
+    'few-huge': (3, 1000000, 10000000),
+}
+FORMATS = ('stl-binary', 'stl-ascii', 'ply-binary', 'ply-ascii')
+STL_TRIANGLE = np.dtype([('normal', '<f4', (3,)), ('vertices', '<f4', (3, 3)), ('attributes', '<u2')])
+
+
+def make_mesh(triangles, seed=0):
+    """
+    Makes a bumpy torus with about the given number of triangles. The same arguments always give the same mesh.
+
+    :param triangles: roughly how many triangles the mesh should have
+    :param seed: picks the shape of the bumps
+    :return: a (vertices, faces) tuple of a float32 array of shape (N, 3) and an int32 array of shape (M, 3)
+    """
+    rings = max(3, int(math.sqrt(triangles / 4.0)))
+    segments = max(3, int(round(triangles / (2.0 * rings))))
+    rng = np.random.RandomState(seed)
+    u = np.linspace(0, 2 * np.pi, rings, endpoint=False)[:, None]
+    v = np.linspace(0, 2 * np.pi, segments, endpoint=False)[None, :]
+    bumps = sum(rng.uniform(0.02, 0.08) * np.sin(rng.randint(1, 12) * u + rng.randint(1, 12) * v + rng.uniform(0, 6))
+                for _ in range(4))
+    radius = 0.4 + bumps
+    x = (1 + radius * np.cos(v)) * np.cos(u)
+    y = (1 + radius * np.cos(v)) * np.sin(u)
+    z = radius * np.sin(v) * rng.uniform(0.5, 1.5)
+    vertices = np.stack([x, y, z], axis=-1).reshape(-1, 3).astype(np.float32)
+
+    i = np.arange(rings)[:, None]
+    j = np.arange(segments)[None, :]
+    a = i * segments + j
+    b = ((i + 1) % rings) * segments + j
+    c = ((i + 1) % rings) * segments + (j + 1) % segments
+    d = i * segments + (j + 1) % segments
+    faces = np.concatenate([np.stack([a, b, c], -1).reshape(-1, 3), np.stack([a, c, d], -1).reshape(-1, 3)])
+    return vertices, faces.astype(np.int32)
+
+
+def write_mesh(filepath, vertices, faces, file_format):
+    """
+    Writes a mesh in one of FORMATS.
+
+    :param filepath: where to write it
+    :param vertices: a float array of shape (N, 3)
+    :param faces: an int array of shape (M, 3)
+    :param file_format: one of FORMATS, like 'stl-binary'
+    """
+    corners = vertices[faces]  # (M, 3, 3)
+    if file_format == 'stl-binary':
+        records = np.zeros(len(faces), dtype=STL_TRIANGLE)
+        records['vertices'] = corners
+        with open(filepath, 'wb') as f:
+            f.write(b'mesh2img benchmark'.ljust(80, b' '))
+            f.write(np.array([len(faces)], dtype='<u4').tobytes())
+            f.write(records.tobytes())
+    elif file_format == 'stl-ascii':
+        with open(filepath, 'w') as f:
+            f.write('solid bench\n')
+            for chunk in np.array_split(corners, max(1, len(corners) // 100000)):
+                f.write(''.join('facet normal 0 0 0\n outer loop\n  vertex %.6g %.6g %.6g\n  vertex %.6g %.6g %.6g\n'
+                                '  vertex %.6g %.6g %.6g\n endloop\nendfacet\n' % tuple(t) for t in
+                                chunk.reshape(-1, 9)))
+            f.write('endsolid bench\n')
+    elif file_format in ('ply-binary', 'ply-ascii'):
+        binary = file_format == 'ply-binary'
+        header = ('ply\nformat %s 1.0\nelement vertex %d\nproperty float x\nproperty float y\nproperty float z\n'
+                  'element face %d\nproperty list uchar int vertex_indices\nend_header\n'
+                  % ('binary_little_endian' if binary else 'ascii', len(vertices), len(faces)))
+        with open(filepath, 'wb') as f:
+            f.write(header.encode('ascii'))
+            if binary:
+                f.write(vertices.astype('<f4').tobytes())
+                rows = np.zeros(len(faces), dtype=[('n', 'u1'), ('i', '<i4', (3,))])
+                rows['n'] = 3
+                rows['i'] = faces
+                f.write(rows.tobytes())
+            else:
+                np.savetxt(f, vertices, fmt='%.6g')
+                np.savetxt(f, np.column_stack([np.full(len(faces), 3), faces]), fmt='%d')
+    else:
+        raise ValueError("Unknown mesh format %s" % file_format)
+
+
+def generate_corpus(corpus_dir, distribution, file_format, count=None, seed=0):
+    """
+    Writes one part of the corpus (unless it's already there).
+
+    :param corpus_dir: the folder the whole corpus goes in
+    :param distribution: one of the DISTRIBUTIONS
+    :param file_format: one of FORMATS
+    :param count: how many meshes to make instead of the number the distribution calls for
+    :param seed: change this to get a different (but still repeatable) corpus
+    :return: the folder this part of the corpus is in
+    """
+    default_count, fewest, most = DISTRIBUTIONS[distribution]
+    count = count or default_count
+    folder = os.path.join(corpus_dir, distribution, file_format)
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+    extension = file_format.split('-')[0]
+    sizes = np.logspace(math.log10(fewest), math.log10(most), count) if count > 1 else [most]
+    for i, triangles in enumerate(sizes):
+        triangles = int(triangles)
+        filepath = os.path.join(folder, 'mesh_%04d_%d_%d.%s' % (i, triangles, seed, extension))
+        if os.path.exists(filepath):
+            continue
+        vertices, faces = make_mesh(triangles, seed=seed * 100003 + i)
+        write_mesh(filepath + '.part', vertices, faces, file_format)
+        os.replace(filepath + '.part', filepath)  # a half-written file is never mistaken for a finished one
+    return folder
+
+
+def run_benchmark(folder, dimensions, output_dir, **options):
+    """
+    Renders every mesh in the folder with Mesh2Img.start() and measures it.
+
+    :param folder: a folder of meshes made by generate_corpus
+    :param dimensions: the image sizes to render (see Mesh2Img.__init__)
+    :param output_dir: where the images go
+    :param options: more arguments for Mesh2Img (like fast_import=True)
+    :return: the metrics summary of the run plus the time per million triangles. Its peak_rss is the most memory the
+             process has used so far, so it includes the runs before this one.
+    """
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from mesh2img import Mesh2Img  # only works inside Blender
+
+    metrics_path = os.path.join(output_dir, 'metrics.jsonl')
+    if os.path.exists(metrics_path):
+        os.remove(metrics_path)
+    batch = Mesh2Img(paths=[folder], dimensions=dimensions, metrics=metrics_path,
+                     output_template=os.path.join(output_dir, '{basename}_{width}x{height}.{ext}'), **options)
+    started = time.time()
+    batch.start()
+    if batch.workers > 1:  # the workers' meshes are only in the file
+        summary = [line['summary'] for line in map(json.loads, open(metrics_path)) if 'summary' in line][-1]
+    else:
+        summary = batch.metrics.summary()
+    summary['seconds'] = time.time() - started
+    summary['meshes_per_second'] = summary['meshes'] / summary['seconds']
+    millions = summary['triangles'] / 1e6
+    summary['seconds_per_million_triangles'] = summary['seconds'] / millions if millions else None
+    return summary
+
+
+def compare(results, baseline):
+    """
+    Prints how each run did compared to the same run in the baseline results.
+    """
+    before = dict((run['name'], run) for run in baseline['runs'])
+    print("%-28s %14s %14s %8s" % ('run', 'meshes/sec', 'baseline', 'change'))
+    for run in results['runs']:
+        old = before.get(run['name'])
+        if old is None:
+            print("%-28s %14.2f %14s %8s" % (run['name'], run['meshes_per_second'], '-', '-'))
+            continue
+        change = (run['meshes_per_second'] / old['meshes_per_second'] - 1) * 100
+        print("%-28s %14.2f %14.2f %+7.1f%%" % (run['name'], run['meshes_per_second'], old['meshes_per_second'],
+                                                change))
+
+
+def command_line():
+    try:
+        index = sys.argv.index("--") + 1  # ignore anything before the '--' in the blender.exe invocation
+    except ValueError:
+        index = 1
+    parser = argparse.ArgumentParser('mesh2img_bench', description="Benchmarks mesh2img.py on generated meshes.")
+    parser.add_argument('--corpus', required=True, type=str,
+                        help="The folder to generate the meshes in (or reuse them from).")
+    parser.add_argument('--distributions', nargs='+', default=['many-small', 'few-huge'],
+                        choices=sorted(DISTRIBUTIONS.keys()), help="Which sets of mesh sizes to run.")
+    parser.add_argument('--formats', nargs='+', default=['stl-binary', 'ply-binary'], choices=FORMATS,
+                        help="Which file formats to run.")
+    parser.add_argument('--count', type=int,
+                        help="Generate this many meshes per distribution instead of the default.")
+    parser.add_argument('--seed', type=int, default=0, help="Change this for a different (but repeatable) corpus.")
+    parser.add_argument('-d', '--dimensions', type=str, nargs='+', default=['200'],
+                        help="The image sizes to render, like mesh2img.py --dimensions.")
+    parser.add_argument('--fast-import', action='store_true', help="Pass --fast-import to Mesh2Img.")
+    parser.add_argument('--render-once', action='store_true', help="Pass --render-once to Mesh2Img.")
+    parser.add_argument('-w', '--workers', type=int, default=1, help="Pass --workers to Mesh2Img.")
+    parser.add_argument('--output', type=str, help="Save the results to this JSON file.")
+    parser.add_argument('--baseline', type=str, help="Compare the results to this earlier results file.")
+    parser.add_argument('--generate-only', action='store_true', help="Just make the corpus, don't render it.")
+    return parser.parse_args(sys.argv[index:])
+
+
+if __name__ == "__main__":
+    args = command_line()
+    dimensions = [d.split(',') if ',' in d else d for d in args.dimensions]
+    results = {'started': time.strftime('%Y-%m-%d %H:%M:%S'), 'arguments': vars(args), 'runs': []}
+    for distribution in args.distributions:
+        for file_format in args.formats:
+            folder = generate_corpus(args.corpus, distribution, file_format, count=args.count, seed=args.seed)
+            if args.generate_only:
+                continue
+            import bpy
+            results['blender'] = bpy.app.version_string
+            name = '%s/%s' % (distribution, file_format)
+            output_dir = os.path.join(args.corpus, 'output', distribution, file_format)
+            if not os.path.isdir(output_dir):
+                os.makedirs(output_dir)
+            summary = run_benchmark(folder, dimensions, output_dir, fast_import=args.fast_import,
+                                    render_once=args.render_once, workers=args.workers)
+            summary['name'] = name
+            results['runs'].append(summary)
+            print("%s: %d meshes, %d triangles, %.2f meshes/sec, %s s per million triangles, peak memory %s MB" % (
+                name, summary['meshes'], summary['triangles'], summary['meshes_per_second'],
+                '%.2f' % summary['seconds_per_million_triangles'] if summary['seconds_per_million_triangles'] else '-',
+                '%.0f' % (summary['peak_rss'] / 1e6) if summary['peak_rss'] else '-'))
+    if args.output and results['runs']:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.baseline and results['runs']:
+        with open(args.baseline) as f:
+            compare(results, json.load(f))
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+A small client for sending meshes to a running mesh2img.py render server.
+
+Unlike mesh2img.py, this is a plain Python 3 script. Start the server once with Blender:
+
+`$ blender -b -P mesh2img.py -- --serve localhost:8765 --dimensions 200`
+
+and then send it meshes to render as they come in:
+
+`$ python mesh2img_client.py --server localhost:8765 --paths /some/upload/part.stl`
+
+:copyright: 2016 by Phillip Stromberg
+:license:   MIT
+
+"""
+
+import argparse
+import json
+import os
+import sys
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+
+DEFAULT_SERVER_ADDRESS = 'localhost:8765'
+
+
+def render(filepath, job_templates=None, server=DEFAULT_SERVER_ADDRESS, timeout=None):
+    """
+    Asks the render server to render one mesh.
+
+    :param filepath: the path to the mesh file (it must be readable by the server)
+    :param job_templates: an optional list of dictionaries like
+                          `{'dimensions': [800, 600], 'output_template': '{filepath}_{width}.{ext}',
+                          'image_format': 'png', 'jpeg_quality': 80, 'profile': 'auto', 'sink': 'files'}` to use
+                          instead of the server's defaults
+    :param server: 'host:port' of the render server
+    :param timeout: how many seconds to wait for the render before giving up
+    :return: the server's reply as a dictionary. 'status' is either 'ok' (with the image paths in 'outputs') or
+             'failed' (with the reason in 'error').
+    """
+    body = {'path': os.path.abspath(filepath)}
+    if job_templates:
+        body['job_templates'] = job_templates
+    request = Request('http://%s/render' % server, data=json.dumps(body).encode('utf-8'),
+                      headers={'Content-Type': 'application/json'})
+    try:
+        with urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read().decode('utf-8'))
+    except HTTPError as ex:  # the server still replies with JSON explaining what went wrong
+        return json.loads(ex.read().decode('utf-8'))
+
+
+def command_line():
+    """
+    :return: the parsed command line arguments
+    """
+    parser = argparse.ArgumentParser('mesh2img_client',
+                                     description="Sends mesh files to a running mesh2img.py render server.")
+    parser.add_argument('-p', '--paths', type=str, nargs='+', required=True,
+                        help="The path(s) to the mesh file(s) to render.")
+    parser.add_argument('-s', '--server', default=DEFAULT_SERVER_ADDRESS, type=str,
+                        help="The host:port the server is listening on.")
+    parser.add_argument('-d', '--dimensions', type=str, nargs='+',
+                        help="Image sizes to render instead of the server's defaults (like `200 800,600`).")
+    parser.add_argument('-i', '--image-format', default='png', type=str,
+                        help="The image format to use with --dimensions.")
+    parser.add_argument('--jpeg-quality', default=80, type=int,
+                        help="The JPEG quality to use with --dimensions if `jpg` was chosen as the image-format.")
+    parser.add_argument('-o', '--output-template', default="{filepath}_{width}.{ext}", type=str,
+                        help="The output template to use with --dimensions. See mesh2img.py --help.")
+    parser.add_argument('--profile', type=str,
+                        help="The render profile to use with --dimensions (draft, thumbnail, catalog or auto).")
+    parser.add_argument('--sink', type=str,
+                        help="Where the server should put the images with --dimensions (files, zip:/path, tar:/path "
+                             "or sqlite:/path). See mesh2img.py --help.")
+    parser.add_argument('-t', '--timeout', type=float,
+                        help="How many seconds to wait for each mesh.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = command_line()
+    job_templates = None
+    if args.dimensions:
+        job_templates = [{'dimensions': d.split(',') if ',' in d else [d, d], 'output_template': args.output_template,
+                          'image_format': args.image_format, 'jpeg_quality': args.jpeg_quality,
+                          'profile': args.profile, 'sink': args.sink}
+                         for d in args.dimensions]
+    failed = 0
+    for path in args.paths:
+        reply = render(path, job_templates, server=args.server, timeout=args.timeout)
+        if reply['status'] == 'ok':
+            print("%s -> %s (%.2fs)" % (path, ', '.join(reply['outputs']), reply['seconds']))
+        else:
+            failed += 1
+            print("%s failed: %s" % (path, reply['error']), file=sys.stderr)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""
+Makes mesh2img.py importable outside of Blender. The stub bpy module is only used when the real one isn't there
+(like when the tests run with Blender's own Python).
+"""
+
+import os
+import sys
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+try:
+    import bpy  # noqa: F401
+except ImportError:
+    sys.path.insert(0, os.path.join(HERE, 'stubs'))
+
+
+@pytest.fixture
+def write():
+    """
+    :return: a function that writes data to a file (making its folder if needed) and returns the file's path
+    """
+    def write_file(filepath, data=b'solid x\n'):
+        filepath = str(filepath)
+        if not os.path.isdir(os.path.dirname(filepath)):
+            os.makedirs(os.path.dirname(filepath))
+        with open(filepath, 'wb') as f:
+            f.write(data)
+        return filepath
+    return write_file
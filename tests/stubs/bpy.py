@@ -0,0 +1,13 @@
+"""
+A stand-in for Blender's bpy module, so the parts of mesh2img.py that don't need Blender can be tested with plain
+Python. Anything that touches the scene just gets a MagicMock.
+"""
+
+import types as _types
+from unittest import mock
+
+context = mock.MagicMock()
+data = mock.MagicMock()
+ops = mock.MagicMock()
+types = _types.SimpleNamespace(Mesh=type('Mesh', (), {}), Image=type('Image', (), {}))  # for isinstance checks
+app = mock.MagicMock(version=(4, 0, 0), binary_path='blender')
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+
+import numpy as np
+import pytest
+
+import mesh2img
+from mesh2img_bench import make_mesh, write_mesh
+
+
+@pytest.mark.parametrize('file_format', ['stl-binary', 'stl-ascii'])
+def test_read_stl_bytes(tmp_path, file_format):
+    vertices, faces = make_mesh(300, seed=5)
+    filepath = str(tmp_path / 'mesh.stl')
+    write_mesh(filepath, vertices, faces, file_format)
+    with open(filepath, 'rb') as f:
+        stl_data = f.read()
+    read_vertices, read_faces = mesh2img.read_stl_bytes(stl_data)
+    assert np.allclose(read_vertices[read_faces], vertices[faces], atol=1e-5)
+
+
+@pytest.fixture
+def batch(monkeypatch):
+    """
+    :return: a Mesh2Img whose renders write each image's size into it instead of rendering anything
+    """
+    batch = mesh2img.Mesh2Img(dimensions=[(20, 20), (40, 30)])
+
+    def render_mesh(mesh, filepath):
+        outputs = batch.get_output_paths(filepath)
+        for jt, output in zip(batch._job_templates, outputs):
+            mesh2img.write_output(output, b'%dx%d' % (jt.width, jt.height))
+        return outputs
+
+    monkeypatch.setattr(batch, '_render_mesh', render_mesh)
+    return batch
+
+
+def memory_sinks():
+    return [path for path in mesh2img._sinks if path.startswith(os.path.abspath('/mesh2img_memory'))]
+
+
+def test_render_arrays_returns_one_image_per_template(batch):
+    vertices, faces = make_mesh(100)
+    assert batch.render_arrays(vertices, faces) == [b'20x20', b'40x30']
+    templates = [{'dimensions': [64, 48]}, {'dimensions': [8, 8], 'image_format': 'jpeg'}]
+    assert batch.render_arrays(vertices, faces, job_templates=templates) == [b'64x48', b'8x8']
+    assert [(jt.width, jt.height) for jt in batch._job_templates] == [(20, 20), (40, 30)]
+    assert not memory_sinks()
+
+
+def test_render_stl_bytes(batch, tmp_path):
+    vertices, faces = make_mesh(100)
+    filepath = str(tmp_path / 'mesh.stl')
+    write_mesh(filepath, vertices, faces, 'stl-binary')
+    with open(filepath, 'rb') as f:
+        assert batch.render_stl_bytes(f.read(), job_templates=[{'dimensions': [10, 5]}]) == [b'10x5']
+
+
+def test_render_arrays_closes_its_sink_when_rendering_fails(batch, monkeypatch):
+    def render_mesh(mesh, filepath):
+        assert len(memory_sinks()) == 1
+        raise RuntimeError("render failed")
+
+    monkeypatch.setattr(batch, '_render_mesh', render_mesh)
+    with pytest.raises(RuntimeError):
+        batch.render_arrays(*make_mesh(100))
+    assert not memory_sinks()
+    with pytest.raises(ValueError):
+        batch.render_arrays(*make_mesh(100), job_templates=[])
+    assert not memory_sinks()
+
+
+def test_scratch_path_in_memory(tmp_path, monkeypatch):
+    monkeypatch.setattr(mesh2img, '_scratch_dirs', {})
+    monkeypatch.setattr(mesh2img, 'MEMORY_SCRATCH_ROOTS', (str(tmp_path / 'missing'), str(tmp_path)))
+    path = mesh2img.scratch_path('image.png', memory=True)
+    assert os.path.dirname(os.path.dirname(path)) == str(tmp_path)
+    assert os.path.dirname(mesh2img.scratch_path('other.png', memory=True)) == os.path.dirname(path)
+    on_disk = mesh2img.scratch_path('image.png')
+    assert os.path.dirname(os.path.dirname(on_disk)) == os.path.abspath(tempfile.gettempdir())
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+import os
+import zipfile
+
+import mesh2img
+
+
+def test_split_archive_path(tmp_path):
+    archive = str(tmp_path / 'parts.zip')
+    with zipfile.ZipFile(archive, 'w') as z:
+        z.writestr('brackets/left.stl', b'solid left\n')
+    member = archive + '/brackets/left.stl'
+    assert mesh2img.split_archive_path(member) == (archive, 'brackets/left.stl')
+    assert mesh2img.split_archive_path(archive) == (archive, None)
+    assert mesh2img.split_archive_path(str(tmp_path / 'plain.stl')) == (str(tmp_path / 'plain.stl'), None)
+    assert mesh2img.archive_output_path(member) == os.path.join(str(tmp_path / 'parts'), 'brackets', 'left.stl')
+    assert mesh2img.source_stat(member)[0] == len(b'solid left\n')
+    with mesh2img.local_copy(member) as local_path:
+        with open(local_path, 'rb') as f:
+            assert f.read() == b'solid left\n'
+    assert not os.path.exists(local_path)
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+import argparse
+
+import pytest
+
+import mesh2img
+
+
+def test_parse_triangle_budget():
+    assert mesh2img.parse_triangle_budget('auto') == 'auto'
+    assert mesh2img.parse_triangle_budget(' AUTO ') == 'auto'
+    assert mesh2img.parse_triangle_budget('20000') == 20000
+    for text in ('10k', 'abc', '0', '-5', '1.5'):
+        with pytest.raises(argparse.ArgumentTypeError):
+            mesh2img.parse_triangle_budget(text)
+
+
+def test_parse_size():
+    assert mesh2img.parse_size('512') == 512
+    assert mesh2img.parse_size('2K') == 2048
+    assert mesh2img.parse_size('1.5M') == int(1.5 * 1024 ** 2)
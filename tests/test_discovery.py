@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+import io
+import os
+import tarfile
+
+import pytest
+
+import mesh2img
+
+
+@pytest.fixture
+def library(tmp_path, write):
+    root = tmp_path / 'library'
+    write(root / 'a.stl', b'x' * 10)
+    write(root / 'big.stl', b'x' * 5000)
+    write(root / 'notes.txt')
+    write(root / 'sub' / 'b.ply', b'x' * 100)
+    write(root / 'sub' / 'deeper' / 'c.stl', b'x' * 1000)
+    write(root / 'old' / 'd.stl')
+    data = io.BytesIO()
+    with tarfile.open(fileobj=data, mode='w') as tar:
+        info = tarfile.TarInfo('inner/e.stl')
+        info.size = 2
+        tar.addfile(info, io.BytesIO(b'xx'))
+    write(root / 'sub' / 'pack.tar', data.getvalue())
+    return str(root)
+
+
+def discover(root, **options):
+    found = mesh2img.MeshDiscovery([root], ('.stl', '.ply'), **options)
+    return sorted(os.path.relpath(path, root).replace(os.sep, '/') for path in found)
+
+
+def test_discovery_filters(library):
+    assert discover(library) == ['a.stl', 'big.stl', 'old/d.stl', 'sub/b.ply', 'sub/deeper/c.stl',
+                                 'sub/pack.tar/inner/e.stl']
+    assert discover(library, include=['*.ply']) == ['sub/b.ply']
+    assert discover(library, exclude=['old', 'pack.tar']) == ['a.stl', 'big.stl', 'sub/b.ply', 'sub/deeper/c.stl']
+    assert discover(library, include=['sub/*']) == ['sub/b.ply']  # * stays inside one folder
+    assert discover(library, include=['sub/*.stl']) == []
+    assert discover(library, include=['sub/**/*.ply']) == ['sub/b.ply']  # ** can be no folders at all
+    assert discover(library, include=['**/*.stl'], exclude=['sub/deeper/**']) == ['a.stl', 'big.stl', 'old/d.stl',
+                                                                                 'sub/pack.tar/inner/e.stl']
+    assert discover(library, include=['sub/**/*.stl']) == ['sub/deeper/c.stl', 'sub/pack.tar/inner/e.stl']
+    assert discover(library, max_depth=0) == ['a.stl', 'big.stl']
+    assert discover(library, min_size=50, max_size=2000) == ['sub/b.ply', 'sub/deeper/c.stl']
+
+
+def test_discovery_order(library):
+    found = list(mesh2img.MeshDiscovery([library], ('.stl',), order='largest', exclude=['*.tar']))
+    assert [os.path.basename(path) for path in found] == ['big.stl', 'c.stl', 'a.stl', 'd.stl']
+
+
+def test_discovery_doesnt_follow_folder_links(library):
+    try:
+        os.symlink('..', os.path.join(library, 'sub', 'back'))
+    except (OSError, NotImplementedError):
+        pytest.skip("can't make symlinks here")
+    assert discover(library, exclude=['*.tar']) == ['a.stl', 'big.stl', 'old/d.stl', 'sub/b.ply', 'sub/deeper/c.stl']
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+import mesh2img
+from mesh2img_bench import make_mesh, write_mesh
+
+
+@pytest.fixture
+def meshes(tmp_path):
+    """
+    :return: the paths of a mesh, the same mesh moved, scaled and stored another way, and a different mesh with the
+             same number of triangles
+    """
+    vertices, faces = make_mesh(400, seed=1)
+    order = np.random.RandomState(0).permutation(len(faces))
+    paths = [str(tmp_path / name) for name in ('a.stl', 'b.ply', 'c.stl')]
+    write_mesh(paths[0], vertices, faces, 'stl-binary')
+    write_mesh(paths[1], vertices * 3 + 1, faces[order][:, ::-1], 'ply-ascii')
+    other = make_mesh(400, seed=2)
+    write_mesh(paths[2], other[0], other[1][:len(faces)], 'stl-binary')
+    return paths
+
+
+def find(finder, paths):
+    """
+    :return: the original of each path (or None), after adding the ones that aren't duplicates
+    """
+    found = []
+    for path in paths:
+        key = finder.key(path)
+        found.append(finder.match(key))
+        if found[-1] is None:
+            finder.add(key, path)
+    return found
+
+
+def test_bytes_mode(tmp_path, write):
+    paths = [write(tmp_path / name, data) for name, data in (('a.stl', b'one'), ('b.stl', b'two'), ('c.stl', b'one'))]
+    assert find(mesh2img.DuplicateFinder('bytes'), paths) == [None, None, paths[0]]
+
+
+def test_geometry_mode_reads_each_mesh_once(meshes, monkeypatch):
+    reads = []
+    read = mesh2img.DuplicateFinder._read
+    monkeypatch.setattr(mesh2img.DuplicateFinder, '_read', staticmethod(lambda path: reads.append(path) or read(path)))
+    assert find(mesh2img.DuplicateFinder('geometry'), meshes) == [None, meshes[0], None]
+    assert reads == meshes
+
+
+def test_geometry_mode_past_the_cache(meshes, monkeypatch):
+    monkeypatch.setattr(mesh2img.DuplicateFinder, 'CACHED_TRIANGLES', 0)
+    assert find(mesh2img.DuplicateFinder('geometry'), meshes) == [None, meshes[0], None]
+
+
+def test_same_centers():
+    vertices, faces = make_mesh(200)
+    centers = mesh2img.unit_centers(vertices, faces)
+    assert mesh2img.same_centers(centers, mesh2img.unit_centers(vertices * 2, faces[::-1]))
+    moved = vertices.copy()
+    moved[faces[0]] += 0.05
+    assert not mesh2img.same_centers(centers, mesh2img.unit_centers(moved, faces))
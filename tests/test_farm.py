@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import time
+import zipfile
+
+import pytest
+
+import mesh2img
+
+
+def test_read_json_lines_skips_a_torn_last_line(tmp_path):
+    filepath = str(tmp_path / 'report.jsonl')
+    mesh2img.append_json_line(filepath, {'path': 'a', 'status': 'ok'})
+    with open(filepath, 'a') as f:
+        f.write('{"path": "b", "sta')
+    assert list(mesh2img.read_json_lines(filepath)) == [{'path': 'a', 'status': 'ok'}]
+    assert list(mesh2img.read_json_lines(str(tmp_path / 'missing.jsonl'))) == []
+
+
+def test_shard_balances_by_size(tmp_path, write):
+    sizes = [5000000, 3000000, 2000000, 1000000, 1000000, 10, 10]
+    paths = [write(tmp_path / ('%d.stl' % i), b'x' * size) for i, size in enumerate(sizes)]
+    shards = mesh2img.RenderFarm.shard(paths, 3)
+    assert len(shards) == 3
+    assert sorted(path for shard in shards for path in shard) == sorted(paths)
+    totals = [sum(os.path.getsize(path) + mesh2img.RenderFarm.PER_FILE_COST for path in shard) for shard in shards]
+    assert max(totals) - min(totals) <= 2000000 + mesh2img.RenderFarm.PER_FILE_COST
+    assert mesh2img.RenderFarm.shard(paths[:1], 3) == [paths[:1], [], []]
+
+
+def test_farm_worker_reads_only_whole_lines(tmp_path):
+    report = str(tmp_path / 'worker0.jsonl')
+    worker = mesh2img.FarmWorker(0, 0, 'worker0', ['a', 'b'], report, None, None)
+    assert worker.read_report() == []
+    mesh2img.append_json_line(report, {'path': 'a', 'status': 'started', 'time': 1.0})
+    with open(report, 'a') as f:
+        f.write(json.dumps({'path': 'a', 'status': 'ok', 'outputs': []})[:10])
+    assert [record['status'] for record in worker.read_report()] == ['started']
+    assert worker.current == ('a', 1.0)
+    with open(report, 'a') as f:
+        f.write(json.dumps({'path': 'a', 'status': 'ok', 'outputs': []})[10:] + '\n')
+    assert [record['status'] for record in worker.read_report()] == ['ok']
+    assert worker.current is None and worker.done == {'a'}
+
+
+class FakeBlender(object):
+    """
+    Stands in for the subprocess.Popen of a farm worker. Instead of starting Blender, it works through the worker's
+    meshes one at a time as it's polled, doing what SCRIPT says for each: 'ok' reports it rendered (and writes its
+    image into the worker's zip part once the worker is done), 'crash' exits with an error while rendering it and
+    'hang' never finishes it. A worker that crashes or is killed leaves a half-written zip part behind.
+    """
+
+    SCRIPT = {}  # mesh path -> 'ok', 'crash' or 'hang'
+    started = []  # the (name, paths) of every worker started
+    batch = None  # the Mesh2Img the farm renders
+
+    def __init__(self, cmd, stdout=None, stderr=None):
+        with open(cmd[-1]) as f:
+            self.settings = json.load(f)
+        self.name = self.settings['sink_part']
+        self.started.append((self.name, self.settings['paths']))
+        self.todo = list(self.settings['paths'])
+        self.images = {}
+        self.pid = 12345
+        self.returncode = None
+
+    def poll(self):
+        if self.returncode is not None or (self.todo and self.todo[0] is None):
+            return self.returncode
+        if not self.todo:
+            self.close_part()
+            self.returncode = 0
+            return 0
+        path = self.todo[0]
+        action = self.SCRIPT[path]
+        started = time.time() - (1000 if action == 'hang' else 0)
+        mesh2img.append_json_line(self.settings['report'], {'path': path, 'status': 'started', 'time': started})
+        if action == 'hang':
+            self.todo[0] = None  # stuck on it until it's killed
+            self.break_part()
+            return None
+        if action == 'crash':
+            self.break_part()
+            self.returncode = 1
+            return 1
+        outputs = self.batch.get_output_paths(path)
+        for output in outputs:
+            self.images[output[len(self.sink_path()) + 1:]] = b'image of ' + path.encode('utf-8')
+        mesh2img.append_json_line(self.settings['report'], {'path': path, 'status': 'ok', 'outputs': outputs})
+        self.todo.pop(0)
+        return None
+
+    def sink_path(self):
+        return mesh2img.parse_sink(self.batch._job_templates[0].sink)[1]
+
+    def part_path(self):
+        return mesh2img.sink_part_path(self.sink_path(), self.name)
+
+    def close_part(self):
+        with zipfile.ZipFile(self.part_path(), 'w') as z:
+            for name, image in self.images.items():
+                z.writestr(name, image)
+
+    def break_part(self):
+        with open(self.part_path(), 'wb') as f:
+            f.write(b'PK\x03\x04 and then nothing')
+
+    def kill(self):
+        self.returncode = -9
+
+    def wait(self):
+        return self.returncode
+
+
+@pytest.fixture
+def farm(tmp_path, write, monkeypatch):
+    """
+    :return: a function that makes a one-worker RenderFarm for the given {mesh name: script action} (see FakeBlender)
+             and returns it with the mesh paths. The meshes are handed out in the order they're given.
+    """
+    def make_farm(script, **settings):
+        paths = [write(tmp_path / 'meshes' / name, b'x' * (1000 - i)) for i, name in enumerate(script)]
+        batch = mesh2img.Mesh2Img(paths=[str(tmp_path / 'meshes')], dimensions=[(20, 20)],
+                                  output_template='{basename}_{width}.{ext}',
+                                  sink='zip:' + str(tmp_path / 'thumbs.zip'), journal=str(tmp_path / 'journal.jsonl'),
+                                  **settings)
+        monkeypatch.setattr(FakeBlender, 'SCRIPT', dict(zip(paths, script.values())))
+        monkeypatch.setattr(FakeBlender, 'started', [])
+        monkeypatch.setattr(FakeBlender, 'batch', batch)
+        monkeypatch.setattr(mesh2img.subprocess, 'Popen', FakeBlender)
+        monkeypatch.setattr(mesh2img.RenderFarm, 'POLL_INTERVAL', 0)
+        return mesh2img.RenderFarm(batch, workers=1, threads=1, work_dir=str(tmp_path / 'work')), paths
+    return make_farm
+
+
+def test_farm_quarantines_and_restarts(farm, tmp_path):
+    render_farm, (a, b, c, d, e) = farm({'a.stl': 'ok', 'b.stl': 'hang', 'c.stl': 'ok', 'd.stl': 'crash',
+                                         'e.stl': 'ok'}, mesh_timeout=60)
+    results = render_farm.run()
+    assert FakeBlender.started == [('worker0', [a, b, c, d, e]), ('worker0-1', [c, d, e]), ('worker0-2', [e])]
+    assert sorted(results['quarantined']) == [b, d]
+    assert 'took more than 60s' in results['quarantined'][b]
+    assert 'exited with code 1' in results['quarantined'][d]
+    assert sorted(results['failed']) == [a, c]  # their images were in the zip parts the stopped workers never closed
+    assert list(results['rendered']) == [e]
+    with zipfile.ZipFile(str(tmp_path / 'thumbs.zip')) as z:
+        assert z.namelist() == ['e_20.png']
+    journal = mesh2img.Journal(str(tmp_path / 'journal.jsonl'))
+    assert [journal.get(path)['status'] for path in (a, b, c, d, e)] == ['lost', 'quarantined', 'lost',
+                                                                         'quarantined', 'ok']
+
+
+def test_farm_stops_a_worker_over_the_memory_limit(farm, monkeypatch):
+    render_farm, (a, b) = farm({'a.stl': 'hang', 'b.stl': 'ok'}, mesh_memory=2 ** 30)
+    monkeypatch.setattr(mesh2img, 'process_rss', lambda pid: 3 * 2 ** 30)
+    results = render_farm.run()
+    assert results['quarantined'][a] == "took Blender to 3072MB of memory (the limit is 1024MB)"
+    assert list(results['rendered']) == [b]
+    assert FakeBlender.started[1] == ('worker0-1', [b])
+
+
+def test_farm_picks_up_where_the_journal_left_off(farm):
+    render_farm, (a, b, c) = farm({'a.stl': 'ok', 'b.stl': 'crash', 'c.stl': 'ok'})
+    render_farm.run()
+    FakeBlender.SCRIPT[b] = 'ok'  # it would work now, but it's quarantined
+    del FakeBlender.started[:]
+    results = render_farm.run()
+    assert FakeBlender.started == [('worker0', [a])]  # its images were lost along with the crashed worker
+    assert list(results['skipped']) == [c] and list(results['quarantined']) == [b]
+    assert list(results['rendered']) == [a]
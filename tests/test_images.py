@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+import struct
+import zlib
+
+import numpy as np
+
+import mesh2img
+
+
+def random_pixels(height=5, width=7, seed=0):
+    return np.random.RandomState(seed).rand(height, width, 4).astype(np.float32)
+
+
+def decode_png(data):
+    """
+    A tiny PNG decoder for what encode_png writes (8-bit RGB or RGBA with the "up" filter on every row).
+
+    :return: the pixels as uint8 with the shape (height, width, channels), top row first
+    """
+    assert data[:8] == b'\x89PNG\r\n\x1a\n'
+    offset, chunks = 8, {}
+    while offset < len(data):
+        length, tag = struct.unpack('>I4s', data[offset:offset + 8])
+        body = data[offset + 8:offset + 8 + length]
+        assert struct.unpack('>I', data[offset + 8 + length:offset + 12 + length])[0] == zlib.crc32(tag + body)
+        chunks[tag] = chunks.get(tag, b'') + body
+        offset += 12 + length
+    width, height, depth, color_type = struct.unpack('>IIBB', chunks[b'IHDR'][:10])
+    channels = {2: 3, 6: 4}[color_type]
+    rows = np.frombuffer(zlib.decompress(chunks[b'IDAT']), dtype=np.uint8).reshape(height, width * channels + 1)
+    assert (rows[:, 0] == 2).all()
+    pixels = np.cumsum(rows[:, 1:], axis=0, dtype=np.uint8)  # undo the "up" filter (wrapping around like PNG does)
+    return pixels.reshape(height, width, channels)
+
+
+def test_encode_png_round_trip():
+    pixels = random_pixels()
+    expected = mesh2img.pixels_to_bytes(pixels)[::-1]
+    assert np.array_equal(decode_png(mesh2img.encode_png(pixels)), expected)
+    assert np.array_equal(decode_png(mesh2img.encode_png(pixels, compression=0, alpha=False)), expected[:, :, :3])
+
+
+def test_encode_bmp():
+    pixels = random_pixels()
+    data = mesh2img.encode_bmp(pixels)
+    size, offset = struct.unpack('<I4xI', data[2:14])
+    width, height, planes, bits = struct.unpack('<iiHH', data[18:30])
+    assert (data[:2], size, offset, width, height, bits) == (b'BM', len(data), 54, 7, 5, 24)
+    stride = (7 * 3 + 3) & ~3
+    rows = np.frombuffer(data[54:], dtype=np.uint8).reshape(5, stride)[:, :21].reshape(5, 7, 3)
+    assert np.array_equal(rows[:, :, ::-1], mesh2img.pixels_to_bytes(pixels)[:, :, :3])  # bottom row first, BGR
+
+
+def test_encode_tiff():
+    pixels = random_pixels()
+    data = mesh2img.encode_tiff(pixels)
+    assert data[:4] == b'II*\x00'
+    ifd = struct.unpack('<I', data[4:8])[0]
+    tags = {}
+    for i in range(struct.unpack('<H', data[ifd:ifd + 2])[0]):
+        tag, kind, count, value = struct.unpack('<HHII', data[ifd + 2 + 12 * i:ifd + 14 + 12 * i])
+        tags[tag] = value & 0xffff if kind == 3 else value
+    assert (tags[256], tags[257], tags[259]) == (7, 5, 1)
+    strip = data[tags[273]:tags[273] + tags[279]]
+    expected = mesh2img.pixels_to_bytes(pixels)[::-1, :, :3]
+    assert np.array_equal(np.frombuffer(strip, dtype=np.uint8).reshape(5, 7, 3), expected)
+
+
+def test_resample_pixels_averages_areas():
+    pixels = np.zeros((4, 4, 4), dtype=np.float32)
+    pixels[:, :, 3] = 1.0
+    pixels[:, :2, 0] = 1.0  # left half red
+    resized = mesh2img.resample_pixels(pixels, 2, 2)
+    assert resized.shape == (2, 2, 4)
+    assert np.allclose(resized[:, 0, 0], 1.0) and np.allclose(resized[:, 1, 0], 0.0)
+    assert np.allclose(mesh2img.resample_pixels(pixels, 1, 1)[0, 0], [0.5, 0, 0, 1])
+    assert mesh2img.resample_pixels(pixels, 4, 4) is pixels
+
+
+def test_resample_pixels_ignores_transparent_colors():
+    pixels = np.zeros((1, 2, 4), dtype=np.float32)
+    pixels[0, 0] = [1.0, 1.0, 1.0, 1.0]
+    pixels[0, 1] = [0.0, 0.0, 0.0, 0.0]  # a transparent black pixel shouldn't darken the result
+    assert np.allclose(mesh2img.resample_pixels(pixels, 1, 1)[0, 0], [1.0, 1.0, 1.0, 0.5])
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import mesh2img
+
+
+def test_journal_resumes_where_the_last_run_stopped(tmp_path, write):
+    done, failed, crashed, todo = [write(tmp_path / name) for name in ('a.stl', 'b.stl', 'c.stl', 'd.stl')]
+    filepath = str(tmp_path / 'journal.jsonl')
+    journal = mesh2img.Journal(filepath)
+    journal.record(done, 'started')
+    journal.record(done, 'ok', outputs=['a.png'])
+    journal.record(failed, 'started')
+    journal.record(failed, 'failed', error='ValueError()')
+    journal.record(todo, 'interrupted')
+    journal.record(crashed, 'started')  # and then the process died
+
+    journal = mesh2img.Journal(filepath)
+    assert journal.is_finished(done) and journal.is_finished(failed)
+    assert journal.get(done)['outputs'] == ['a.png']
+    assert not journal.is_finished(todo)
+    assert not journal.is_finished(crashed)  # it may have been killed from outside, so it gets another try
+    assert journal.get(crashed)['status'] == 'crashed'
+    assert len(list(mesh2img.read_json_lines(filepath))) == 5  # compacted, plus the crash record
+
+    write(done, b'solid changed\n')
+    assert not journal.is_finished(done)
+
+
+def test_journal_quarantines_a_mesh_two_runs_died_on(tmp_path, write):
+    mesh, other = write(tmp_path / 'a.stl'), write(tmp_path / 'b.stl')
+    filepath = str(tmp_path / 'journal.jsonl')
+    mesh2img.Journal(filepath).record(mesh, 'started')
+    journal = mesh2img.Journal(filepath)
+    journal.record(other, 'started')  # the next run died on another mesh before getting to this one
+    journal = mesh2img.Journal(filepath)
+    assert not journal.is_finished(mesh) and not journal.is_finished(other)
+    journal.record(mesh, 'started')
+    journal = mesh2img.Journal(filepath)
+    assert journal.is_finished(mesh) and journal.get(mesh)['status'] == 'quarantined'
+    assert journal.get(mesh)['crashes'] == 2
+
+
+def test_journal_forgets_crashes_once_a_mesh_renders(tmp_path, write):
+    mesh = write(tmp_path / 'a.stl')
+    filepath = str(tmp_path / 'journal.jsonl')
+    mesh2img.Journal(filepath).record(mesh, 'started')
+    journal = mesh2img.Journal(filepath)
+    journal.record(mesh, 'started')
+    journal.record(mesh, 'ok', outputs=[])
+    journal.record(mesh, 'started')  # rendered again after the file changed, and died
+    assert mesh2img.Journal(filepath).get(mesh)['status'] == 'crashed'
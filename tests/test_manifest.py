@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+import os
+
+import pytest
+
+import mesh2img
+
+
+def test_manifest_skips_unchanged_meshes(tmp_path, write):
+    mesh = write(tmp_path / 'part.stl')
+    image = write(tmp_path / 'part_200.png', b'png')
+    manifest = mesh2img.Manifest(str(tmp_path / 'manifest.jsonl'))
+    assert not manifest.is_current(mesh, 'settings')
+    manifest.record(mesh, 'settings', [image])
+
+    manifest = mesh2img.Manifest(str(tmp_path / 'manifest.jsonl'))  # as the next run sees it
+    assert manifest.is_current(mesh, 'settings')
+    assert manifest.outputs(mesh) == [image]
+    assert not manifest.is_current(mesh, 'other settings')
+    os.utime(mesh, (0, 0))  # touched but not changed
+    assert manifest.is_current(mesh, 'settings')
+    write(mesh, b'solid y\n')
+    assert not manifest.is_current(mesh, 'settings')
+    write(mesh, b'solid x\n')
+    os.remove(image)
+    assert not manifest.is_current(mesh, 'settings')
+
+
+def test_manifest_compact_keeps_newest_entries(tmp_path, write):
+    mesh = write(tmp_path / 'part.stl')
+    manifest = mesh2img.Manifest(str(tmp_path / 'manifest.jsonl'))
+    for outputs in (['a.png'], ['b.png']):
+        manifest.record(mesh, 'settings', outputs)
+    manifest.compact()
+    lines = list(mesh2img.read_json_lines(manifest.filepath))
+    assert len(lines) == 1 and lines[0]['outputs'] == ['b.png']
+
+
+def test_manifest_uses_a_known_hash(tmp_path, write, monkeypatch):
+    mesh = write(tmp_path / 'part.stl')
+    image = write(tmp_path / 'part_200.png', b'png')
+    sha1 = mesh2img.file_digest(mesh)
+    monkeypatch.setattr(mesh2img, 'file_digest', lambda filepath: pytest.fail("read %s again" % filepath))
+    manifest = mesh2img.Manifest(str(tmp_path / 'manifest.jsonl'))
+    manifest.record(mesh, 'settings', [image], sha1)
+    assert manifest.entries[os.path.abspath(mesh)]['sha1'] == sha1
@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+import mesh2img
+
+
+def test_metrics_keeps_run_stages_apart(tmp_path):
+    metrics = mesh2img.RunMetrics(str(tmp_path / 'metrics.jsonl'))
+    for name in ('a.stl', 'b.stl'):
+        metrics.begin_mesh(name)
+        with metrics.stage('write_wait'):
+            pass
+        metrics.end_mesh('ok')
+    with metrics.stage('write_wait'):
+        pass
+    summary = metrics.summary()
+    assert summary['meshes'] == 2
+    assert summary['stages']['write_wait']['count'] == 2
+    assert set(summary['run_stages']) == {'write_wait'}
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+import mesh2img
+from mesh2img_bench import FORMATS, make_mesh, write_mesh
+
+
+def same_triangles(mesh, other):
+    """
+    :return: True if both (vertices, faces) meshes have the same triangles in the same order, however their vertices
+             are numbered
+    """
+    corners, other_corners = mesh[0][mesh[1]], other[0][other[1]]
+    return corners.shape == other_corners.shape and np.allclose(corners, other_corners, atol=1e-5)
+
+
+@pytest.fixture(scope='module')
+def mesh():
+    return make_mesh(500, seed=3)
+
+
+@pytest.mark.parametrize('file_format', FORMATS)
+def test_readers_round_trip(tmp_path, mesh, file_format):
+    filepath = str(tmp_path / ('mesh.' + file_format.split('-')[0]))
+    write_mesh(filepath, mesh[0], mesh[1], file_format)
+    vertices, faces = mesh2img.MESH_READERS[filepath[-4:]](filepath)
+    assert vertices.dtype == np.float32 and faces.dtype == np.int32
+    assert same_triangles((vertices, faces), mesh)
+
+
+@pytest.mark.parametrize('file_format', ['stl-binary', 'stl-ascii'])
+def test_read_stl_bytes_matches_read_stl(tmp_path, mesh, file_format):
+    filepath = str(tmp_path / 'mesh.stl')
+    write_mesh(filepath, mesh[0], mesh[1], file_format)
+    with open(filepath, 'rb') as f:
+        data = f.read()
+    from_file = mesh2img.read_stl(filepath)
+    for buffer in (data, bytearray(data), memoryview(data)):
+        from_bytes = mesh2img.read_stl_bytes(buffer)
+        assert np.array_equal(from_bytes[0], from_file[0])
+        assert np.array_equal(from_bytes[1], from_file[1])
+
+
+def test_read_ply_big_endian_and_quads(tmp_path):
+    vertices = np.array([[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0]], dtype='>f4')
+    header = (b'ply\nformat binary_big_endian 1.0\ncomment a square\nelement vertex 4\nproperty float x\n'
+              b'property float y\nproperty float z\nelement face 1\nproperty list uchar int vertex_indices\n'
+              b'end_header\n')
+    filepath = str(tmp_path / 'quad.ply')
+    with open(filepath, 'wb') as f:
+        f.write(header + vertices.tobytes() + b'\x04' + np.array([0, 1, 2, 3], dtype='>i4').tobytes())
+    read_vertices, faces = mesh2img.read_ply(filepath)
+    assert len(faces) == 2  # the quad is split into two triangles
+    assert same_triangles((read_vertices, faces), (vertices.astype(np.float32), np.array([[0, 1, 2], [0, 2, 3]])))
+
+
+def test_read_ply_rejects_other_files(tmp_path):
+    filepath = str(tmp_path / 'not.ply')
+    with open(filepath, 'wb') as f:
+        f.write(b'solid nope\n')
+    with pytest.raises(ValueError):
+        mesh2img.read_ply(filepath)
+
+
+def test_weld_vertices_merges_shared_corners():
+    corners = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0],
+                        [1, 0, 0], [-0.0, 0, 0], [0, 0, 1]], dtype=np.float32)
+    vertices, faces = mesh2img.weld_vertices(corners)
+    assert len(vertices) == 4  # 0.0 and -0.0 count as the same position
+    assert faces.shape == (2, 3)
+    assert np.array_equal(vertices[faces].reshape(-1, 3), np.where(corners == 0, 0, corners))
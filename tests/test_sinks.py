@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+import mesh2img
+
+
+@pytest.fixture(autouse=True)
+def no_open_sinks():
+    yield
+    mesh2img.close_sinks()
+
+
+def test_parse_sink():
+    assert mesh2img.parse_sink(None) is None
+    assert mesh2img.parse_sink('files') is None
+    assert mesh2img.parse_sink('zip:/out/thumbs.zip') == ('zip', os.path.abspath('/out/thumbs.zip'))
+    assert mesh2img.parse_sink('/out/thumbs.sqlite3') == ('sqlite', os.path.abspath('/out/thumbs.sqlite3'))
+    assert mesh2img.parse_sink('tar:/out/thumbs') == ('tar', os.path.abspath('/out/thumbs'))
+    with pytest.raises(ValueError):
+        mesh2img.parse_sink('/out/thumbs.txt')
+
+
+@pytest.mark.parametrize('kind', ['zip', 'tar', 'sqlite', 'memory'])
+def test_sinks(tmp_path, kind):
+    path = str(tmp_path / ('thumbs.' + kind))
+    template = mesh2img.JobTemplate((20, 20), '{basename}_{width}.{ext}', sink='%s:%s' % (kind, path))
+    output = template.get_output_path('/meshes/part.stl')
+    assert output == path + '/part_20.png'
+    mesh2img.open_sink(template.sink)
+    mesh2img.write_output(output, b'first', source='/meshes/part.stl', width=20, height=20, image_format='png')
+    mesh2img.write_output(output, b'second')
+    assert mesh2img.output_exists(output) and not mesh2img.output_exists(path + '/other.png')
+    assert mesh2img.read_output(output) == b'second'
+    mesh2img.flush_sinks()
+    assert mesh2img.read_output(output) == b'second'
+    mesh2img.link_or_copy(output, path + '/copy.png', source='/meshes/copy.stl')
+    assert mesh2img.read_output(path + '/copy.png') == b'second'
+    mesh2img.link_or_copy(output, str(tmp_path / 'plain.png'))
+    with open(str(tmp_path / 'plain.png'), 'rb') as f:
+        assert f.read() == b'second'
+    mesh2img.close_sinks()
+
+    if kind == 'memory':
+        return
+    sink = mesh2img.open_sink(template.sink)  # the next run sees what the last one wrote
+    assert sink.exists('part_20.png') and sink.read('part_20.png') == b'second'
+    sink.write('part_20.png', b'third')
+    mesh2img.close_sinks()
+    if kind == 'zip':  # the outdated members were cleaned out
+        with zipfile.ZipFile(path) as z:
+            assert sorted(z.namelist()) == ['copy.png', 'part_20.png'] and z.read('part_20.png') == b'third'
+
+
+def test_sink_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(mesh2img.OutputSink, 'BATCH_SIZE', 3)
+    sink = mesh2img.open_sink(str(tmp_path / 'thumbs.tar'))
+    for i in range(4):
+        sink.write('%d.png' % i, b'x')
+    with tarfile.open(sink.path) as tar:  # the first 3 were written out together
+        assert tar.getnames() == ['0.png', '1.png', '2.png']
+
+
+@pytest.mark.parametrize('kind', ['zip', 'tar'])
+def test_sink_merge(tmp_path, kind):
+    path = str(tmp_path / ('thumbs.' + kind))
+    part = mesh2img.sink_part_path(path, 'worker0')
+    assert part == str(tmp_path / ('thumbs.worker0.' + kind))
+    worker = mesh2img.SINK_TYPES[kind][0](path, part)
+    worker.write('a.png', b'from the worker')
+    worker.close()
+    sink = mesh2img.open_sink(path)
+    sink.write('b.png', b'from here')
+    sink.merge(part)
+    assert not os.path.exists(part)
+    assert sink.read('a.png') == b'from the worker' and sink.read('b.png') == b'from here'